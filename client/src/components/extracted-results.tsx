@@ -143,7 +143,9 @@ const ExtractedResults: React.FC<ExtractedResultsProps> = ({
         <div className="flex items-center justify-center py-8">
           <div className="text-center">
             <div className="mb-2 inline-block h-8 w-8 animate-spin rounded-full border-4 border-indigo-200 border-t-indigo-600"></div>
-            <p className="text-sm text-slate-600">Processing document…</p>
+            <p className="text-sm text-slate-600">
+              {extracted.length > 0 ? 'Processing remaining pages…' : 'Processing document…'}
+            </p>
           </div>
         </div>
       )}
@@ -155,7 +157,7 @@ const ExtractedResults: React.FC<ExtractedResultsProps> = ({
         </div>
       )}
 
-      {!isLoading && !error && extracted.length > 0 && (
+      {!error && extracted.length > 0 && (
         <div className="space-y-3">
           {extracted.map((item, index) => (
             <LayoutItemCard
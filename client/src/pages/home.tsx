@@ -6,6 +6,43 @@ import ExtractedResults from '@/components/extracted-results';
 import { saveDocument, base64ToFile, type StoredDocument } from '@/utils/mockStorage';
 import type { LayoutItem } from '@/types/ocr';
 
+const API_URL = 'http://127.0.0.1:8000/api/v1';
+const JOB_POLL_INTERVAL_MS = 1000;
+
+const isFinished = (status?: string) => status === 'succeeded' || status === 'failed';
+
+const waitForJob = async (jobId: string) => {
+  for (;;) {
+    const { data } = await api.get(`${API_URL}/jobs/${jobId}`);
+    if (isFinished(data?.status)) return data;
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
+};
+
+// Follows the job's Server-Sent Events, handing over the layout items of each page as soon
+// as it is processed; falls back to polling where EventSource is unavailable
+const streamJob = (jobId: string, onPage: (items: LayoutItem[]) => void) => {
+  if (typeof EventSource === 'undefined') return waitForJob(jobId);
+
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${API_URL}/jobs/${jobId}/events`);
+    source.addEventListener('page', (event) => {
+      onPage(JSON.parse((event as MessageEvent).data).items as LayoutItem[]);
+    });
+    source.addEventListener('status', (event) => {
+      const job = JSON.parse((event as MessageEvent).data);
+      if (isFinished(job.status)) {
+        source.close();
+        resolve(job);
+      }
+    });
+    // EventSource reconnects (resuming from the last event) unless the stream is gone for good
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED) reject(new Error('Lost connection to the server'));
+    };
+  });
+};
+
 const Home: React.FC = () => {
   const [file, setFile] = useState<File | null>(null);
   const [previewUrl, setPreviewUrl] = useState<string | null>(null);
@@ -66,18 +103,27 @@ const Home: React.FC = () => {
 
     setIsLoading(true);
     setError(null);
+    setExtracted([]);
 
     const formData = new FormData();
     formData.append('file', file);
 
     try {
-      const response = await api.post('http://127.0.0.1:8000/api/v1/upload', formData, {
+      const upload = await api.post(`${API_URL}/upload`, formData, {
         headers: { 'Content-Type': 'multipart/form-data' },
       });
 
+      // The upload only queues a job; show each page as it is processed, then fetch the result
+      const jobId: string = upload.data?.job_id;
+      await streamJob(jobId, (items) => setExtracted((previous) => [...previous, ...items]));
+      const response = await api.get(`${API_URL}/jobs/${jobId}/result`);
+
       // Extract LayoutData from the response
-      // Response structure: { message: { status, message, data: LayoutData[] } }
+      // Response structure: { job_id, status, message: { status, message, data: LayoutData[] } }
       const message = response.data?.message;
+      if (message?.status === 'error') {
+        throw new Error(message.message);
+      }
       const layoutData = message?.data || [];
 
       if (Array.isArray(layoutData)) {
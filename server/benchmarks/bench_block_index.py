@@ -0,0 +1,112 @@
+"""
+Micro-benchmark of the enrichment stage on a synthetic Textract response.
+
+Compares the previous per-stage full scans (one blocks_map per stage, repeated list
+comprehensions, string concatenation) with the single BlockIndex shared by all stages.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_block_index --blocks 100000
+"""
+import argparse
+import copy
+import time
+
+from services.result_cache import ResultCache
+from services.textract_service import TextractManager
+from services.textract_simulator import synthetic_blocks
+
+
+def blocks_for_target(target_blocks):
+    """Synthetic response with at least target_blocks blocks."""
+    per_page = len(synthetic_blocks(1))
+    return synthetic_blocks(-(-target_blocks // per_page))
+
+
+def legacy_pipeline(manager, response):
+    """The enrichment stages as they were before BlockIndex: every stage rescans all blocks."""
+    blocks_map = {block['Id']: block for block in response['Blocks']}
+    for block in response['Blocks']:
+        if block['BlockType'].startswith('LAYOUT_') or block['BlockType'] == 'CELL':
+            text = ""
+            for rel in block.get('Relationships', []):
+                if rel['Type'] == 'CHILD':
+                    for child_id in rel['Ids']:
+                        child = blocks_map.get(child_id)
+                        if child and child['BlockType'] in ['WORD', 'LINE']:
+                            text += child.get('Text', '') + ' '
+            block['Text'] = text.strip()
+
+    blocks_map = {block['Id']: block for block in response['Blocks']}
+    for block in response['Blocks']:
+        if block['BlockType'] == 'TABLE':
+            rows = {}
+            for rel in block.get('Relationships', []):
+                if rel['Type'] == 'CHILD':
+                    for child_id in rel['Ids']:
+                        cell = blocks_map.get(child_id)
+                        if cell and cell['BlockType'] == 'CELL':
+                            rows.setdefault(cell['RowIndex'], {})[cell['ColumnIndex']] = {
+                                "text": cell.get('Text', ''),
+                                "rowIndex": cell['RowIndex'],
+                                "columnIndex": cell['ColumnIndex'],
+                                "rowSpan": cell.get('RowSpan', 1),
+                                "columnSpan": cell.get('ColumnSpan', 1),
+                                "confidence": cell.get('Confidence'),
+                                "geometry": cell.get('Geometry'),
+                                "entityTypes": cell.get('EntityTypes', [])
+                            }
+            table_data = []
+            markdown_rows = []
+            for r_idx in sorted(rows):
+                row_data = [rows[r_idx][c_idx] for c_idx in sorted(rows[r_idx])]
+                table_data.append(row_data)
+                markdown_rows.append("| " + " | ".join(cell['text'] for cell in row_data) + " |")
+                if r_idx == 1:
+                    markdown_rows.append("| " + " | ".join(["---"] * len(row_data)) + " |")
+            block['TableData'] = table_data
+            block['Text'] = "\n".join(markdown_rows)
+
+    table_blocks = [b for b in response['Blocks'] if b['BlockType'] == 'TABLE']
+    layout_blocks = [b for b in response['Blocks'] if b['BlockType'].startswith('LAYOUT_')]
+    filtered_blocks = [b for b in response['Blocks'] if b['BlockType'] not in ['WORD', 'LINE']]
+    return table_blocks, layout_blocks, filtered_blocks
+
+
+def indexed_pipeline(manager, response):
+    from services.block_index import BlockIndex
+
+    index = BlockIndex(response['Blocks'])
+    manager.enrich_response_with_text(response, index)
+    manager.enrich_tables(response, index)
+    return index.of_type('TABLE'), index.layout_blocks, index.structural_blocks
+
+
+def best_of(runs, fn, manager, blocks):
+    timings = []
+    for _ in range(runs):
+        response = {'Blocks': copy.deepcopy(blocks)}
+        start = time.perf_counter()
+        fn(manager, response)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=100_000, help="Approximate number of blocks in the response")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions; the best run is reported")
+    args = parser.parse_args()
+
+    manager = TextractManager(result_cache=ResultCache(enabled=False))
+    blocks = blocks_for_target(args.blocks)
+    print(f"Synthetic response: {len(blocks)} blocks")
+
+    legacy = best_of(args.runs, legacy_pipeline, manager, blocks)
+    indexed = best_of(args.runs, indexed_pipeline, manager, blocks)
+    print(f"legacy full scans : {legacy * 1000:8.1f} ms")
+    print(f"shared BlockIndex : {indexed * 1000:8.1f} ms")
+    print(f"speedup           : {legacy / indexed:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
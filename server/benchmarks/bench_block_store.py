@@ -0,0 +1,70 @@
+"""
+Memory benchmark of holding an enriched multi-page response as boto-style dicts versus a
+BlockStore.
+
+Pages of synthetic blocks are enriched one at a time, as the async route does, and kept
+until the raw artifacts and the cache entry have been encoded. Peak traced memory of the
+two runs is compared.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_block_store --pages 200
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from services.block_store import BlockStore
+from services.output_writer import OutputWriter, RAW_ARTIFACTS
+from services.postprocessing import postprocess_pages
+from services.result_cache import ResultCache
+from services.textract_simulator import synthetic_blocks
+
+
+def iter_pages(pages):
+    """Yields the blocks of each page, built only when it is reached."""
+    for page_number in range(1, pages + 1):
+        blocks = synthetic_blocks(1, seed=page_number)
+        for block in blocks:
+            block['Page'] = page_number
+        yield blocks
+
+
+def run(pages, compact, output_dir):
+    writer = OutputWriter(output_dir=output_dir, write_raw=True)
+    result = {'DocumentMetadata': {'Pages': pages}, 'Blocks': BlockStore() if compact else []}
+
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    for blocks in iter_pages(pages):
+        [(blocks, _)] = postprocess_pages([blocks], 0.75)
+        result['Blocks'].extend(blocks)
+    held, _ = tracemalloc.get_traced_memory()
+    processed = time.perf_counter() - start
+
+    for kind in RAW_ARTIFACTS:
+        writer._write_artifact("bench", kind, writer.build_artifact(kind, result))
+    ResultCache.encode(result)
+    _, peak = tracemalloc.get_traced_memory()
+    elapsed = time.perf_counter() - start
+    writer.shutdown()
+    return len(result['Blocks']), held, peak, processed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200, help="Pages in the synthetic response")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory() as output_dir:
+        for compact in (False, True):
+            blocks, held, peak, processed, elapsed = run(args.pages, compact, os.path.join(output_dir, str(compact)))
+            label = "BlockStore" if compact else "dicts     "
+            print(f"{label}: {blocks} blocks, held {held / 1e6:7.1f} MB, peak {peak / 1e6:7.1f} MB, "
+                  f"enrich {processed:6.2f} s, total {elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+End-to-end throughput benchmark against the offline Textract/S3 simulator.
+
+Runs synthetic PDFs of several page counts at several concurrencies through
+TextractManager.process_document ("process" mode) and/or the HTTP API ("api" mode:
+POST /api/v1/upload, poll the job, fetch the result), and reports throughput,
+p50/p95/p99 latency and the peak RSS of the process.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_throughput --pages 1,10,50 --concurrency 1,4,16 --documents 32
+    python -m benchmarks.bench_throughput --mode api --url http://127.0.0.1:8000
+
+With --url the API of an already running server is used as configured (set
+TEXTRACT_BACKEND=simulator there to stay offline); otherwise a server is started in
+this process on the simulator.
+"""
+import argparse
+import logging
+import math
+import os
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from services.textract_simulator import synthetic_pdf
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+def configure_environment(work_dir, rate_limits):
+    os.environ['TEXTRACT_BACKEND'] = 'simulator'
+    os.environ.setdefault('OUTPUT_DIR', os.path.join(work_dir, 'output'))
+    os.environ.setdefault('RESULT_CACHE_PATH', os.path.join(work_dir, 'cache.sqlite3'))
+    os.environ.setdefault('TEXTRACT_POLL_MIN_INTERVAL', '0.1')
+    if not rate_limits:
+        for api in ('ANALYZE_DOCUMENT', 'START_DOCUMENT_ANALYSIS', 'GET_DOCUMENT_ANALYSIS'):
+            os.environ.setdefault(f'TEXTRACT_TPS_{api}', '0')
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_concurrently(task, documents, concurrency):
+    """Runs task(name, content) for every document and returns (latencies, failures, wall time)."""
+    latencies = []
+    failures = 0
+
+    def timed(document):
+        start = time.perf_counter()
+        task(*document)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(timed, document) for document in documents]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception as e:
+                failures += 1
+                logging.getLogger(__name__).warning(f"Document failed: {e}")
+    return latencies, failures, time.perf_counter() - start
+
+
+def process_task(work_dir):
+    from services.textract_service import TextractManager
+
+    manager = TextractManager()
+
+    def task(name, content):
+        # Uploads reach process_document as a spooled file, so the benchmark does the same
+        path = os.path.join(work_dir, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        try:
+            manager.process_document(file_path=path, output_base_path=name)
+        finally:
+            os.remove(path)
+
+    return task
+
+
+def api_task(base_url, poll_interval):
+    local = threading.local()
+
+    def task(name, content):
+        session = getattr(local, 'session', None) or requests.Session()
+        local.session = session
+
+        response = session.post(f"{base_url}/api/v1/upload", files={'file': (name, content, 'application/pdf')})
+        response.raise_for_status()
+        job_id = response.json()['job_id']
+        while True:
+            job = session.get(f"{base_url}/api/v1/jobs/{job_id}").json()
+            if job['status'] in FINISHED_STATUSES:
+                break
+            time.sleep(poll_interval)
+        if job['status'] != 'succeeded':
+            raise RuntimeError(job.get('error'))
+        session.get(f"{base_url}/api/v1/jobs/{job_id}/result").raise_for_status()
+
+    return task
+
+
+def start_server():
+    """Starts the API on a free local port in a background thread."""
+    import uvicorn
+    from main import app
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, name="bench-server", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server, thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("process", "api", "both"), default="both")
+    parser.add_argument("--pages", default="1,10,50", help="Comma-separated page counts of the synthetic PDFs")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated numbers of documents in flight")
+    parser.add_argument("--documents", type=int, default=16, help="Documents per page count and concurrency")
+    parser.add_argument("--filler-mb", type=float, default=0, help="Extra bytes per document, to model larger files")
+    parser.add_argument("--url", help="Base URL of a running server for the api mode")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="Seconds between job status requests")
+    parser.add_argument("--rate-limits", action="store_true", help="Keep the Textract TPS limits instead of disabling them")
+    args = parser.parse_args()
+
+    page_counts = [int(value) for value in args.pages.split(",")]
+    concurrencies = [int(value) for value in args.concurrency.split(",")]
+    work_dir = tempfile.mkdtemp(prefix="bench-throughput-")
+    configure_environment(work_dir, args.rate_limits)
+    logging.disable(logging.INFO)
+
+    tasks = []
+    server = None
+    if args.mode in ("process", "both"):
+        tasks.append(("process", process_task(work_dir)))
+    if args.mode in ("api", "both"):
+        base_url = args.url
+        if not base_url:
+            base_url, server, server_thread = start_server()
+        tasks.append(("api", api_task(base_url, args.poll_interval)))
+
+    print(f"{'mode':<8} {'pages':>5} {'conc':>4} {'docs':>4} {'fail':>4} {'docs/s':>8} {'pages/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak RSS MB':>11}")
+    try:
+        for mode, task in tasks:
+            for pages in page_counts:
+                for concurrency in concurrencies:
+                    # Every document is unique, so the result cache never short-circuits a run
+                    documents = [
+                        (f"bench_{mode}_{pages}p_{concurrency}c_{i}.pdf",
+                         synthetic_pdf(pages, filler_bytes=int(args.filler_mb * 1024 * 1024), tag=f"{time.time_ns()}-{i}"))
+                        for i in range(args.documents)
+                    ]
+                    latencies, failures, wall = run_concurrently(task, documents, concurrency)
+                    latencies.sort()
+                    done = len(latencies)
+                    row = f"{mode:<8} {pages:>5} {concurrency:>4} {done:>4} {failures:>4} " \
+                          f"{done / wall:>8.2f} {done * pages / wall:>8.1f} "
+                    if latencies:
+                        row += " ".join(f"{percentile(latencies, p) * 1000:>8.0f}" for p in (50, 95, 99))
+                    else:
+                        row += " ".join(f"{'-':>8}" for _ in range(3))
+                    rss = "n/a" if mode == "api" and args.url else f"{peak_rss_mb():.0f}"
+                    print(f"{row} {rss:>11}", flush=True)
+    finally:
+        if server is not None:
+            server.should_exit = True
+            server_thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,361 @@
 from fastapi import UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from services.document_service import DocumentService
+from services.job_service import JobManager, FINISHED_STATES
+from services.layout_projection import parse_projection, project_layout
+from services.reprocessor import Reprocessor
+from controllers.responses import FastJSONResponse
+from services import metrics
+import asyncio
+import hmac
 import json
 import os
+import tempfile
+import zipfile
+
+SUPPORTED_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff")
 
 class DocumentController:
     def __init__(self):
         self.document_service = DocumentService()
+        self.job_manager = JobManager(self.document_service)
+        self.max_upload_bytes = int(os.getenv('MAX_UPLOAD_BYTES', str(500 * 1024 * 1024)))
+        self.upload_chunk_size = int(os.getenv('UPLOAD_CHUNK_SIZE', str(1024 * 1024)))
+        self.upload_tmp_dir = os.getenv('UPLOAD_TMP_DIR') or None
+        self.batch_max_files = int(os.getenv('BATCH_MAX_FILES', '500'))
+        self.sse_keepalive_seconds = float(os.getenv('SSE_KEEPALIVE_SECONDS', '15'))
+        self.reprocessor = Reprocessor(self.document_service.textract_manager)
+        # Admin routes are refused unless a token is configured
+        self.admin_token = os.getenv('ADMIN_TOKEN') or None
 
     async def upload_document(self, file: UploadFile):
         if not file:
             raise HTTPException(status_code=400, detail="No file sent")
         
-        content = await file.read()
-        result = self.document_service.process_document(content, filename=file.filename)
-        return {"message": result}
+        # The job reads the document from disk, so the upload is never held in memory
+        upload_path = await self._spool_upload(file)
+        job = self.job_manager.submit(file_path=upload_path, filename=file.filename)
+        return {"message": "Document queued for processing", "job_id": job["job_id"], "status": job["status"]}
 
-    async def get_document(self, filename: str = None):
+    async def upload_batch(self, files: list[UploadFile], concurrency: int = None):
         """
-        Get the JSON output for a processed document.
-        If filename is provided, returns that specific file.
-        Otherwise, returns a list of available files.
+        Queue many documents in one request. ZIP archives are expanded into their
+        supported members. Files that cannot be accepted are reported, not fatal.
+
+        Outputs are named after the document, so a document whose name (without extension)
+        is already taken in the batch is rejected rather than overwriting the other's output.
         """
-        json_output_dir = "output/layout_output"
-        
-        # If no filename provided, list all available files
-        if not filename:
-            if not os.path.exists(json_output_dir):
-                return {"data": [], "message": "No documents processed yet"}
-            
-            files = [f for f in os.listdir(json_output_dir) if f.endswith('.json')]
-            return {
-                "data": files,
-                "message": f"Found {len(files)} processed document(s)"
-            }
-        
-        # If filename provided, return that specific file's content
-        file_path = os.path.join(json_output_dir, filename)
-        
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail=f"File '{filename}' not found")
-        
+        if not files:
+            raise HTTPException(status_code=400, detail="No files sent")
+
+        documents = []
+        rejected = []
+        output_names = set()
+        try:
+            for file in files:
+                try:
+                    upload_path = await self._spool_upload(file)
+                except HTTPException as e:
+                    rejected.append({"filename": file.filename, "detail": e.detail})
+                    continue
+
+                if (file.filename or "").lower().endswith(".zip"):
+                    candidates, member_errors = await run_in_threadpool(self._expand_zip, upload_path)
+                    os.remove(upload_path)
+                    rejected.extend(member_errors)
+                elif os.path.splitext(file.filename or "")[1].lower() in SUPPORTED_EXTENSIONS:
+                    candidates = [{"filename": file.filename, "file_path": upload_path}]
+                else:
+                    os.remove(upload_path)
+                    rejected.append({"filename": file.filename, "detail": "Unsupported file type"})
+                    continue
+
+                for document in candidates:
+                    # The name the outputs of the document are written under
+                    output_name = os.path.splitext(os.path.basename(document["filename"]))[0]
+                    if output_name in output_names:
+                        os.remove(document["file_path"])
+                        rejected.append({"filename": document["filename"], "detail": "Duplicate document name in the batch"})
+                    else:
+                        output_names.add(output_name)
+                        documents.append(document)
+
+                if len(documents) > self.batch_max_files:
+                    raise HTTPException(status_code=413, detail=f"Batches are limited to {self.batch_max_files} documents")
+        except Exception:
+            for document in documents:
+                os.remove(document["file_path"])
+            raise
+
+        if not documents:
+            raise HTTPException(status_code=400, detail={"message": "No supported documents in the batch", "rejected": rejected})
+
+        batch = self.job_manager.submit_batch(documents, concurrency=concurrency)
+        return {"message": f"Queued {len(documents)} document(s) for processing", "rejected": rejected, **batch}
+
+    async def get_batch(self, batch_id: str):
+        batch = self.job_manager.get_batch(batch_id)
+        if not batch:
+            raise HTTPException(status_code=404, detail=f"Batch '{batch_id}' not found")
+        return batch
+
+    def _expand_zip(self, zip_path: str):
+        """
+        Extracts the supported members of a ZIP archive to temporary files.
+
+        Members are named after their path in the archive with the directories joined by
+        '_' (e.g. 'a/report.pdf' becomes 'a_report.pdf'), so equal file names in different
+        folders stay apart.
+        """
+        documents = []
+        rejected = []
+        try:
+            with zipfile.ZipFile(zip_path) as archive:
+                for member in archive.infolist():
+                    name = os.path.basename(member.filename)
+                    if member.is_dir() or not name or name.startswith("."):
+                        continue
+                    if os.path.splitext(name)[1].lower() not in SUPPORTED_EXTENSIONS:
+                        rejected.append({"filename": member.filename, "detail": "Unsupported file type"})
+                        continue
+                    if member.file_size > self.max_upload_bytes:
+                        rejected.append({"filename": member.filename, "detail": "File exceeds the upload limit"})
+                        continue
+                    with archive.open(member) as source:
+                        member_path = self._spool_stream(source, name)
+                    if member_path is None:
+                        rejected.append({"filename": member.filename, "detail": "File exceeds the upload limit"})
+                        continue
+                    documents.append({"filename": self._member_name(member.filename), "file_path": member_path})
+        except zipfile.BadZipFile:
+            rejected.append({"filename": os.path.basename(zip_path), "detail": "Invalid ZIP archive"})
+        return documents, rejected
+
+    @staticmethod
+    def _member_name(member_filename: str) -> str:
+        """Flattens the path of a ZIP member into a file name, dropping '.', '..' and empty parts."""
+        parts = member_filename.replace("\\", "/").split("/")
+        return "_".join(part for part in parts if part not in ("", ".", ".."))
+
+    def _spool_stream(self, source, filename: str):
+        """Copies a readable stream to a temporary file; returns None if it exceeds MAX_UPLOAD_BYTES."""
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1], dir=self.upload_tmp_dir)
+        size = 0
+        with temp_file:
+            while chunk := source.read(self.upload_chunk_size):
+                size += len(chunk)
+                if size > self.max_upload_bytes:
+                    break
+                temp_file.write(chunk)
+        if size > self.max_upload_bytes:
+            os.remove(temp_file.name)
+            return None
+        return temp_file.name
+
+    async def _spool_upload(self, file: UploadFile) -> str:
+        """
+        Copies an upload to a temporary file in chunks, enforcing MAX_UPLOAD_BYTES as it goes.
+
+        :return: Path of the temporary file; the caller owns it
+        """
+        suffix = os.path.splitext(file.filename or "")[1]
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=self.upload_tmp_dir)
+        size = 0
+        try:
+            with temp_file, metrics.span("read_upload") as span:
+                while chunk := await file.read(self.upload_chunk_size):
+                    size += len(chunk)
+                    if size > self.max_upload_bytes:
+                        raise HTTPException(
+                            status_code=413,
+                            detail=f"File '{file.filename}' exceeds the {self.max_upload_bytes} byte upload limit"
+                        )
+                    temp_file.write(chunk)
+                span["bytes"] = size
+        except Exception:
+            os.remove(temp_file.name)
+            raise
+        return temp_file.name
+
+    async def get_cache_stats(self):
+        return self.document_service.textract_manager.result_cache.stats()
+
+    async def get_job(self, job_id: str):
+        job = self.job_manager.get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+        return job
+
+    async def stream_job_events(self, job_id: str, last_event_id: int = None, projection: dict = None):
+        """
+        Stream a job's status changes and per-page layout items as Server-Sent Events,
+        ending after its final status. EventSource clients resume from Last-Event-ID.
+        """
+        queue = self.job_manager.subscribe(job_id, after=last_event_id or 0)
+        if queue is None:
+            raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+        return StreamingResponse(
+            self._event_stream(job_id, queue, projection),
+            media_type="text/event-stream",
+            # Proxies must pass each event through as soon as it is written
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    async def _event_stream(self, job_id: str, queue, projection: dict = None):
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-            return {"data": data, "filename": filename}
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error reading file: {str(e)}")
+            while True:
+                try:
+                    event_id, event, data = await asyncio.wait_for(queue.get(), timeout=self.sse_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    # A comment line keeps idle connections from being closed while Textract runs
+                    yield ": keep-alive\n\n"
+                    continue
+                if event == "page" and projection:
+                    data = {**data, "items": project_layout(data["items"], projection)}
+                yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+                if event == "status" and data["status"] in FINISHED_STATES:
+                    break
+        finally:
+            self.job_manager.unsubscribe(job_id, queue)
+
+    @staticmethod
+    def projection_from_query(fields: str = None, types: str = None, polygons: bool = True):
+        try:
+            return parse_projection(fields, types, polygons)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def get_job_result(self, job_id: str, partial: bool = False, projection: dict = None):
+        job = self.job_manager.get_result(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+        if job["status"] not in FINISHED_STATES:
+            if partial:
+                # Layout items of the pages that are already processed
+                return await self._json_response({
+                    "job_id": job_id,
+                    "status": job["status"],
+                    "pages_completed": job["pages_completed"],
+                    "message": {"status": "partial", "message": "Document is still processing",
+                                "data": project_layout(job["partial_data"], projection)}
+                })
+            raise HTTPException(status_code=409, detail=f"Job '{job_id}' is still {job['status']}")
+        message = job["result"]
+        if projection and message.get("data"):
+            message = {**message, "data": project_layout(message["data"], projection)}
+        return await self._json_response({"job_id": job_id, "status": job["status"], "message": message})
+
+    @staticmethod
+    async def _json_response(content):
+        # Large layouts are projected and encoded off the event loop
+        return await run_in_threadpool(FastJSONResponse, content)
+
+    async def get_artifact(self, document_name: str, kind: str):
+        """
+        Get the raw '_original' or '_response' artifact of a processed document,
+        materializing it on first read.
+        """
+        output_writer = self.document_service.textract_manager.output_writer
+        try:
+            data = await run_in_threadpool(output_writer.read_artifact, document_name, kind)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if data is None:
+            raise HTTPException(status_code=404, detail=f"No '{kind}' artifact for '{document_name}'")
+        return await self._json_response({"data": data, "document": document_name, "artifact": kind})
+
+    async def list_documents(self, limit: int = 50, cursor: str = None, document_hash: str = None):
+        """
+        List processed documents from the catalog, most recent first.
+        Pass next_cursor back as cursor to get the following page.
+        """
+        catalog = self.document_service.textract_manager.document_catalog
+        try:
+            documents, next_cursor = await run_in_threadpool(catalog.list, limit, cursor, document_hash)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"data": documents, "next_cursor": next_cursor}
+
+    async def get_document(self, document_name: str, include_layout: bool = False):
+        """
+        Get the catalog entry of a processed document, optionally with its layout output.
+        """
+        document = await run_in_threadpool(self.document_service.textract_manager.document_catalog.get, document_name)
+        if document is None:
+            raise HTTPException(status_code=404, detail=f"Document '{document_name}' not found")
+        if include_layout:
+            layout_path = (document["artifacts"] or {}).get("layout")
+            if not layout_path or not os.path.exists(layout_path):
+                raise HTTPException(status_code=404, detail=f"No layout output for '{document_name}'")
+            document["layout"] = await run_in_threadpool(self._read_json, layout_path)
+        return await self._json_response({"data": document})
+
+    async def get_document_pages(self, document_name: str, pages: str, projection: dict = None):
+        """
+        Get the layout items of one page ("3") or a page range ("3-7") of a processed
+        document, reading only those pages from its stored layout output.
+        """
+        try:
+            first, _, last = pages.partition("-")
+            first_page, last_page = int(first), int(last or first)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid page range '{pages}', expected N or N-M")
+        if first_page < 1 or last_page < first_page:
+            raise HTTPException(status_code=400, detail=f"Invalid page range '{pages}'")
+
+        output_writer = self.document_service.textract_manager.output_writer
+        items = await run_in_threadpool(output_writer.read_layout_pages, document_name, first_page, last_page)
+        if items is None:
+            raise HTTPException(status_code=404, detail=f"No layout output for '{document_name}'")
+
+        if projection:
+            data = project_layout(json.loads(items), projection)
+            return await self._json_response(
+                {"document": document_name, "pages": [first_page, last_page], "data": data}
+            )
+        # The stored JSON of the pages is passed through without being parsed
+        header = json.dumps({"document": document_name, "pages": [first_page, last_page]})[:-1]
+        return Response(content=header.encode() + b', "data": ' + items + b"}", media_type="application/json")
+
+    async def search(self, query: str, limit: int = 20, offset: int = 0, document_name: str = None):
+        """
+        Search the layout text and table cells of processed documents; hits carry the
+        page and bounding box of the matching text.
+        """
+        search_index = self.document_service.textract_manager.search_index
+        if not search_index.enabled:
+            raise HTTPException(status_code=503, detail="Search is disabled")
+        hits = await run_in_threadpool(search_index.search, query, limit, offset, document_name)
+        return {"query": query, "hits": hits}
+
+    def _check_admin_token(self, token: str = None):
+        if self.admin_token is None:
+            raise HTTPException(status_code=403, detail="Admin routes are disabled, set ADMIN_TOKEN to enable them")
+        if token is None or not hmac.compare_digest(token.encode(), self.admin_token.encode()):
+            raise HTTPException(status_code=401, detail="Invalid admin token")
+
+    async def start_reprocess(self, token: str = None, force: bool = False, documents: list[str] = None):
+        """
+        Rebuild the layout output, catalog entry and search segments of stored documents
+        from their raw Textract responses, in the background. Layouts already produced by
+        the current code and settings are skipped unless force is set.
+        """
+        self._check_admin_token(token)
+        try:
+            status = self.reprocessor.start(force=force, names=documents or None)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return {"message": "Reprocessing started", "status": status}
+
+    async def get_reprocess_status(self, token: str = None):
+        self._check_admin_token(token)
+        status = self.reprocessor.get_status()
+        if status is None:
+            raise HTTPException(status_code=404, detail="No reprocessing run has been started")
+        return {"status": status}
+
+    @staticmethod
+    def _read_json(path: str):
+        with open(path, 'rb') as f:
+            return json.load(f)
@@ -0,0 +1,20 @@
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson when it is installed.
+
+    Controllers return it directly for large payloads, which also skips FastAPI's
+    jsonable_encoder pass over every nested value.
+    """
+
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
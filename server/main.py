@@ -1,8 +1,31 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers.document_router import router as document_router
+from fastapi.responses import PlainTextResponse
+from middleware.compression import CompressionMiddleware
+from middleware.request_size import MaxRequestSizeMiddleware
+from middleware.request_timing import RequestTimingMiddleware
+from services import metrics
+from controllers.responses import FastJSONResponse
+from routers.document_router import router as document_router, controller as document_controller
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Async Textract jobs interrupted by a restart are finished from their journaled JobId
+    document_controller.job_manager.resume_interrupted()
+    yield
+    # Stop accepting new jobs; jobs waiting on an async Textract job unwind when the poller
+    # stops below and stay journaled, so the next start resumes them
+    document_controller.job_manager.shutdown(wait=False)
+    # A running reprocessing run finishes the documents already in its pool and stops
+    document_controller.reprocessor.shutdown()
+    # Flush artifact writes that are still queued and stop the postprocessing workers
+    document_controller.document_service.textract_manager.shutdown()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Allow frontends from other origins/ports (e.g., Vite dev server)
 app.add_middleware(
@@ -13,9 +36,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Stop oversized uploads while they stream in rather than after they are spooled
+app.add_middleware(MaxRequestSizeMiddleware, max_request_bytes=int(os.getenv('MAX_REQUEST_BYTES', str(1024 ** 3))))
+
+# Large JSON results compress well (brotli when installed, otherwise gzip)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', '1024')),
+    gzip_level=int(os.getenv('GZIP_LEVEL', '5')),
+    brotli_quality=int(os.getenv('BROTLI_QUALITY', '4'))
+)
+
+# Outermost, so request durations include the other middlewares; SERVER_TIMING=true adds a
+# Server-Timing header with the per-stage breakdown of each request
+app.add_middleware(RequestTimingMiddleware, server_timing=os.getenv('SERVER_TIMING', 'false').lower() == 'true')
+
 app.include_router(document_router, prefix="/api/v1", tags=["documents"])
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    """Stage latency histograms and service gauges in the Prometheus text format."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 def read_root():
     return {"message": "Hello, World!, this is"}
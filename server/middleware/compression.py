@@ -0,0 +1,82 @@
+import gzip
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Types worth compressing; images, PDFs and archives are already compressed
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml")
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 5, brotli_quality: int = 4,
+                 thread_minimum_size: int = 256 * 1024):
+        """
+        Compresses response bodies with brotli (when installed and accepted) or gzip.
+
+        Only complete bodies are compressed; streamed responses such as Server-Sent Events
+        are passed through so every event still reaches the client immediately.
+
+        :param minimum_size: Smaller bodies are sent as they are
+        :param thread_minimum_size: Larger bodies are compressed in a worker thread, off the event loop
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.thread_minimum_size = thread_minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        if brotli is not None and "br" in accept_encoding:
+            encoding = "br"
+        elif "gzip" in accept_encoding:
+            encoding = "gzip"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def compressing_send(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Held back until the first body message shows whether the response is streamed
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=list(start.get("headers", [])))
+            if (message.get("more_body") or len(body) < self.minimum_size or "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)):
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= self.thread_minimum_size:
+                body = await run_in_threadpool(self._compress, body, encoding)
+            else:
+                body = self._compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, compressing_send)
+
+    def _compress(self, body, encoding):
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
@@ -0,0 +1,39 @@
+from fastapi import HTTPException
+from starlette.responses import PlainTextResponse
+
+
+class MaxRequestSizeMiddleware:
+    def __init__(self, app, max_request_bytes: int):
+        """
+        Rejects request bodies larger than max_request_bytes with 413.
+
+        The limit is enforced while the body is streamed in, so an oversized upload is
+        stopped before it is fully spooled to disk.
+        """
+        self.app = app
+        self.max_request_bytes = max_request_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.max_request_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", []))
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_request_bytes:
+            response = PlainTextResponse("Request body too large", status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_request_bytes:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
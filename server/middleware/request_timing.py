@@ -0,0 +1,46 @@
+import time
+from services import metrics
+
+
+class RequestTimingMiddleware:
+    def __init__(self, app, server_timing: bool = False):
+        """
+        Records the duration of every HTTP request and collects the stage spans recorded
+        while serving it.
+
+        :param server_timing: Add a Server-Timing header with the per-stage breakdown
+        """
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        with metrics.trace() as request_trace:
+            async def timed_send(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    if self.server_timing:
+                        elapsed = (time.perf_counter() - start) * 1000
+                        value = request_trace.server_timing()
+                        value = f"{value}, total;dur={elapsed:.1f}" if value else f"total;dur={elapsed:.1f}"
+                        message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, timed_send)
+            finally:
+                # Route templates keep the label set small; unmatched paths share one label
+                route = scope.get("route")
+                metrics.HTTP_REQUEST_DURATION.observe(
+                    time.perf_counter() - start,
+                    method=scope["method"],
+                    route=getattr(route, "path", "unmatched"),
+                    status=status
+                )
@@ -0,0 +1,37 @@
+"""
+Rebuilds the layout output, catalog rows and search segments of stored documents from their
+raw Textract responses ('_original' artifacts, or result cache entries), without calling
+Textract again. Layouts already produced by the current post-processing code and settings
+are skipped.
+
+Usage (from the server directory):
+    python reprocess.py
+    python reprocess.py --force --document invoice_20240101_120000 --workers 8
+"""
+import argparse
+import json
+import sys
+
+from services.reprocessor import Reprocessor
+from services.textract_service import TextractManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--force", action="store_true", help="Rebuild layouts that are up to date too")
+    parser.add_argument("--document", action="append", dest="documents", metavar="NAME",
+                        help="Only this document (output name, repeatable)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: REPROCESS_WORKERS or one per CPU)")
+    args = parser.parse_args()
+
+    manager = TextractManager()
+    try:
+        status = Reprocessor(manager, workers=args.workers).run(force=args.force, names=args.documents)
+    finally:
+        manager.shutdown()
+    print(json.dumps(status, indent=2))
+    return 1 if status["failed"] or status["state"] != "completed" else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, Header, Query
 from controllers.document_controller import DocumentController
 
 router = APIRouter()
@@ -6,4 +6,67 @@ controller = DocumentController()
 
 @router.post("/upload")
 async def upload_document(file: UploadFile = File(...)):
-    return await controller.upload_document(file)
\ No newline at end of file
+    return await controller.upload_document(file)
+
+@router.post("/upload/batch")
+async def upload_batch(files: list[UploadFile] = File(...), concurrency: int | None = Query(None, ge=1)):
+    return await controller.upload_batch(files, concurrency)
+
+@router.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    return await controller.get_batch(batch_id)
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return await controller.get_job(job_id)
+
+# Layout projection: ?fields=text,page drops geometry, ?types=table keeps tables only,
+# ?polygons=false keeps bounding boxes only
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, last_event_id: int | None = Header(None), fields: str | None = None,
+                            types: str | None = None, polygons: bool = True):
+    projection = controller.projection_from_query(fields, types, polygons)
+    return await controller.stream_job_events(job_id, last_event_id, projection)
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, partial: bool = False, fields: str | None = None,
+                         types: str | None = None, polygons: bool = True):
+    projection = controller.projection_from_query(fields, types, polygons)
+    return await controller.get_job_result(job_id, partial, projection)
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return await controller.get_cache_stats()
+
+@router.get("/documents")
+async def list_documents(limit: int = Query(50, ge=1, le=1000), cursor: str | None = None,
+                         document_hash: str | None = Query(None, alias="hash")):
+    return await controller.list_documents(limit, cursor, document_hash)
+
+@router.get("/search")
+async def search(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=200), offset: int = Query(0, ge=0),
+                 document: str | None = None):
+    return await controller.search(q, limit, offset, document)
+
+@router.get("/documents/{document_name}")
+async def get_document(document_name: str, include_layout: bool = False):
+    return await controller.get_document(document_name, include_layout)
+
+@router.get("/documents/{document_name}/pages/{pages}")
+async def get_document_pages(document_name: str, pages: str, fields: str | None = None,
+                             types: str | None = None, polygons: bool = True):
+    projection = controller.projection_from_query(fields, types, polygons)
+    return await controller.get_document_pages(document_name, pages, projection)
+
+@router.get("/documents/{document_name}/artifacts/{kind}")
+async def get_artifact(document_name: str, kind: str):
+    return await controller.get_artifact(document_name, kind)
+
+@router.post("/admin/reprocess", status_code=202)
+async def start_reprocess(force: bool = False, document: list[str] | None = Query(None),
+                          x_admin_token: str | None = Header(None)):
+    return await controller.start_reprocess(x_admin_token, force, document)
+
+@router.get("/admin/reprocess")
+async def get_reprocess_status(x_admin_token: str | None = Header(None)):
+    return await controller.get_reprocess_status(x_admin_token)
@@ -0,0 +1,58 @@
+from collections import defaultdict
+from functools import cached_property
+
+TEXT_BLOCK_TYPES = ('WORD', 'LINE')
+
+
+class BlockIndex:
+    def __init__(self, blocks):
+        """
+        Indexes the blocks of a Textract response in a single pass so the enrichment and
+        output stages never rescan the full block list.
+
+        The id, type, page and parent->children maps are built up front; the
+        WORD/LINE-free view is built on first use and then reused. LINE and WORD blocks,
+        most of a response, are only kept in the id and type maps: no stage walks below
+        a LINE.
+
+        :param blocks: The 'Blocks' list of a Textract response
+        """
+        self.blocks = blocks
+        self.by_id = by_id = {}
+        self.by_type = by_type = defaultdict(list)
+        # Page number -> blocks other than WORD and LINE, in response order
+        self.by_page = by_page = defaultdict(list)
+        # Parent block id (other than LINE) -> ids of its CHILD blocks, in relationship order
+        self.children = children = {}
+        # LAYOUT_* blocks in response order, which the layout sort relies on for ties
+        self.layout_blocks = layout_blocks = []
+
+        for block in blocks:
+            block_type = block['BlockType']
+            by_id[block['Id']] = block
+            by_type[block_type].append(block)
+            if block_type not in TEXT_BLOCK_TYPES:
+                by_page[block.get('Page', 1)].append(block)
+                if block_type[:7] == 'LAYOUT_':
+                    layout_blocks.append(block)
+                for rel in block.get('Relationships', ()):
+                    if rel['Type'] == 'CHILD':
+                        ids = children.get(block['Id'])
+                        # The block's own list is shared until a second CHILD relationship needs a copy
+                        children[block['Id']] = rel['Ids'] if ids is None else ids + rel['Ids']
+
+    @cached_property
+    def structural_blocks(self):
+        """Every block except WORD and LINE, in response order."""
+        return [block for block in self.blocks if block['BlockType'] not in TEXT_BLOCK_TYPES]
+
+    def of_type(self, block_type):
+        return self.by_type.get(block_type, [])
+
+    def child_blocks(self, block, block_types=None):
+        """Yields the CHILD blocks of a non-WORD/LINE block, optionally restricted to block_types."""
+        by_id = self.by_id
+        for child_id in self.children.get(block['Id'], ()):
+            child = by_id.get(child_id)
+            if child and (block_types is None or child['BlockType'] in block_types):
+                yield child
@@ -0,0 +1,373 @@
+from array import array
+from collections import Counter
+from collections.abc import Sequence
+
+# Blocks per list when a store is encoded or written, bounding the dicts alive at once
+BLOCK_CHUNK_SIZE = 2048
+
+# Keys held in the columns of a BlockStore rather than in its per-block extras
+COLUMN_KEYS = frozenset(('BlockType', 'Id', 'Page', 'Confidence', 'Geometry', 'Relationships', 'Text'))
+NO_ID = bytes(16)
+NO_PAGE = 0
+NO_CONFIDENCE = float('nan')
+NO_BOX = (0.0, 0.0, 0.0, 0.0)
+# Key orders of the geometry held in columns, Textract's own; other orders are kept as is.
+# AnalyzeDocument adds the RotationAngle of the block, which older responses lack.
+GEOMETRY_KEYS = ('BoundingBox', 'Polygon')
+ROTATED_GEOMETRY_KEYS = ('BoundingBox', 'Polygon', 'RotationAngle')
+# Codes of the geometry shapes: no RotationAngle, a float one, an integer one
+NO_ROTATION, FLOAT_ROTATION, INT_ROTATION = 0, 1, 2
+BOX_KEYS = ('Width', 'Height', 'Left', 'Top')
+POINT_KEYS = ('X', 'Y')
+
+
+def _pack_id(block_id):
+    """16 bytes of a lowercase UUID string, or None for any other id."""
+    if type(block_id) is not str or len(block_id) != 36 or block_id != block_id.lower():
+        return None
+    if block_id[8] != '-' or block_id[13] != '-' or block_id[18] != '-' or block_id[23] != '-':
+        return None
+    try:
+        return bytes.fromhex(block_id.replace('-', ''))
+    except ValueError:
+        return None
+
+
+def _unpack_id(packed):
+    h = packed.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def _compact_geometry(geometry):
+    """
+    Rotation code and angle, and bounding box values followed by polygon coordinates, of a
+    plain Textract Geometry, or None.
+    """
+    try:
+        box = geometry['BoundingBox']
+        keys = tuple(geometry)
+        if keys == GEOMETRY_KEYS:
+            rotation, angle = NO_ROTATION, 0.0
+        elif keys == ROTATED_GEOMETRY_KEYS:
+            angle = geometry['RotationAngle']
+            if type(angle) is float:
+                rotation = FLOAT_ROTATION
+            elif type(angle) is int and int(float(angle)) == angle:
+                rotation = INT_ROTATION
+            else:
+                return None
+        else:
+            return None
+        if tuple(box) != BOX_KEYS:
+            return None
+        values = [box['Width'], box['Height'], box['Left'], box['Top']]
+        for point in geometry['Polygon']:
+            if tuple(point) != POINT_KEYS:
+                return None
+            values += (point['X'], point['Y'])
+    except (KeyError, TypeError):
+        return None
+    # Integers would come back as floats
+    for value in values:
+        if type(value) is not float:
+            return None
+    return rotation, angle, values
+
+
+class CompactBlocks(Sequence):
+    """
+    Read-only sequence of blocks held in compact columns. Each access builds a new dict,
+    so callers that walk every block should use chunks() and drop each chunk in turn.
+    """
+
+    def chunks(self, size=BLOCK_CHUNK_SIZE):
+        """Yields the blocks as lists of at most size dicts."""
+        chunk = []
+        for block in self:
+            chunk.append(block)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class BlockStore(CompactBlocks):
+    def __init__(self, blocks=()):
+        """
+        Column store of Textract blocks, a fraction of the size of the boto dicts.
+
+        Ids and relationship ids are kept as 16-byte UUIDs, block types and relationship
+        types as small codes, pages, confidences and geometry in typed arrays, and texts
+        are deduplicated. Any value that does not fit a column (another id format, extra
+        Geometry keys, enrichment fields such as TableData) is kept as is, so every block
+        is materialized with the same keys, key order and values it was added with.
+
+        :param blocks: Blocks to add, e.g. the 'Blocks' list of a Textract response
+        """
+        self._names = []
+        self._name_codes = {}
+        # Key order of each block, shared by all blocks with the same keys
+        self._shapes = []
+        self._shape_codes = {}
+        # Keys of each shape that are not held in columns
+        self._shape_extras = []
+        self._strings = {}
+        self._shared_extras = {}
+
+        self._shape = array('H')
+        self._types = array('H')
+        self._ids = bytearray()
+        self._pages = array('I')
+        self._confidences = array('d')
+        self._boxes = array('d')
+        self._rotation_kinds = array('B')
+        self._rotations = array('d')
+        self._polygon_ends = array('I')
+        self._polygons = array('d')
+        self._relationship_ends = array('I')
+        self._relationship_types = array('H')
+        self._relationship_id_ends = array('I')
+        self._relationship_ids = bytearray()
+        self._texts = []
+        self._extras = []
+
+        self.extend(blocks)
+
+    def __len__(self):
+        return len(self._types)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._block(i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("block index out of range")
+        return self._block(position)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._block(i)
+
+    def _code(self, name):
+        code = self._name_codes.get(name)
+        if code is None:
+            code = self._name_codes[name] = len(self._names)
+            self._names.append(name)
+        return code
+
+    def extend(self, blocks):
+        """Adds blocks in order. The dicts are not kept and may be dropped by the caller."""
+        for block in blocks:
+            self.append(block)
+
+    def append(self, block):
+        extras = {}
+        get = block.get
+
+        block_type = get('BlockType')
+        if type(block_type) is str:
+            self._types.append(self._code(block_type))
+        else:
+            self._types.append(self._code(None))
+            extras['BlockType'] = block_type
+
+        packed = _pack_id(get('Id'))
+        if packed is None:
+            packed = NO_ID
+            if 'Id' in block:
+                extras['Id'] = block['Id']
+        self._ids += packed
+
+        page = get('Page')
+        if type(page) is int and 0 < page < 2 ** 32:
+            self._pages.append(page)
+        else:
+            self._pages.append(NO_PAGE)
+            if 'Page' in block:
+                extras['Page'] = page
+
+        confidence = get('Confidence')
+        if type(confidence) is float:
+            self._confidences.append(confidence)
+        else:
+            self._confidences.append(NO_CONFIDENCE)
+            if 'Confidence' in block:
+                extras['Confidence'] = confidence
+
+        geometry = get('Geometry')
+        compact = _compact_geometry(geometry) if geometry is not None else None
+        if compact is not None:
+            rotation, angle, values = compact
+            self._boxes.extend(values[:4])
+            self._polygons.extend(values[4:])
+            self._rotation_kinds.append(rotation)
+            self._rotations.append(angle)
+        else:
+            self._boxes.extend(NO_BOX)
+            self._rotation_kinds.append(NO_ROTATION)
+            self._rotations.append(0.0)
+            if 'Geometry' in block:
+                extras['Geometry'] = geometry
+        self._polygon_ends.append(len(self._polygons))
+
+        if 'Relationships' in block and not self._add_relationships(block['Relationships']):
+            extras['Relationships'] = block['Relationships']
+        self._relationship_ends.append(len(self._relationship_types))
+
+        text = get('Text')
+        if type(text) is str:
+            self._texts.append(self._strings.setdefault(text, text))
+        else:
+            self._texts.append(None)
+            if 'Text' in block:
+                extras['Text'] = text
+
+        shape = tuple(block)
+        code = self._shape_codes.get(shape)
+        if code is None:
+            code = self._shape_codes[shape] = len(self._shapes)
+            self._shapes.append(shape)
+            self._shape_extras.append(tuple(key for key in shape if key not in COLUMN_KEYS))
+        self._shape.append(code)
+
+        for key in self._shape_extras[code]:
+            extras[key] = block[key]
+        self._extras.append(self._share(extras) if extras else None)
+
+    def _add_relationships(self, relationships):
+        if type(relationships) is not list:
+            return False
+        groups = []
+        for rel in relationships:
+            if type(rel) is not dict or len(rel) != 2 or type(rel.get('Type')) is not str:
+                return False
+            if type(rel.get('Ids')) is not list:
+                return False
+            packed = [_pack_id(child_id) for child_id in rel['Ids']]
+            if None in packed:
+                return False
+            groups.append((rel['Type'], packed))
+        for rel_type, packed in groups:
+            self._relationship_types.append(self._code(rel_type))
+            self._relationship_ids += b"".join(packed)
+            self._relationship_id_ends.append(len(self._relationship_ids) // 16)
+        return True
+
+    def _share(self, extras):
+        """Returns one dict for every block with the same hashable extra values, e.g. TextType."""
+        try:
+            key = tuple(extras.items())
+            hash(key)
+        except TypeError:
+            return extras
+        return self._shared_extras.setdefault(key, extras)
+
+    def _block(self, i):
+        extras = self._extras[i]
+        block = {}
+        for key in self._shapes[self._shape[i]]:
+            if extras is not None and key in extras:
+                block[key] = extras[key]
+            elif key == 'Geometry':
+                boxes, polygons = self._boxes, self._polygons
+                j = i * 4
+                geometry = block[key] = {
+                    'BoundingBox': {'Width': boxes[j], 'Height': boxes[j + 1], 'Left': boxes[j + 2], 'Top': boxes[j + 3]},
+                    'Polygon': [
+                        {'X': polygons[k], 'Y': polygons[k + 1]}
+                        for k in range(self._polygon_ends[i - 1] if i else 0, self._polygon_ends[i], 2)
+                    ]
+                }
+                rotation = self._rotation_kinds[i]
+                if rotation == FLOAT_ROTATION:
+                    geometry['RotationAngle'] = self._rotations[i]
+                elif rotation == INT_ROTATION:
+                    geometry['RotationAngle'] = int(self._rotations[i])
+            elif key == 'Id':
+                block[key] = _unpack_id(self._ids[i * 16:i * 16 + 16])
+            elif key == 'BlockType':
+                block[key] = self._names[self._types[i]]
+            elif key == 'Text':
+                block[key] = self._texts[i]
+            elif key == 'Confidence':
+                block[key] = self._confidences[i]
+            elif key == 'Page':
+                block[key] = self._pages[i]
+            elif key == 'Relationships':
+                block[key] = self._relationships(i)
+        return block
+
+    def _relationships(self, i):
+        relationships = []
+        ids = self._relationship_ids
+        for group in range(self._relationship_ends[i - 1] if i else 0, self._relationship_ends[i]):
+            start = self._relationship_id_ends[group - 1] if group else 0
+            relationships.append({
+                'Type': self._names[self._relationship_types[group]],
+                'Ids': [_unpack_id(ids[j * 16:j * 16 + 16]) for j in range(start, self._relationship_id_ends[group])]
+            })
+        return relationships
+
+    def block_type(self, i):
+        extras = self._extras[i]
+        if extras is not None and 'BlockType' in extras:
+            return extras['BlockType']
+        return self._names[self._types[i]]
+
+    def type_counts(self):
+        """Number of blocks of each BlockType, without materializing any block."""
+        counts = Counter(self._types)
+        return {self._names[code]: count for code, count in counts.items() if self._names[code] is not None}
+
+    def excluding(self, block_types):
+        """View of the blocks whose BlockType is not in block_types, e.g. without WORD and LINE."""
+        codes = {self._name_codes[name] for name in block_types if name in self._name_codes}
+        return BlockView(self, array('I', (i for i, code in enumerate(self._types) if code not in codes)))
+
+
+class BlockView(CompactBlocks):
+    """Blocks of a BlockStore at the given positions, in that order."""
+
+    def __init__(self, store, positions):
+        self.store = store
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.store._block(i) for i in self.positions[position]]
+        return self.store._block(self.positions[position])
+
+    def __iter__(self):
+        for i in self.positions:
+            yield self.store._block(i)
+
+
+def iter_json(data, dumps, chunk_size=BLOCK_CHUNK_SIZE):
+    """
+    Yields the JSON of a response dict in pieces, encoding the blocks of CompactBlocks
+    values chunk_size at a time instead of materializing all of them.
+
+    :param dumps: Callable returning the compact JSON bytes of a value
+    """
+    yield b"{"
+    for n, (key, value) in enumerate(data.items()):
+        yield (b"," if n else b"") + dumps(key) + b":"
+        if not isinstance(value, CompactBlocks):
+            yield dumps(value)
+            continue
+        yield b"["
+        for m, chunk in enumerate(value.chunks(chunk_size)):
+            # Each chunk is a JSON array; only its elements are written
+            yield (b"," if m else b"") + dumps(chunk)[1:-1]
+        yield b"]"
+    yield b"}"
+
+
+def materialize(data):
+    """Copy of a response dict with CompactBlocks values turned back into lists of dicts."""
+    return {key: list(value) if isinstance(value, CompactBlocks) else value for key, value in data.items()}
@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_SUFFIX = "_layout.json"
+
+# Columns returned by list(); get() returns every column
+SUMMARY_COLUMNS = (
+    "id", "name", "source_name", "document_hash", "page_count", "block_count", "layout_item_count",
+    "route", "from_cache", "processed_at"
+)
+JSON_COLUMNS = ("feature_types", "block_counts", "timings", "artifacts")
+COLUMNS = SUMMARY_COLUMNS + JSON_COLUMNS
+
+
+class DocumentCatalog:
+    def __init__(self, db_path=None, enabled=None):
+        """
+        Persistent catalog with one row per processed document.
+
+        Rows are keyed on the output name (the same base name as the output files) and hold
+        the document hash, page and block counts, per-stage timings, feature types and
+        artifact paths. Listing uses keyset pagination on an index, so its cost does not
+        grow with the number of documents.
+
+        :param db_path: SQLite file holding the catalog (default: DOCUMENT_CATALOG_PATH)
+        :param enabled: Turn the catalog on or off (default: DOCUMENT_CATALOG_ENABLED)
+        """
+        self.enabled = enabled if enabled is not None else os.getenv('DOCUMENT_CATALOG_ENABLED', 'true').lower() == 'true'
+        self.db_path = db_path or os.getenv('DOCUMENT_CATALOG_PATH', 'output/catalog/documents.sqlite3')
+        self.lock = threading.Lock()
+        self.conn = None
+
+        if self.enabled:
+            self._open()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, source_name TEXT, document_hash TEXT, "
+            "page_count INTEGER, block_count INTEGER, layout_item_count INTEGER, route TEXT, from_cache INTEGER, "
+            "processed_at REAL NOT NULL, feature_types TEXT, block_counts TEXT, timings TEXT, artifacts TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_processed ON documents (processed_at DESC, id DESC)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents (document_hash)")
+        self.conn.commit()
+        logger.info(f"Document catalog opened at {self.db_path}")
+
+    def import_existing(self, layout_dir):
+        """
+        Adds the documents of an output directory processed before the catalog existed.
+
+        Only runs while the catalog is empty. Those rows carry the name, layout path and
+        file time only; processing the document again fills in the rest.
+        """
+        if not self.enabled or not os.path.isdir(layout_dir):
+            return
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone():
+                return
+            rows = []
+            with os.scandir(layout_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(LAYOUT_SUFFIX):
+                        rows.append((
+                            entry.name[:-len(LAYOUT_SUFFIX)], entry.stat().st_mtime, json.dumps({"layout": entry.path})
+                        ))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO documents (name, processed_at, artifacts) VALUES (?, ?, ?)", rows
+            )
+            self.conn.commit()
+        if rows:
+            logger.info(f"Imported {len(rows)} existing document(s) into the catalog")
+
+    def record(self, name, **fields):
+        """
+        Inserts or replaces the row of a processed document.
+
+        :param name: Output name of the document
+        :param fields: Values of the other columns; feature_types, block_counts, timings
+                       and artifacts are stored as JSON
+        """
+        if not self.enabled:
+            return
+
+        values = {column: fields.get(column) for column in COLUMNS if column not in ("id", "name")}
+        values["processed_at"] = values["processed_at"] or time.time()
+        for column in JSON_COLUMNS:
+            if values[column] is not None:
+                values[column] = json.dumps(values[column], separators=(",", ":"))
+        if values["from_cache"] is not None:
+            values["from_cache"] = int(bool(values["from_cache"]))
+
+        columns = list(values)
+        try:
+            with self.lock:
+                self.conn.execute(
+                    f"INSERT INTO documents (name, {', '.join(columns)}) VALUES (?{', ?' * len(columns)}) "
+                    f"ON CONFLICT(name) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in columns)}",
+                    [name, *values.values()]
+                )
+                self.conn.commit()
+        except sqlite3.Error:
+            # The outputs are already written; a missing catalog row must not fail the document
+            logger.exception(f"Could not record {name} in the document catalog")
+
+    def update(self, name, **fields):
+        """
+        Updates some columns of a document's row and leaves the others as they are.
+
+        :return: Whether the document has a row
+        """
+        if not self.enabled:
+            return False
+
+        values = {column: fields[column] for column in COLUMNS if column in fields and column not in ("id", "name")}
+        for column in JSON_COLUMNS:
+            if values.get(column) is not None:
+                values[column] = json.dumps(values[column], separators=(",", ":"))
+        if not values:
+            return self.get(name) is not None
+        try:
+            with self.lock:
+                cursor = self.conn.execute(
+                    f"UPDATE documents SET {', '.join(f'{c} = ?' for c in values)} WHERE name = ?", [*values.values(), name]
+                )
+                self.conn.commit()
+        except sqlite3.Error:
+            logger.exception(f"Could not update {name} in the document catalog")
+            return False
+        return cursor.rowcount > 0
+
+    def add_artifacts(self, name, artifacts):
+        """
+        Adds paths to the artifacts of a document's row, keeping those already recorded.
+
+        :return: Whether the document has a row
+        """
+        if not self.enabled:
+            return False
+        try:
+            with self.lock:
+                cursor = self.conn.execute(
+                    "UPDATE documents SET artifacts = json_patch(COALESCE(artifacts, '{}'), ?) WHERE name = ?",
+                    (json.dumps(artifacts, separators=(",", ":")), name)
+                )
+                self.conn.commit()
+        except sqlite3.Error:
+            logger.exception(f"Could not update the artifacts of {name} in the document catalog")
+            return False
+        return cursor.rowcount > 0
+
+    def hashed_documents(self):
+        """Return (name, document_hash, feature_types) of every document whose hash is known."""
+        if not self.enabled:
+            return []
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT name, document_hash, feature_types FROM documents WHERE document_hash IS NOT NULL"
+            ).fetchall()
+        return [(name, document_hash, json.loads(feature_types) if feature_types else None)
+                for name, document_hash, feature_types in rows]
+
+    def get(self, name):
+        """Return the catalog row of a document, or None if it is unknown."""
+        if not self.enabled:
+            return None
+        with self.lock:
+            row = self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM documents WHERE name = ?", (name,)).fetchone()
+        return self._to_dict(COLUMNS, row) if row else None
+
+    def list(self, limit=50, cursor=None, document_hash=None):
+        """
+        Return one page of documents, most recently processed first.
+
+        :param limit: Maximum number of documents in the page
+        :param cursor: next_cursor of the previous page
+        :param document_hash: Only list documents with this SHA-256 hex digest
+        :return: Tuple of (documents, next_cursor); next_cursor is None on the last page
+        :raises ValueError: If the cursor is malformed
+        """
+        if not self.enabled:
+            return [], None
+
+        conditions, params = [], []
+        if cursor:
+            processed_at, last_id = self._parse_cursor(cursor)
+            conditions.append("(processed_at, id) < (?, ?)")
+            params += [processed_at, last_id]
+        if document_hash:
+            conditions.append("document_hash = ?")
+            params.append(document_hash)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM documents {where} "
+                f"ORDER BY processed_at DESC, id DESC LIMIT ?",
+                [*params, limit + 1]
+            ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = dict(zip(SUMMARY_COLUMNS, rows[-1]))
+            next_cursor = f"{last['processed_at']!r}:{last['id']}"
+        return [self._to_dict(SUMMARY_COLUMNS, row) for row in rows], next_cursor
+
+    def close(self):
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
+                self.conn = None
+
+    @staticmethod
+    def _parse_cursor(cursor):
+        try:
+            processed_at, last_id = cursor.split(":")
+            return float(processed_at), int(last_id)
+        except ValueError:
+            raise ValueError(f"Invalid cursor: {cursor}")
+
+    @staticmethod
+    def _to_dict(columns, row):
+        document = dict(zip(columns, row))
+        for column in JSON_COLUMNS:
+            if document.get(column) is not None:
+                document[column] = json.loads(document[column])
+        if document.get("from_cache") is not None:
+            document["from_cache"] = bool(document["from_cache"])
+        document["processed_at"] = datetime.fromtimestamp(document["processed_at"], timezone.utc).isoformat()
+        return document
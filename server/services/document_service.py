@@ -2,6 +2,7 @@ import logging
 import os
 import json
 from services.textract_service import TextractManager
+from services import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -11,13 +12,19 @@ class DocumentService:
         """Initialize the DocumentService with TextractManager."""
         self.textract_manager = TextractManager()
     
-    def process_document(self, file_content: bytes, filename: str = None, feature_types: list = None) -> dict:
+    def process_document(self, file_content: bytes = None, filename: str = None, feature_types: list = None, progress_callback=None, page_callback=None, file_path: str = None,
+                         job_reference: str = None, resume_job: dict = None) -> dict:
         """
         Process a document using AWS Textract.
         
-        :param file_content: The document file content as bytes
+        :param file_content: The document file content as bytes (optional if file_path is provided)
         :param filename: Optional filename to determine file type (PDF vs image)
         :param feature_types: List of features to extract (default: ["LAYOUT", "TABLES", "FORMS"])
+        :param progress_callback: Optional callable receiving the name of each pipeline stage
+        :param page_callback: Optional callable receiving (page_number, layout_items) as each page is ready
+        :param file_path: Path to the document on disk, streamed instead of loaded into memory
+        :param job_reference: Identifier of the caller's job, kept in the job journal
+        :param resume_job: Job journal entry of an interrupted async job to finish instead
         :return: Dictionary with Textract analysis results
         """
         try:
@@ -25,12 +32,19 @@ class DocumentService:
             
             # Use the TextractManager to process the document
             # This will automatically save 3 JSON files if filename is provided
-            result = self.textract_manager.process_document(
-                file_bytes=file_content,
-                feature_types=feature_types,
-                save_files=True if filename else False,
-                output_base_path=filename if filename else None
-            )
+            with metrics.span("process_document") as span:
+                result = self.textract_manager.process_document(
+                    file_path=file_path,
+                    file_bytes=file_content,
+                    feature_types=feature_types,
+                    save_files=True if filename else False,
+                    output_base_path=filename if filename else None,
+                    progress_callback=progress_callback,
+                    page_callback=page_callback,
+                    job_reference=job_reference,
+                    resume_job=resume_job
+                )
+                span.update(blocks=len(result['Blocks']), pages=result.get('DocumentMetadata', {}).get('Pages', 0))
             
             logger.info("Document processed successfully")
             return {
@@ -47,3 +61,6 @@ class DocumentService:
                 "data": None
             }
 
+    def claim_interrupted_jobs(self) -> list:
+        """Return the journaled async jobs left unfinished by a process that has stopped."""
+        return self.textract_manager.job_journal.claim_orphaned()
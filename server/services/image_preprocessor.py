@@ -0,0 +1,195 @@
+import io
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services import metrics
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_PREPROCESSING_SUPPORTED = Image is not None
+
+# EXIF Orientation tag; kept so the re-encoded image is shown and analyzed the same way as the upload
+EXIF_ORIENTATION = 0x0112
+OUTPUT_FORMATS = ("jpeg", "png")
+# Re-encodes of an image still over the size limit, each at a smaller scale
+MAX_SHRINK_ATTEMPTS = 3
+
+BYTES_SAVED = metrics.REGISTRY.counter(
+    "ocr_image_preprocess_bytes_saved_total", "Upload bytes removed by image pre-processing"
+)
+# The time spent is in ocr_stage_duration_seconds{stage="preprocess_image"}
+TRANSFER_SECONDS_SAVED = metrics.REGISTRY.counter(
+    "ocr_image_preprocess_transfer_seconds_saved_total", "Estimated upload time saved by image pre-processing"
+)
+
+
+class ImagePreprocessor:
+    def __init__(self, enabled=None, target_dpi=None, max_side=None, grayscale=None, output_format=None,
+                 jpeg_quality=None, min_bytes=None, max_bytes=None, uplink_mbps=None, workers=None):
+        """
+        Shrinks uploaded images before they are sent to AnalyzeDocument.
+
+        Images are downscaled to at most target_dpi and max_side pixels on the long side,
+        converted to grayscale and re-encoded, on a small thread pool (Pillow releases the
+        GIL while decoding, resizing and encoding). Textract geometry is relative to the
+        page, so bounding boxes are unaffected; the EXIF orientation is carried over.
+
+        :param enabled: Turn pre-processing on (default: IMAGE_PREPROCESS_ENABLED or false; needs Pillow)
+        :param target_dpi: Images declaring a higher DPI are scaled down to it (default: IMAGE_PREPROCESS_TARGET_DPI or 300)
+        :param max_side: Longest side in pixels after pre-processing (default: IMAGE_PREPROCESS_MAX_SIDE or 3000)
+        :param grayscale: Convert to grayscale (default: IMAGE_PREPROCESS_GRAYSCALE or true)
+        :param output_format: "jpeg" or "png" (default: IMAGE_PREPROCESS_FORMAT or "jpeg")
+        :param jpeg_quality: JPEG quality (default: IMAGE_PREPROCESS_JPEG_QUALITY or 85)
+        :param min_bytes: Smaller images are sent as uploaded (default: IMAGE_PREPROCESS_MIN_BYTES or 512 KiB)
+        :param max_bytes: Size the result must fit, AnalyzeDocument's limit (default: IMAGE_PREPROCESS_MAX_BYTES or 10 MiB)
+        :param uplink_mbps: Upload bandwidth to Textract, for the latency saved estimate (default: IMAGE_PREPROCESS_UPLINK_MBPS or 50)
+        :param workers: Images pre-processed at once, bounding decode memory (default: IMAGE_PREPROCESS_WORKERS or 2)
+        """
+        self.enabled = enabled if enabled is not None else os.getenv('IMAGE_PREPROCESS_ENABLED', 'false').lower() == 'true'
+        self.target_dpi = target_dpi or int(os.getenv('IMAGE_PREPROCESS_TARGET_DPI', '300'))
+        self.max_side = max_side or int(os.getenv('IMAGE_PREPROCESS_MAX_SIDE', '3000'))
+        self.grayscale = grayscale if grayscale is not None else os.getenv('IMAGE_PREPROCESS_GRAYSCALE', 'true').lower() == 'true'
+        self.output_format = output_format or os.getenv('IMAGE_PREPROCESS_FORMAT', 'jpeg')
+        self.jpeg_quality = jpeg_quality or int(os.getenv('IMAGE_PREPROCESS_JPEG_QUALITY', '85'))
+        self.min_bytes = min_bytes if min_bytes is not None else int(os.getenv('IMAGE_PREPROCESS_MIN_BYTES', str(512 * 1024)))
+        self.max_bytes = max_bytes or int(os.getenv('IMAGE_PREPROCESS_MAX_BYTES', str(10 * 1024 * 1024)))
+        uplink_mbps = uplink_mbps or float(os.getenv('IMAGE_PREPROCESS_UPLINK_MBPS', '50'))
+        self.uplink_bytes_per_second = uplink_mbps * 1_000_000 / 8
+        self.executor = None
+
+        if self.output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported image pre-processing format: {self.output_format}")
+        if self.enabled and Image is None:
+            logger.warning("IMAGE_PREPROCESS_ENABLED is set but Pillow is not installed, images are sent as uploaded")
+            self.enabled = False
+        if self.enabled:
+            self.executor = ThreadPoolExecutor(
+                max_workers=workers or int(os.getenv('IMAGE_PREPROCESS_WORKERS', '2')),
+                thread_name_prefix="image-preprocess"
+            )
+
+    def preprocess(self, file_path=None, file_bytes=None):
+        """
+        Returns the image to send to AnalyzeDocument.
+
+        The upload is returned unchanged when pre-processing is off, the image is small,
+        cannot be decoded (or has several frames), or the re-encoded image is not smaller.
+
+        :param file_path: Path to the image (optional if file_bytes is provided)
+        :param file_bytes: Byte content of the image (optional if file_path is provided)
+        :return: Byte content of the image to analyze
+        """
+        if file_bytes is None:
+            with open(file_path, 'rb') as f:
+                file_bytes = f.read()
+        if not self.enabled or len(file_bytes) < self.min_bytes:
+            return file_bytes
+
+        start = time.perf_counter()
+        with metrics.span("preprocess_image", bytes_in=len(file_bytes)) as span:
+            try:
+                processed, details = self.executor.submit(self._process, file_bytes).result()
+            except Exception as e:
+                # Pre-processing is an optimization; Textract gets the upload as is
+                logger.warning(f"Could not pre-process image, sending it as uploaded: {e}")
+                return file_bytes
+            if processed is None or len(processed) >= len(file_bytes):
+                span["bytes_out"] = len(file_bytes)
+                return file_bytes
+
+            bytes_saved = len(file_bytes) - len(processed)
+            transfer_seconds_saved = bytes_saved / self.uplink_bytes_per_second
+            span.update(bytes_out=len(processed), bytes_saved=bytes_saved,
+                        transfer_seconds_saved=round(transfer_seconds_saved, 6), **details)
+        BYTES_SAVED.inc(bytes_saved)
+        TRANSFER_SECONDS_SAVED.inc(transfer_seconds_saved)
+        seconds_saved = transfer_seconds_saved - (time.perf_counter() - start)
+        logger.info(
+            f"Pre-processed image {details['size_in']} -> {details['size_out']}: {len(file_bytes)} -> {len(processed)} bytes, "
+            f"about {seconds_saved * 1000:.0f} ms less to send"
+        )
+        return processed
+
+    def _process(self, file_bytes):
+        """Decodes, scales, converts and re-encodes an image; returns (bytes or None, details)."""
+        image = Image.open(io.BytesIO(file_bytes))
+        if getattr(image, "n_frames", 1) > 1:
+            return None, {}
+        size_in = image.size
+        orientation = image.getexif().get(EXIF_ORIENTATION)
+        dpi = image.info.get("dpi")
+        if not dpi or not dpi[0] or not dpi[1]:
+            dpi = None
+
+        scale = min(1.0, self.max_side / max(size_in))
+        if dpi and dpi[0] > self.target_dpi:
+            scale = min(scale, self.target_dpi / float(dpi[0]))
+
+        # JPEG decoding can skip straight to a reduced size and to grayscale
+        image.draft("L" if self.grayscale else image.mode, (math.ceil(size_in[0] * scale), math.ceil(size_in[1] * scale)))
+        image = self._convert(image)
+
+        for _ in range(MAX_SHRINK_ATTEMPTS):
+            size_out = (max(1, round(size_in[0] * scale)), max(1, round(size_in[1] * scale)))
+            resized = image.resize(size_out, Image.Resampling.LANCZOS, reducing_gap=3.0) if size_out != image.size else image
+            encoded = self._encode(resized, orientation, dpi and (dpi[0] * scale, dpi[1] * scale))
+            if len(encoded) <= self.max_bytes:
+                break
+            # Pixel count, and so roughly the encoded size, shrinks with the square of the scale
+            scale *= math.sqrt(self.max_bytes / len(encoded)) * 0.9
+        return encoded, {"size_in": f"{size_in[0]}x{size_in[1]}", "size_out": f"{size_out[0]}x{size_out[1]}"}
+
+    def _convert(self, image):
+        if image.mode.startswith("I") or image.mode == "F":
+            image = self._to_8_bit(image)
+        if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+            # Transparent areas become white paper rather than the (often black) color under them
+            rgba = image.convert("RGBA")
+            image = Image.new("RGBA", rgba.size, "white")
+            image.alpha_composite(rgba)
+        if self.grayscale and image.mode != "1":
+            return image.convert("L")
+        if image.mode not in ("1", "L", "RGB"):
+            return image.convert("RGB")
+        return image
+
+    @staticmethod
+    def _to_8_bit(image):
+        """
+        Rescales a 16-bit, 32-bit or float grayscale image to 8 bits. convert("L") would
+        clip it, turning a typical 16-bit scan all white.
+        """
+        if image.mode != "F":
+            image = image.convert("I")
+        low, high = image.getextrema()
+        # The image's own range is stretched over 0-255, whatever its bit depth; a blank
+        # (single-valued) page becomes white
+        scale, offset = (255.0 / (high - low), 0.0) if high > low else (0.0, 255.0)
+        return image.point(lambda v: (v - low) * scale + offset).convert("L")
+
+    def _encode(self, image, orientation, dpi):
+        buffer = io.BytesIO()
+        options = {}
+        if orientation and orientation != 1:
+            exif = Image.Exif()
+            exif[EXIF_ORIENTATION] = orientation
+            options["exif"] = exif.tobytes()
+        if dpi:
+            options["dpi"] = (round(dpi[0]), round(dpi[1]))
+        # Bilevel scans compress far better, and without artifacts, as PNG
+        if self.output_format == "png" or image.mode == "1":
+            image.save(buffer, "PNG", optimize=True, **options)
+        else:
+            image.save(buffer, "JPEG", quality=self.jpeg_quality, optimize=True, **options)
+        return buffer.getvalue()
+
+    def shutdown(self, wait=True):
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
@@ -0,0 +1,190 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_RUNNING = "running"
+JOURNAL_COMPLETED = "completed"
+JOURNAL_FAILED = "failed"
+JOURNAL_EXPIRED = "expired"
+
+COLUMNS = (
+    "textract_job_id", "document_hash", "feature_types", "s3_key", "source_name", "job_reference",
+    "page_count", "state", "error", "owner_pid", "owner_instance", "created_at", "updated_at"
+)
+
+# (pid, instance id) of this process; a process forked after import gets its own id
+_instance = (None, None)
+
+
+def _feature_key(feature_types):
+    return ",".join(sorted(feature_types or []))
+
+
+def instance_id():
+    """
+    Random id of this process, recorded with the PID of the jobs it owns. A restarted
+    server often gets its old PID back (PID 1 in a container), so the PID alone cannot
+    tell the jobs of the dead process from those of the live one.
+    """
+    global _instance
+    pid = os.getpid()
+    if _instance[0] != pid:
+        _instance = (pid, uuid.uuid4().hex)
+    return _instance[1]
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobJournal:
+    def __init__(self, db_path=None, enabled=None, max_age_hours=None):
+        """
+        Durable journal of async Textract jobs, so a restart neither loses a running job
+        nor pays for a new one.
+
+        A row is written as soon as StartDocumentAnalysis returns and stays "running" until
+        the document's outputs are stored. Each row records the process that owns it (PID and
+        instance id); rows whose owner has died are claimed on startup and processed from
+        their JobId.
+
+        :param db_path: SQLite file holding the journal (default: JOB_JOURNAL_PATH)
+        :param enabled: Turn the journal on or off (default: JOB_JOURNAL_ENABLED)
+        :param max_age_hours: Age after which a job's results are gone from Textract and
+                              its row is no longer resumed (default: JOB_JOURNAL_MAX_AGE_HOURS or 168)
+        """
+        self.enabled = enabled if enabled is not None else os.getenv('JOB_JOURNAL_ENABLED', 'true').lower() == 'true'
+        self.db_path = db_path or os.getenv('JOB_JOURNAL_PATH', 'output/catalog/jobs.sqlite3')
+        # Textract keeps the results of async jobs for 7 days
+        self.max_age = (max_age_hours or float(os.getenv('JOB_JOURNAL_MAX_AGE_HOURS', '168'))) * 3600
+        self.lock = threading.Lock()
+        self.conn = None
+
+        if self.enabled:
+            self._open()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS textract_jobs ("
+            "textract_job_id TEXT PRIMARY KEY, document_hash TEXT NOT NULL, feature_key TEXT NOT NULL, "
+            "feature_types TEXT NOT NULL, s3_key TEXT, source_name TEXT, job_reference TEXT, page_count INTEGER, "
+            "state TEXT NOT NULL, error TEXT, owner_pid INTEGER, owner_instance TEXT, created_at REAL NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(textract_jobs)")}
+        if "owner_instance" not in columns:
+            # Journals written before instance ids were recorded
+            self.conn.execute("ALTER TABLE textract_jobs ADD COLUMN owner_instance TEXT")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_textract_jobs_document ON textract_jobs (document_hash, feature_key, state)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_textract_jobs_state ON textract_jobs (state)")
+        self.conn.commit()
+        logger.info(f"Job journal opened at {self.db_path}")
+
+    def record_started(self, textract_job_id, document_hash, feature_types, s3_key=None, source_name=None,
+                       job_reference=None, page_count=None):
+        """Records a job that StartDocumentAnalysis has just accepted."""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO textract_jobs (textract_job_id, document_hash, feature_key, feature_types, "
+                "s3_key, source_name, job_reference, page_count, state, owner_pid, owner_instance, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (textract_job_id, document_hash, _feature_key(feature_types), json.dumps(feature_types), s3_key,
+                 source_name, job_reference, page_count, JOURNAL_RUNNING, os.getpid(), instance_id(), now, now)
+            )
+            self.conn.commit()
+
+    def mark(self, textract_job_id, state, error=None):
+        """Moves a job to "completed" or "failed" once its outputs are stored or it has failed."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.conn.execute(
+                "UPDATE textract_jobs SET state = ?, error = ?, updated_at = ? WHERE textract_job_id = ?",
+                (state, error, time.time(), textract_job_id)
+            )
+            self.conn.commit()
+
+    def find_running(self, document_hash, feature_types):
+        """Return the most recent running job for a document and feature types, or None."""
+        if not self.enabled:
+            return None
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM textract_jobs "
+                "WHERE document_hash = ? AND feature_key = ? AND state = ? AND created_at > ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (document_hash, _feature_key(feature_types), JOURNAL_RUNNING, time.time() - self.max_age)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def claim_orphaned(self):
+        """
+        Takes over the running jobs whose owning process is gone.
+
+        Jobs too old to still have results in Textract are marked "expired" instead, and
+        finished rows past that age are dropped.
+
+        :return: List of the claimed jobs
+        """
+        if not self.enabled:
+            return []
+        now = time.time()
+        claimed = []
+        with self.lock:
+            self.conn.execute(
+                "UPDATE textract_jobs SET state = ?, updated_at = ? WHERE state = ? AND created_at <= ?",
+                (JOURNAL_EXPIRED, now, JOURNAL_RUNNING, now - self.max_age)
+            )
+            self.conn.execute(
+                "DELETE FROM textract_jobs WHERE state != ? AND updated_at <= ?", (JOURNAL_RUNNING, now - self.max_age)
+            )
+            rows = self.conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM textract_jobs WHERE state = ? ORDER BY created_at",
+                (JOURNAL_RUNNING,)
+            ).fetchall()
+            pid = os.getpid()
+            instance = instance_id()
+            for row in rows:
+                job = self._to_dict(row)
+                if job["owner_instance"] == instance:
+                    continue
+                # Another live process (e.g. a sibling worker) owns the job, unless its PID is
+                # ours: then the owner was an earlier run of this process
+                if job["owner_pid"] and job["owner_pid"] != pid and _process_alive(job["owner_pid"]):
+                    continue
+                # Compare-and-set, so only one of several starting workers claims each job
+                cursor = self.conn.execute(
+                    "UPDATE textract_jobs SET owner_pid = ?, owner_instance = ?, updated_at = ? "
+                    "WHERE textract_job_id = ? AND owner_instance IS ? AND state = ?",
+                    (pid, instance, now, job["textract_job_id"], job["owner_instance"], JOURNAL_RUNNING)
+                )
+                if cursor.rowcount:
+                    claimed.append(job)
+            self.conn.commit()
+        return claimed
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(zip(COLUMNS, row))
+        job["feature_types"] = json.loads(job["feature_types"])
+        return job
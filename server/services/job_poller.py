@@ -0,0 +1,319 @@
+import heapq
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+THROTTLING_ERROR_CODES = ("ThrottlingException", "ProvisionedThroughputExceededException", "LimitExceededException")
+
+
+class JobPollerStopped(Exception):
+    """The poller was stopped before the job finished; the job itself may still be running."""
+
+
+class JobWaitTimeout(TimeoutError):
+    """A wait for a job timed out; the job itself may still be running."""
+
+
+class LocalNotificationQueue:
+    """
+    In-process stand-in for the SNS -> SQS completion channel of Textract.
+
+    Messages have the same shape as SQS deliveries of SNS notifications, so anything that
+    can fake a Textract job completion (tests, the simulator) can publish to it.
+    """
+
+    def __init__(self):
+        self.messages = queue.Queue()
+
+    def publish(self, job_id, status, api="StartDocumentAnalysis"):
+        self.messages.put({
+            "Type": "Notification",
+            "Message": json.dumps({"JobId": job_id, "Status": status, "API": api, "Timestamp": int(time.time() * 1000)})
+        })
+
+    def receive(self, handle, timeout=20):
+        """Passes the next notification to handle(message); there is no other consumer to leave it to."""
+        try:
+            message = self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return
+        handle(message)
+
+
+class SqsNotificationQueue:
+    def __init__(self, sqs_client, queue_url, release_delay=None, max_receives=None):
+        """
+        Reads Textract completion notifications from an SQS queue subscribed to the SNS topic.
+
+        Several workers may share the queue, so a notification is only deleted by the
+        worker waiting for its job. The others hand it back, visible again after
+        release_delay seconds. One that no worker takes within max_receives deliveries
+        (e.g. for a job whose process has exited) is deleted.
+
+        :param release_delay: Seconds before a handed back notification is delivered again
+                              (default: TEXTRACT_SQS_RELEASE_DELAY or 2)
+        :param max_receives: Deliveries after which an unclaimed notification is deleted
+                             (default: TEXTRACT_SQS_MAX_RECEIVES or 30)
+        """
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.release_delay = int(release_delay if release_delay is not None else os.getenv('TEXTRACT_SQS_RELEASE_DELAY', '2'))
+        self.max_receives = max_receives or int(os.getenv('TEXTRACT_SQS_MAX_RECEIVES', '30'))
+
+    def receive(self, handle, timeout=20):
+        """
+        Passes each received notification to handle(message), which returns whether a job
+        of this process was waiting for it.
+        """
+        response = self.sqs_client.receive_message(
+            QueueUrl=self.queue_url, MaxNumberOfMessages=10, WaitTimeSeconds=min(int(timeout), 20),
+            AttributeNames=["ApproximateReceiveCount"]
+        )
+        for message in response.get("Messages", []):
+            receipt_handle = message["ReceiptHandle"]
+            receives = int(message.get("Attributes", {}).get("ApproximateReceiveCount", 1))
+            if handle(json.loads(message["Body"])) or receives >= self.max_receives:
+                self.sqs_client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt_handle)
+            else:
+                # Another worker may be waiting for this job
+                self.sqs_client.change_message_visibility(
+                    QueueUrl=self.queue_url, ReceiptHandle=receipt_handle, VisibilityTimeout=self.release_delay
+                )
+
+
+class TextractJobPoller:
+    def __init__(self, textract_client, min_interval=None, max_interval=None, backoff_factor=None, per_page_interval=None,
+                 rate_limiter=None, wait_timeout=None):
+        """
+        Tracks every outstanding Textract job from a single background thread.
+
+        Each job is polled with exponential backoff: the first poll is scheduled from the
+        expected page count, and later polls back off with the time already spent waiting.
+        Completion notifications (SNS/SQS style) trigger an immediate fetch instead.
+
+        :param textract_client: boto3 Textract client used for GetDocumentAnalysis
+        :param min_interval: Shortest delay between polls in seconds (default: TEXTRACT_POLL_MIN_INTERVAL or 1)
+        :param max_interval: Longest delay between polls in seconds (default: TEXTRACT_POLL_MAX_INTERVAL or 20)
+        :param backoff_factor: Growth of the delay after each unfinished poll (default: TEXTRACT_POLL_BACKOFF or 1.5)
+        :param per_page_interval: Extra initial delay per expected page (default: TEXTRACT_POLL_PER_PAGE or 0.25)
+        :param rate_limiter: Optional TextractRateLimiter shared with the other Textract calls
+        :param wait_timeout: Longest wait() for a job in seconds (default: TEXTRACT_JOB_WAIT_TIMEOUT or 3600)
+        """
+        self.textract_client = textract_client
+        self.rate_limiter = rate_limiter
+        self.min_interval = min_interval or float(os.getenv('TEXTRACT_POLL_MIN_INTERVAL', '1'))
+        self.max_interval = max_interval or float(os.getenv('TEXTRACT_POLL_MAX_INTERVAL', '20'))
+        self.backoff_factor = backoff_factor or float(os.getenv('TEXTRACT_POLL_BACKOFF', '1.5'))
+        self.per_page_interval = per_page_interval or float(os.getenv('TEXTRACT_POLL_PER_PAGE', '0.25'))
+        self.wait_timeout = wait_timeout or float(os.getenv('TEXTRACT_JOB_WAIT_TIMEOUT', '3600'))
+
+        self.jobs = {}
+        self.schedule = []
+        self.condition = threading.Condition()
+        self.poll_count = 0
+        self.thread = None
+        self.listener_thread = None
+        self.stopped = False
+
+    def register(self, job_id, callback, page_count=None):
+        """
+        Start tracking a job. callback(job_id, response, error) fires once the job finishes,
+        with the final GetDocumentAnalysis response or the error that ended polling.
+        Registering a job that is already tracked adds another callback. Once the poller is
+        stopped, callback fires at once with JobPollerStopped.
+        """
+        with self.condition:
+            if not self.stopped:
+                job = self.jobs.get(job_id)
+                if job:
+                    job["callbacks"].append(callback)
+                    return
+
+                now = time.monotonic()
+                delay = self.min_interval + self.per_page_interval * (page_count or 1)
+                job = {
+                    "callbacks": [callback],
+                    "started": now,
+                    "delay": min(delay, self.max_interval),
+                    "next_poll": now + min(delay, self.max_interval),
+                }
+                self.jobs[job_id] = job
+                heapq.heappush(self.schedule, (job["next_poll"], job_id))
+                self._ensure_started()
+                self.condition.notify()
+                return
+        callback(job_id, None, JobPollerStopped(f"Stopped before Textract job {job_id} finished"))
+
+    def wait(self, job_id, page_count=None, timeout=None):
+        """
+        Block the calling thread until the job finishes and return the final response.
+
+        :param timeout: Seconds to wait (default: the poller's wait_timeout)
+        :raises JobWaitTimeout: If the job has not finished in time
+        :raises JobPollerStopped: If the poller is stopped first
+        """
+        done = threading.Event()
+        outcome = {}
+
+        def on_complete(_, response, error):
+            outcome["response"] = response
+            outcome["error"] = error
+            done.set()
+
+        timeout = timeout or self.wait_timeout
+        self.register(job_id, on_complete, page_count=page_count)
+        if not done.wait(timeout):
+            self._unregister(job_id, on_complete)
+            raise JobWaitTimeout(f"Textract job {job_id} did not finish within {timeout} seconds")
+        if outcome["error"]:
+            raise outcome["error"]
+        return outcome["response"]
+
+    def _unregister(self, job_id, callback):
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job and callback in job["callbacks"]:
+                job["callbacks"].remove(callback)
+                if not job["callbacks"]:
+                    # Its schedule entry is skipped as stale
+                    del self.jobs[job_id]
+
+    def notify(self, message):
+        """
+        Handle a Textract completion notification. Accepts the raw Textract message, an SNS
+        envelope, or an SQS delivery of either (dict or JSON string).
+
+        :return: Whether the notification is for a job this poller tracks
+        """
+        if isinstance(message, (str, bytes)):
+            message = json.loads(message)
+        if "Message" in message:
+            return self.notify(message["Message"])
+
+        job_id = message.get("JobId")
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if not job:
+                return False
+            logger.info(f"Received {message.get('Status')} notification for job {job_id}")
+            job["next_poll"] = time.monotonic()
+            heapq.heappush(self.schedule, (job["next_poll"], job_id))
+            self.condition.notify()
+        return True
+
+    def listen(self, notification_queue):
+        """Consume completion notifications from a LocalNotificationQueue or SqsNotificationQueue."""
+        def consume():
+            while not self.stopped:
+                try:
+                    notification_queue.receive(self.notify)
+                except Exception:
+                    logger.exception("Error receiving Textract notifications")
+                    time.sleep(self.min_interval)
+
+        self.listener_thread = threading.Thread(target=consume, name="textract-notifications", daemon=True)
+        self.listener_thread.start()
+
+    def stop(self):
+        """
+        Stops polling and fails every waiting job with JobPollerStopped, so the threads
+        blocked in wait() unwind. The Textract jobs keep running; the job journal resumes
+        them on the next start.
+        """
+        with self.condition:
+            self.stopped = True
+            jobs, self.jobs = self.jobs, {}
+            self.schedule.clear()
+            self.condition.notify_all()
+        for job_id, job in jobs.items():
+            error = JobPollerStopped(f"Stopped before Textract job {job_id} finished")
+            for callback in job["callbacks"]:
+                try:
+                    callback(job_id, None, error)
+                except Exception:
+                    logger.exception(f"Completion callback for job {job_id} failed")
+
+    def _ensure_started(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="textract-poller", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                job_id = self._next_due_job()
+                if job_id is None:
+                    return
+            self._poll(job_id)
+
+    def _next_due_job(self):
+        while not self.stopped:
+            if not self.schedule:
+                self.condition.wait()
+                continue
+            next_poll, job_id = self.schedule[0]
+            job = self.jobs.get(job_id)
+            if job is None or job["next_poll"] != next_poll:
+                # Stale entry left behind by a notification or a finished job
+                heapq.heappop(self.schedule)
+                continue
+            delay = next_poll - time.monotonic()
+            if delay > 0:
+                self.condition.wait(delay)
+                continue
+            heapq.heappop(self.schedule)
+            return job_id
+        return None
+
+    def _poll(self, job_id):
+        try:
+            if self.rate_limiter:
+                self.rate_limiter.acquire('GetDocumentAnalysis')
+            self.poll_count += 1
+            response = self.textract_client.get_document_analysis(JobId=job_id)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES:
+                logger.info(f"Throttled while polling job {job_id}, backing off")
+                self._reschedule(job_id)
+            else:
+                self._finish(job_id, None, e)
+            return
+        except Exception as e:
+            self._finish(job_id, None, e)
+            return
+
+        status = response['JobStatus']
+        logger.info(f"Job {job_id} status: {status}")
+        if status == 'IN_PROGRESS':
+            self._reschedule(job_id)
+        else:
+            self._finish(job_id, response, None)
+
+    def _reschedule(self, job_id):
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if not job:
+                return
+            now = time.monotonic()
+            elapsed = now - job["started"]
+            # Long-running jobs are probably big; don't poll them more often than a tenth of their age
+            job["delay"] = min(self.max_interval, max(job["delay"] * self.backoff_factor, elapsed / 10))
+            job["next_poll"] = now + job["delay"]
+            heapq.heappush(self.schedule, (job["next_poll"], job_id))
+
+    def _finish(self, job_id, response, error):
+        with self.condition:
+            job = self.jobs.pop(job_id, None)
+        if not job:
+            return
+        for callback in job["callbacks"]:
+            try:
+                callback(job_id, response, error)
+            except Exception:
+                logger.exception(f"Completion callback for job {job_id} failed")
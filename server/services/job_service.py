@@ -0,0 +1,324 @@
+import asyncio
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_PROCESSING = "processing"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class JobManager:
+    def __init__(self, document_service, max_workers=None, max_retained_jobs=None):
+        """
+        Runs document processing in a bounded worker pool so uploads return immediately.
+
+        :param document_service: DocumentService used to run the Textract pipeline
+        :param max_workers: Number of documents processed concurrently (default: JOB_WORKERS or 32)
+        :param max_retained_jobs: Finished jobs kept in memory for status/result lookups
+                                  (default: JOB_RETENTION or 1000)
+        """
+        self.document_service = document_service
+        self.max_workers = max_workers or int(os.getenv('JOB_WORKERS', '32'))
+        self.max_retained_jobs = max_retained_jobs or int(os.getenv('JOB_RETENTION', '1000'))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="document-job")
+        self.batch_concurrency = int(os.getenv('BATCH_CONCURRENCY', '8'))
+        self.jobs = OrderedDict()
+        self.batches = {}
+        # job_id -> [(event loop, asyncio.Queue)] of the clients streaming the job's events
+        self.subscribers = {}
+        self.lock = threading.Lock()
+        metrics.REGISTRY.gauge("ocr_jobs", "Retained document jobs by status", self._count_by_status, label_names=("status",))
+
+    def submit(self, file_content: bytes = None, filename: str = None, feature_types: list = None, file_path: str = None) -> dict:
+        """
+        Queue a document for processing.
+
+        :param file_content: The document file content as bytes (optional if file_path is provided)
+        :param filename: Original filename, used for output files and PDF detection
+        :param feature_types: List of features to extract
+        :param file_path: Temporary file holding the document; it is deleted once the job finishes
+        :return: Public view of the newly created job
+        """
+        with self.lock:
+            job = self._create_job(filename)
+            self._evict_finished_jobs()
+            view = self._public_view(job)
+
+        self.executor.submit(self._run_job, job["job_id"], file_content, filename, feature_types, file_path)
+        logger.info(f"Queued job {job['job_id']} for {filename if filename else 'uploaded file'}")
+        return view
+
+    def submit_batch(self, documents: list, concurrency: int = None, feature_types: list = None) -> dict:
+        """
+        Queue many documents at once. At most `concurrency` documents of the batch run at the
+        same time, so one large batch cannot take over the whole worker pool.
+
+        :param documents: List of dicts with 'filename' and 'file_path' (deleted once processed)
+        :param concurrency: Documents of this batch processed in parallel (default: BATCH_CONCURRENCY or 8)
+        :param feature_types: List of features to extract
+        :return: Public view of the batch and its jobs
+        """
+        batch_id = uuid.uuid4().hex
+        with self.lock:
+            jobs = [self._create_job(document.get("filename"), batch_id=batch_id) for document in documents]
+            self.batches[batch_id] = {
+                "batch_id": batch_id,
+                "job_ids": [job["job_id"] for job in jobs],
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "concurrency": concurrency or self.batch_concurrency,
+                "running": 0,
+                "pending": deque(
+                    (job["job_id"], None, document.get("filename"), feature_types, document.get("file_path"))
+                    for job, document in zip(jobs, documents)
+                ),
+            }
+            self._evict_finished_jobs()
+
+        self._dispatch_batch(batch_id)
+        logger.info(f"Queued batch {batch_id} with {len(documents)} document(s)")
+        return self.get_batch(batch_id)
+
+    def get_batch(self, batch_id: str) -> dict:
+        """Return the batch with the status of every job, or None if unknown."""
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            if not batch:
+                return None
+            jobs = [self._public_view(self.jobs[job_id]) for job_id in batch["job_ids"] if job_id in self.jobs]
+        counts = {}
+        for job in jobs:
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "batch_id": batch_id,
+            "created_at": batch["created_at"],
+            "total": len(batch["job_ids"]),
+            "counts": counts,
+            "jobs": jobs,
+        }
+
+    def get_job(self, job_id: str) -> dict:
+        """Return the status of a job without its result, or None if unknown."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return self._public_view(job) if job else None
+
+    def get_result(self, job_id: str) -> dict:
+        """Return the full job including its result, or None if unknown."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return None
+            job = dict(job)
+            job["partial_data"] = list(job["partial_data"])
+            return job
+
+    def subscribe(self, job_id: str, after: int = 0):
+        """
+        Streams the events of a job to the calling event loop.
+
+        Events are (sequence number, type, data) tuples: "status" with the public view of
+        the job on every state change, and "page" with the layout items of each finished
+        page. Events published after `after` are replayed first; a finished job only
+        replays its final status.
+
+        :param job_id: The job to follow
+        :param after: Sequence number of the last event the client already has
+        :return: asyncio.Queue receiving the events, or None if the job is unknown
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return None
+            events = [event for event in job["events"] if event[0] > after]
+            if not events and job["status"] in FINISHED_STATES:
+                # Lets a reconnecting client see the end of the stream again
+                events = job["events"][-1:]
+            for event in events:
+                queue.put_nowait(event)
+            self.subscribers.setdefault(job_id, []).append((loop, queue))
+        return queue
+
+    def unsubscribe(self, job_id: str, queue):
+        with self.lock:
+            subscribers = self.subscribers.get(job_id, [])
+            subscribers[:] = [(loop, q) for loop, q in subscribers if q is not queue]
+            if not subscribers:
+                self.subscribers.pop(job_id, None)
+
+    def resume_interrupted(self) -> list:
+        """
+        Queue the async Textract jobs a previous process started but did not finish, so
+        their results are collected from Textract instead of the documents being uploaded
+        and analyzed again. Resumed jobs keep their job id, so clients can keep polling it.
+
+        :return: Public views of the resumed jobs
+        """
+        views = []
+        for journal_entry in self.document_service.claim_interrupted_jobs():
+            filename = journal_entry["source_name"]
+            with self.lock:
+                job = self._create_job(filename, job_id=journal_entry["job_reference"])
+                views.append(self._public_view(job))
+            self.executor.submit(
+                self._run_job, job["job_id"], None, filename, journal_entry["feature_types"], None, journal_entry
+            )
+            logger.info(f"Resuming job {job['job_id']} on Textract job {journal_entry['textract_job_id']}")
+        return views
+
+    def shutdown(self, wait: bool = False):
+        self.executor.shutdown(wait=wait)
+
+    def _run_job(self, job_id, file_content, filename, feature_types, file_path, resume_job=None):
+        self._update_job(job_id, status=JOB_PROCESSING, stage="started")
+        job_trace = None
+        try:
+            with metrics.trace() as job_trace:
+                result = self.document_service.process_document(
+                    file_content,
+                    filename=filename,
+                    feature_types=feature_types,
+                    file_path=file_path,
+                    progress_callback=lambda stage: self._update_job(job_id, stage=stage),
+                    page_callback=lambda page_number, items: self._add_page(job_id, page_number, items),
+                    job_reference=job_id,
+                    resume_job=resume_job
+                )
+        except Exception as e:
+            logger.exception(f"Job {job_id} crashed")
+            result = {
+                "status": "error",
+                "message": f"Failed to process document: {str(e)}",
+                "data": None
+            }
+        finally:
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
+
+        # Per-stage timings of this job, reported with its status
+        timings = job_trace.breakdown() if job_trace else {}
+        if result.get("status") == "success":
+            status = JOB_SUCCEEDED
+            self._update_job(job_id, status=status, stage="completed", result=result, partial_data=[], timings=timings)
+        else:
+            status = JOB_FAILED
+            self._update_job(job_id, status=status, stage="failed", result=result, error=result.get("message"),
+                             partial_data=[], timings=timings)
+        logger.info(f"Job {job_id} finished with status {status}")
+        self._on_job_finished(job_id)
+
+    def _create_job(self, filename, batch_id=None, job_id=None):
+        # Caller holds self.lock
+        job_id = job_id if job_id and job_id not in self.jobs else uuid.uuid4().hex
+        now = datetime.now(timezone.utc).isoformat()
+        job = {
+            "job_id": job_id,
+            "batch_id": batch_id,
+            "filename": filename,
+            "status": JOB_QUEUED,
+            "stage": "queued",
+            "created_at": now,
+            "updated_at": now,
+            "error": None,
+            "pages_completed": 0,
+            "timings": None,
+            "partial_data": [],
+            "result": None,
+            "events": [],
+            "event_seq": 0,
+        }
+        self.jobs[job_id] = job
+        self._publish(job, "status", self._public_view(job))
+        return job
+
+    def _dispatch_batch(self, batch_id):
+        """Start queued jobs of a batch until it reaches its concurrency limit."""
+        to_start = []
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            if not batch:
+                return
+            while batch["pending"] and batch["running"] < batch["concurrency"]:
+                to_start.append(batch["pending"].popleft())
+                batch["running"] += 1
+        for job_args in to_start:
+            self.executor.submit(self._run_job, *job_args)
+
+    def _on_job_finished(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            batch = self.batches.get(job["batch_id"]) if job and job["batch_id"] else None
+            if not batch:
+                return
+            batch["running"] -= 1
+        self._dispatch_batch(batch["batch_id"])
+
+    def _count_by_status(self):
+        with self.lock:
+            counts = {(status,): 0 for status in (JOB_QUEUED, JOB_PROCESSING, JOB_SUCCEEDED, JOB_FAILED)}
+            for job in self.jobs.values():
+                counts[(job["status"],)] += 1
+            return counts
+
+    def _update_job(self, job_id, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return
+            job.update(fields)
+            job["updated_at"] = datetime.now(timezone.utc).isoformat()
+            if job["status"] in FINISHED_STATES:
+                # The result holds every page now, so only the final status is kept for replays
+                job["events"] = []
+            self._publish(job, "status", self._public_view(job))
+
+    def _add_page(self, job_id, page_number, items):
+        # Layout items of completed pages stay readable while later pages are still being fetched
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return
+            job["partial_data"].extend(items)
+            job["pages_completed"] += 1
+            job["updated_at"] = datetime.now(timezone.utc).isoformat()
+            self._publish(job, "page", {"page": page_number, "pages_completed": job["pages_completed"], "items": items})
+
+    def _publish(self, job, event, data):
+        # Caller holds self.lock; events are kept until the job finishes so late clients can catch up
+        job["event_seq"] += 1
+        message = (job["event_seq"], event, data)
+        job["events"].append(message)
+        for loop, queue in self.subscribers.get(job["job_id"], ()):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+            except RuntimeError:
+                # The client's event loop has already been closed
+                pass
+
+    def _evict_finished_jobs(self):
+        # Oldest jobs first; queued/processing jobs are never evicted
+        excess = len(self.jobs) - self.max_retained_jobs
+        if excess <= 0:
+            return
+        for job_id in [j for j, job in self.jobs.items() if job["status"] in FINISHED_STATES][:excess]:
+            del self.jobs[job_id]
+
+        # Batches whose jobs have all been evicted are dropped with them
+        for batch_id in [b for b, batch in self.batches.items() if not any(j in self.jobs for j in batch["job_ids"])]:
+            del self.batches[batch_id]
+
+    @staticmethod
+    def _public_view(job):
+        return {k: v for k, v in job.items() if k not in ("result", "partial_data", "events", "event_seq")}
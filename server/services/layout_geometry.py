@@ -0,0 +1,123 @@
+import math
+from collections import defaultdict
+
+
+def _box_extent(block):
+    box = block['Geometry']['BoundingBox']
+    return (
+        box['Left'],
+        box['Left'] + box['Width'],
+        box['Top'],
+        box['Top'] + box['Height'],
+    )
+
+
+# Entries per node of a TableBoxIndex tree
+NODE_CAPACITY = 8
+
+
+def _intersects(extent, x_min, x_max, y_min, y_max):
+    return extent[0] <= x_max and extent[1] >= x_min and extent[2] <= y_max and extent[3] >= y_min
+
+
+def _pack_level(entries):
+    """
+    Groups (extent, children) entries into parent nodes, sort-tile-recursive: entries are
+    cut into vertical slices by their horizontal center, and each slice into nodes by
+    their vertical center, so the nodes of a level barely overlap.
+    """
+    node_count = math.ceil(len(entries) / NODE_CAPACITY)
+    slice_size = math.ceil(math.sqrt(node_count)) * NODE_CAPACITY
+    entries.sort(key=lambda entry: entry[0][0] + entry[0][1])
+    parents = []
+    for i in range(0, len(entries), slice_size):
+        vertical_slice = sorted(entries[i:i + slice_size], key=lambda entry: entry[0][2] + entry[0][3])
+        for j in range(0, len(vertical_slice), NODE_CAPACITY):
+            children = vertical_slice[j:j + NODE_CAPACITY]
+            extent = (
+                min(child[0][0] for child in children),
+                max(child[0][1] for child in children),
+                min(child[0][2] for child in children),
+                max(child[0][3] for child in children),
+            )
+            parents.append((extent, children))
+    return parents
+
+
+class TableBoxIndex:
+    def __init__(self, table_blocks):
+        """
+        Per-page R-tree over TABLE bounding boxes.
+
+        The boxes of each page are bulk-loaded into a static tree once, so a query only
+        descends into nodes that intersect the query box on both axes: O(log n + k) for
+        the k tables it actually touches, instead of every table on the page.
+
+        :param table_blocks: TABLE blocks of a Textract response
+        """
+        pages = defaultdict(list)
+        for block in table_blocks:
+            # Leaf entries have no children
+            pages[block.get('Page', 1)].append((_box_extent(block), None))
+
+        self.pages = {}
+        for page, entries in pages.items():
+            while len(entries) > NODE_CAPACITY:
+                entries = _pack_level(entries)
+            self.pages[page] = entries
+
+    def intersecting(self, block):
+        """Yields the extents of the tables on block's page that intersect or touch its box."""
+        stack = list(self.pages.get(block.get('Page', 1), ()))
+        x_min, x_max, y_min, y_max = _box_extent(block)
+        while stack:
+            extent, children = stack.pop()
+            if not _intersects(extent, x_min, x_max, y_min, y_max):
+                continue
+            if children is None:
+                yield extent
+            else:
+                stack.extend(children)
+
+    def is_covered(self, block, threshold):
+        """
+        Returns True if a single table on block's page covers more than threshold of
+        block's area. Blocks without area are never covered.
+        """
+        box = block['Geometry']['BoundingBox']
+        area = box['Width'] * box['Height']
+        if area <= 0:
+            return False
+
+        x1_min, x1_max, y1_min, y1_max = _box_extent(block)
+        for x2_min, x2_max, y2_min, y2_max in self.intersecting(block):
+            inter_x_min = max(x1_min, x2_min)
+            inter_x_max = min(x1_max, x2_max)
+            inter_y_min = max(y1_min, y2_min)
+            inter_y_max = min(y1_max, y2_max)
+            if inter_x_max < inter_x_min or inter_y_max < inter_y_min:
+                continue
+            if (inter_x_max - inter_x_min) * (inter_y_max - inter_y_min) / area > threshold:
+                return True
+        return False
+
+
+def covered_layout_tables(layout_table_blocks, table_blocks, threshold):
+    """
+    Returns the ids of LAYOUT_TABLE blocks whose area is covered by more than threshold
+    by a structured TABLE block on the same page.
+    """
+    if not layout_table_blocks or not table_blocks:
+        return set()
+
+    table_index = TableBoxIndex(table_blocks)
+    return {
+        block['Id'] for block in layout_table_blocks
+        if table_index.is_covered(block, threshold)
+    }
+
+
+def reading_order_key(block):
+    """Sort key placing blocks by page, then top, then left."""
+    box = block['Geometry']['BoundingBox']
+    return (block.get('Page', 1), box['Top'], box['Left'])
@@ -0,0 +1,73 @@
+LAYOUT_FIELDS = ("type", "page", "confidence", "geometry", "text", "table_data")
+
+
+def type_key(item_type):
+    """Short name of a layout item type used by the `types` filter, e.g. "Layout Section Header" -> "section_header"."""
+    name = item_type.lower()
+    if name.startswith("layout "):
+        name = name[len("layout "):]
+    return name.replace(" ", "_")
+
+
+def parse_projection(fields=None, types=None, polygons=True):
+    """
+    Validates the projection query parameters.
+
+    :param fields: Comma-separated layout item fields to return (default: all of LAYOUT_FIELDS)
+    :param types: Comma-separated item types to return, e.g. "table" or "title,section_header" (default: all)
+    :param polygons: Keep the Polygon of every geometry; False leaves only the BoundingBox
+    :return: Projection dict for project_layout, or None when nothing is filtered out
+    :raises ValueError: If a field is unknown
+    """
+    selected = tuple(name.strip() for name in fields.split(",") if name.strip()) if fields else LAYOUT_FIELDS
+    unknown = [name for name in selected if name not in LAYOUT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}; expected any of {', '.join(LAYOUT_FIELDS)}")
+    selected_types = frozenset(type_key(name.strip()) for name in types.split(",") if name.strip()) if types else None
+
+    if selected == LAYOUT_FIELDS and selected_types is None and polygons:
+        return None
+    return {"fields": selected, "types": selected_types, "polygons": polygons}
+
+
+def project_layout(items, projection):
+    """
+    Restricts layout items to a projection from parse_projection.
+
+    New, smaller items are built from the selected fields only; the stored items are
+    never copied in full or modified.
+    """
+    if projection is None or items is None:
+        return items
+
+    fields = projection["fields"]
+    types = projection["types"]
+    polygons = projection["polygons"]
+    # Cell geometry follows the item's geometry field
+    cell_geometry = "geometry" in fields
+
+    projected = []
+    for item in items:
+        if types is not None and type_key(item["type"]) not in types:
+            continue
+        entry = {name: item[name] for name in fields if name in item}
+        if not polygons and entry.get("geometry"):
+            entry["geometry"] = _without_polygon(entry["geometry"])
+        if entry.get("table_data") and (not cell_geometry or not polygons):
+            entry["table_data"] = [
+                [_project_cell(cell, cell_geometry) for cell in row] for row in entry["table_data"]
+            ]
+        projected.append(entry)
+    return projected
+
+
+def _without_polygon(geometry):
+    return {key: value for key, value in geometry.items() if key != "Polygon"}
+
+
+def _project_cell(cell, keep_geometry):
+    if not keep_geometry:
+        return {key: value for key, value in cell.items() if key != "geometry"}
+    if cell.get("geometry"):
+        return {**cell, "geometry": _without_polygon(cell["geometry"])}
+    return cell
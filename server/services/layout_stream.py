@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import textwrap
+
+logger = logging.getLogger(__name__)
+
+
+def render_item(item, indent=4):
+    """Renders one layout item the way LayoutStreamWriter writes it, without the separator."""
+    if indent:
+        return textwrap.indent(json.dumps(item, indent=indent), " " * indent)
+    return json.dumps(item, separators=(",", ":"))
+
+
+class LayoutStreamWriter:
+    def __init__(self, output_path, indent=4, index_path=None, provenance=None):
+        """
+        Writes layout items to a JSON array file as pages are produced.
+
+        The file is written under a temporary name and moved into place on close, so a
+        failed job never leaves a truncated layout file behind. The result is identical to
+        json.dump(items, f, indent=indent) over the full list.
+
+        :param output_path: Destination file, or None to discard the items
+        :param indent: JSON indentation of the written items, or None for compact output
+        :param index_path: Optional file receiving the byte ranges of each page's items
+                           (see read_page_index), written on close
+        :param provenance: Optional dict describing how the items were produced, e.g. the
+                           layout_version of the code, stored in the index (see read_provenance)
+        """
+        self.output_path = output_path
+        self.indent = indent
+        self.index_path = index_path
+        self.provenance = provenance
+        self.items_written = 0
+        self.file = None
+        self.temp_path = f"{output_path}.part" if output_path else None
+        self.position = 0
+        # page -> [[start, end, item count], ...]; one range per run of consecutive items
+        self.page_ranges = {}
+        self.current_page = None
+
+    def _open(self):
+        # Opened on first use so a writer that never receives items leaves nothing behind
+        if self.file is None and self.output_path:
+            self.file = open(self.temp_path, 'wb')
+        return self.file
+
+    def _write(self, text):
+        data = text.encode()
+        self.file.write(data)
+        self.position += len(data)
+
+    def write_items(self, items, rendered=None):
+        """
+        :param items: Layout items to append
+        :param rendered: Optional render_item() output of the items, rendered elsewhere
+        """
+        if not self._open():
+            return
+        texts = rendered if rendered is not None else (render_item(item, self.indent) for item in items)
+        for item, text in zip(items, texts):
+            if self.indent:
+                prefix = "[\n" if self.items_written == 0 else ",\n"
+            else:
+                prefix = "[" if self.items_written == 0 else ","
+            self._write(prefix)
+            start = self.position
+            self._write(text)
+            self._track_page(item.get("page", 1), start)
+            self.items_written += 1
+        self.file.flush()
+
+    def _track_page(self, page, start):
+        ranges = self.page_ranges.setdefault(page, [])
+        if page == self.current_page:
+            ranges[-1][1] = self.position
+            ranges[-1][2] += 1
+        else:
+            ranges.append([start, self.position, 1])
+            self.current_page = page
+
+    def close(self):
+        if not self._open():
+            return
+        if not self.items_written:
+            self._write("[]")
+        else:
+            self._write("\n]" if self.indent else "]")
+        self.file.close()
+        if self.index_path:
+            # Written first; readers check its size and mtime against the layout file before
+            # trusting it. The mtime survives the rename of the layout file into place.
+            stat = os.stat(self.temp_path)
+            index_temp_path = f"{self.index_path}.part"
+            index = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "pages": self.page_ranges}
+            if self.provenance:
+                index["provenance"] = self.provenance
+            with open(index_temp_path, 'w') as f:
+                json.dump(index, f, separators=(",", ":"))
+            os.replace(index_temp_path, self.index_path)
+        os.replace(self.temp_path, self.output_path)
+        logger.info(f"Layout output saved to {self.output_path}")
+
+    def abort(self):
+        if not self.file:
+            return
+        self.file.close()
+        os.remove(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+
+
+def _load_index(index_path, layout_path):
+    try:
+        with open(index_path, 'rb') as f:
+            index = json.load(f)
+        stat = os.stat(layout_path)
+        if index["size"] != stat.st_size or index["mtime_ns"] != stat.st_mtime_ns:
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+    return index
+
+
+def read_page_index(index_path, layout_path, layout_version=None):
+    """
+    Loads the page index written next to a layout file.
+
+    :param layout_version: If given, an index whose provenance records another layout_version is ignored
+    :return: Dict of page number -> [[start, end, item count], ...] byte ranges of the
+             items in the layout file, or None if there is no index, it belongs to a
+             different version of the layout file (size or mtime differ) or to another layout_version
+    """
+    index = _load_index(index_path, layout_path)
+    if index is None:
+        return None
+    if layout_version is not None and (index.get("provenance") or {}).get("layout_version") != layout_version:
+        return None
+    return {int(page): ranges for page, ranges in index["pages"].items()}
+
+
+def read_provenance(index_path, layout_path):
+    """Return the provenance recorded in the index of a layout file, or an empty dict."""
+    index = _load_index(index_path, layout_path)
+    return (index or {}).get("provenance") or {}
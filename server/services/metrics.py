@@ -0,0 +1,235 @@
+import contextvars
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers sub-millisecond enrichment up to multi-minute async jobs
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, series in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    cumulative += count
+                    labels = _format_labels(self.label_names, key, [("le", _format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class CallbackGauge:
+    def __init__(self, name, help_text, callback, label_names=()):
+        """
+        Gauge read from callback() at scrape time.
+
+        :param callback: Returns a number, or a dict of label value tuples to numbers
+        """
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.label_names = tuple(label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.callback()
+        except Exception:
+            logger.exception(f"Could not collect {self.name}")
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            # Components created more than once (tests, benchmarks) replace their earlier gauges
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def gauge(self, name, help_text, callback, label_names=()):
+        return self._register(CallbackGauge(name, help_text, callback, label_names))
+
+    def render(self):
+        """Renders every metric in the Prometheus text exposition format."""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_DURATION = REGISTRY.histogram(
+    "ocr_stage_duration_seconds", "Time spent in each document processing stage", ("stage",)
+)
+STAGE_BLOCKS = REGISTRY.counter(
+    "ocr_stage_blocks_total", "Textract blocks handled by each stage", ("stage",)
+)
+STAGE_PAGES = REGISTRY.counter(
+    "ocr_stage_pages_total", "Document pages handled by each stage", ("stage",)
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "ocr_stage_errors_total", "Stages that ended with an exception", ("stage",)
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to serve each HTTP request", ("method", "route", "status")
+)
+
+# Numeric span attributes that also feed the per-stage counters
+SPAN_COUNTERS = {"blocks": STAGE_BLOCKS, "pages": STAGE_PAGES}
+
+_current_trace = contextvars.ContextVar("ocr_trace", default=None)
+
+
+class Trace:
+    def __init__(self):
+        """Per-request or per-job breakdown of the spans recorded while it is active."""
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def add(self, stage, duration, attributes):
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = {"count": 0, "seconds": 0.0}
+            entry["count"] += 1
+            entry["seconds"] += duration
+            for key, value in attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    entry[key] = entry.get(key, 0) + value
+
+    def breakdown(self):
+        """Returns {stage: {"count", "seconds", <summed numeric attributes>}} in recording order."""
+        with self.lock:
+            return {stage: {**entry, "seconds": round(entry["seconds"], 6)} for stage, entry in self.stages.items()}
+
+    def server_timing(self):
+        """Formats the breakdown as a Server-Timing header value (durations in milliseconds)."""
+        with self.lock:
+            return ", ".join(
+                f'{stage};dur={entry["seconds"] * 1000:.1f}' for stage, entry in self.stages.items()
+            )
+
+
+@contextmanager
+def trace():
+    """Collects the spans of the current context (request or job) into a new Trace."""
+    current = Trace()
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace():
+    """Returns the Trace of the current context, or None outside of trace()."""
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage, **attributes):
+    """
+    Times a processing stage.
+
+    The duration goes to the ocr_stage_duration_seconds histogram and to the active
+    Trace, if any. The yielded dict holds the span attributes and can be filled in while
+    the stage runs; "blocks" and "pages" also feed the per-stage counters.
+    """
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_DURATION.observe(duration, stage=stage)
+        for key, counter in SPAN_COUNTERS.items():
+            if attributes.get(key):
+                counter.inc(attributes[key], stage=stage)
+        current = _current_trace.get()
+        if current is not None:
+            current.add(stage, duration, attributes)
@@ -0,0 +1,341 @@
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from services.block_index import TEXT_BLOCK_TYPES
+from services.block_store import CompactBlocks, iter_json, materialize
+from services.layout_stream import LayoutStreamWriter, read_page_index, read_provenance
+from services import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_KEYS = ['DocumentMetadata', 'Blocks', 'HumanLoopActivationOutput', 'AnalyzeDocumentModelVersion']
+RAW_ARTIFACTS = ('original', 'response')
+
+ENCODING_EXTENSIONS = {"json": ".json", "json-pretty": ".json", "msgpack": ".msgpack"}
+COMPRESSION_EXTENSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+class OutputWriter:
+    def __init__(self, output_dir=None, encoding=None, compression=None, write_raw=None,
+                 layout_indent=None, max_workers=None, max_pending=None):
+        """
+        Writes the per-document output artifacts.
+
+        The layout output stays plain JSON for the client. The raw '_original' and
+        '_response' artifacts use a configurable encoding and compression, are written on a
+        background pool, and by default are only materialized when something reads them:
+        from the most recent results kept in memory, or else from the result returned by
+        load_result (e.g. the result cache entry of the document).
+
+        :param output_dir: Root output directory (default: OUTPUT_DIR or "output")
+        :param encoding: "json" (compact), "json-pretty" (indent=4) or "msgpack" (default: OUTPUT_ENCODING or "json")
+        :param compression: "none", "gzip" or "zstd" (default: OUTPUT_COMPRESSION or "none")
+        :param write_raw: Always write the raw artifacts instead of on first read (default: OUTPUT_WRITE_RAW or false)
+        :param layout_indent: Indentation of the layout JSON, 0 for compact (default: OUTPUT_LAYOUT_INDENT or 4)
+        :param max_workers: Background writer threads (default: OUTPUT_WRITER_WORKERS or 2)
+        :param max_pending: Results kept in memory for lazy materialization (default: OUTPUT_MAX_PENDING or 16)
+        """
+        self.output_dir = output_dir or os.getenv('OUTPUT_DIR', 'output')
+        self.encoding = encoding or os.getenv('OUTPUT_ENCODING', 'json')
+        self.compression = compression or os.getenv('OUTPUT_COMPRESSION', 'none')
+        self.write_raw = write_raw if write_raw is not None else os.getenv('OUTPUT_WRITE_RAW', 'false').lower() == 'true'
+        indent = layout_indent if layout_indent is not None else int(os.getenv('OUTPUT_LAYOUT_INDENT', '4'))
+        self.layout_indent = indent or None
+        self.max_pending = max_pending or int(os.getenv('OUTPUT_MAX_PENDING', '16'))
+
+        if self.encoding not in ENCODING_EXTENSIONS:
+            raise ValueError(f"Unsupported output encoding: {self.encoding}")
+        if self.compression not in COMPRESSION_EXTENSIONS:
+            raise ValueError(f"Unsupported output compression: {self.compression}")
+        if self.encoding == "msgpack" and msgpack is None:
+            raise ValueError("OUTPUT_ENCODING=msgpack requires the msgpack package")
+        if self.compression == "zstd" and zstandard is None:
+            raise ValueError("OUTPUT_COMPRESSION=zstd requires the zstandard package")
+
+        self.json_output_dir = os.path.join(self.output_dir, "json_output")
+        self.layout_output_dir = os.path.join(self.output_dir, "layout_output")
+        os.makedirs(self.json_output_dir, exist_ok=True)
+        os.makedirs(self.layout_output_dir, exist_ok=True)
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv('OUTPUT_WRITER_WORKERS', '2')),
+            thread_name_prefix="output-writer"
+        )
+        self.pending = OrderedDict()
+        self.lock = threading.Lock()
+        # Called with (base_filename, kind, path) once a raw artifact has been written
+        self.on_written = None
+        # Called with base_filename for a deferred artifact no longer in memory; returns the result or None
+        self.load_result = None
+        # Layout version a page index must have been written with to be trusted; None accepts any
+        self.layout_version = None
+
+    def layout_path(self, base_filename):
+        return os.path.join(self.layout_output_dir, f"{base_filename}_layout.json")
+
+    def layout_index_path(self, base_filename):
+        return os.path.join(self.layout_output_dir, f"{base_filename}_layout.index.json")
+
+    def artifact_path(self, base_filename, kind):
+        extension = ENCODING_EXTENSIONS[self.encoding] + COMPRESSION_EXTENSIONS[self.compression]
+        return os.path.join(self.json_output_dir, f"{base_filename}_{kind}{extension}")
+
+    def open_layout_stream(self, base_filename, provenance=None):
+        return LayoutStreamWriter(
+            self.layout_path(base_filename), indent=self.layout_indent, index_path=self.layout_index_path(base_filename),
+            provenance=provenance
+        )
+
+    def write_layout(self, base_filename, layout_data, rendered=None, provenance=None):
+        with self.open_layout_stream(base_filename, provenance) as layout_writer:
+            layout_writer.write_items(layout_data, rendered)
+
+    def read_layout_provenance(self, base_filename):
+        """Return the provenance the layout output was written with (empty if unknown)."""
+        return read_provenance(self.layout_index_path(base_filename), self.layout_path(base_filename))
+
+    def find_originals(self):
+        """Return the base names of every document with an '_original' artifact on disk."""
+        names = set()
+        with os.scandir(self.json_output_dir) as entries:
+            for entry in entries:
+                name, separator, _ = entry.name.rpartition("_original.")
+                if separator and not entry.name.endswith(".part"):
+                    names.add(name)
+        return names
+
+    def read_layout_pages(self, base_filename, first_page, last_page):
+        """
+        Returns the layout items of pages first_page to last_page as a JSON array.
+
+        With the page index written next to the layout file, only the byte ranges of
+        those pages are read and nothing is parsed. Layout files without a (current)
+        index are parsed in full.
+
+        :return: The JSON array as bytes, or None if the document has no layout output
+        """
+        path = self.layout_path(base_filename)
+        if not os.path.exists(path):
+            return None
+
+        page_index = read_page_index(self.layout_index_path(base_filename), path, self.layout_version)
+        if page_index is None:
+            logger.info(f"No page index for {base_filename}, reading the whole layout")
+            with open(path, 'rb') as f:
+                items = json.load(f)
+            return json.dumps(
+                [item for item in items if first_page <= item.get("page", 1) <= last_page], separators=(",", ":")
+            ).encode()
+
+        ranges = sorted(
+            byte_range for page, page_ranges in page_index.items() if first_page <= page <= last_page
+            for byte_range in page_ranges
+        )
+        segments = []
+        with open(path, 'rb') as f:
+            for start, end, _ in ranges:
+                f.seek(start)
+                segments.append(f.read(end - start))
+        return b"[" + b",".join(segments) + b"]"
+
+    def save_artifacts(self, base_filename, result, index=None):
+        """
+        Schedules the '_original' and '_response' artifacts of a processed document.
+
+        With write_raw they are written on the background pool; otherwise the result is
+        kept (bounded, most recent first) until read_artifact asks for one of them. Older
+        results are dropped and read again through load_result.
+
+        :param index: Optional BlockIndex of the result, used to drop WORD/LINE blocks from a list of dicts
+        :return: Future of the background write, or None if the write was deferred
+        """
+        if self.write_raw:
+            return self.executor.submit(self._write_artifacts, base_filename, result, index)
+
+        with self.lock:
+            self.pending[base_filename] = (result, index)
+            self.pending.move_to_end(base_filename)
+            while len(self.pending) > self.max_pending:
+                self.pending.popitem(last=False)
+        return None
+
+    def read_artifact(self, base_filename, kind):
+        """
+        Returns a raw artifact, materializing it first if it was deferred.
+
+        :return: The decoded artifact, or None if it was never produced and the result is gone
+        """
+        if kind not in RAW_ARTIFACTS:
+            raise ValueError(f"Unknown artifact: {kind}")
+
+        path = self.find_artifact(base_filename, kind)
+        if path is None:
+            with self.lock:
+                pending = self.pending.get(base_filename)
+            if pending is None and self.load_result is not None:
+                result = self.load_result(base_filename)
+                pending = (result, None) if result is not None else None
+            if pending is None:
+                return None
+            result, index = pending
+            path = self._write_artifact(base_filename, kind, self.build_artifact(kind, result, index))
+
+        return self.read_file(path)
+
+    def find_artifact(self, base_filename, kind):
+        """Returns the path of an existing artifact in any encoding, preferring the configured one."""
+        preferred = self.artifact_path(base_filename, kind)
+        if os.path.exists(preferred):
+            return preferred
+        for encoding_extension in set(ENCODING_EXTENSIONS.values()):
+            for compression_extension in COMPRESSION_EXTENSIONS.values():
+                path = os.path.join(self.json_output_dir, f"{base_filename}_{kind}{encoding_extension}{compression_extension}")
+                if os.path.exists(path):
+                    return path
+        return None
+
+    @staticmethod
+    def build_artifact(kind, result, index=None):
+        if kind == 'original':
+            # ORIGINAL unfiltered data (with WORD & LINE blocks)
+            return {k: v for k, v in result.items() if k in RESPONSE_KEYS}
+
+        # FILTERED data (without WORD & LINE blocks)
+        blocks = result['Blocks']
+        if isinstance(blocks, CompactBlocks):
+            filtered_blocks = blocks.excluding(TEXT_BLOCK_TYPES)
+        elif index:
+            filtered_blocks = index.structural_blocks
+        else:
+            filtered_blocks = [b for b in blocks if b['BlockType'] not in TEXT_BLOCK_TYPES]
+        return {
+            k: (filtered_blocks if k == 'Blocks' else v)
+            for k, v in result.items()
+            if k in RESPONSE_KEYS
+        }
+
+    def encode(self, data):
+        return b"".join(self.iter_encoded(data))
+
+    def iter_encoded(self, data):
+        """
+        Yields the encoded and compressed artifact in pieces.
+
+        The blocks of a BlockStore are materialized a chunk at a time for compact JSON and
+        msgpack; json-pretty, a debugging format, materializes them all.
+        """
+        if self.encoding == "msgpack":
+            pieces = self._iter_msgpack(data)
+        elif self.encoding == "json-pretty":
+            pieces = [json.dumps(materialize(data), indent=4).encode()]
+        elif orjson is not None:
+            pieces = iter_json(data, orjson.dumps)
+        else:
+            pieces = iter_json(data, lambda value: json.dumps(value, separators=(",", ":")).encode())
+
+        if self.compression == "gzip":
+            # wbits=31 writes a gzip container, the same as gzip.compress
+            compressor = zlib.compressobj(5, zlib.DEFLATED, 31)
+        elif self.compression == "zstd":
+            compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        else:
+            yield from pieces
+            return
+        for piece in pieces:
+            compressed = compressor.compress(piece)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    @staticmethod
+    def _iter_msgpack(data):
+        packer = msgpack.Packer(use_bin_type=True)
+        yield packer.pack_map_header(len(data))
+        for key, value in data.items():
+            yield packer.pack(key)
+            if not isinstance(value, CompactBlocks):
+                yield packer.pack(value)
+                continue
+            yield packer.pack_array_header(len(value))
+            for chunk in value.chunks():
+                yield b"".join(packer.pack(block) for block in chunk)
+
+    @staticmethod
+    def read_file(path):
+        """Reads an artifact written in any supported encoding and compression."""
+        with open(path, 'rb') as f:
+            payload = f.read()
+
+        if path.endswith(".gz"):
+            payload = gzip.decompress(payload)
+            path = path[:-3]
+        elif path.endswith(".zst"):
+            if zstandard is None:
+                raise ValueError(f"Reading {path} requires the zstandard package")
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+            path = path[:-4]
+
+        if path.endswith(".msgpack"):
+            if msgpack is None:
+                raise ValueError(f"Reading {path} requires the msgpack package")
+            return msgpack.unpackb(payload, raw=False)
+        return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def _write_artifacts(self, base_filename, result, index):
+        try:
+            for kind in RAW_ARTIFACTS:
+                self._write_artifact(base_filename, kind, self.build_artifact(kind, result, index))
+        except Exception:
+            logger.exception(f"Failed to write output artifacts for {base_filename}")
+            raise
+
+    def _write_artifact(self, base_filename, kind, data):
+        path = self.artifact_path(base_filename, kind)
+        # A temporary file of its own, so concurrent writes of one artifact (a read racing
+        # the background write) never interleave; the last complete one wins
+        temp_file = tempfile.NamedTemporaryFile(
+            dir=self.json_output_dir, prefix=f"{os.path.basename(path)}.", suffix=".part", delete=False
+        )
+        try:
+            with metrics.span(f"write_{kind}") as span:
+                size = 0
+                with temp_file:
+                    for piece in self.iter_encoded(data):
+                        temp_file.write(piece)
+                        size += len(piece)
+                span["bytes"] = size
+                os.replace(temp_file.name, path)
+        except BaseException:
+            os.remove(temp_file.name)
+            raise
+        logger.info(f"{kind.capitalize()} data saved to: {path}")
+        if self.on_written is not None:
+            try:
+                self.on_written(base_filename, kind, path)
+            except Exception:
+                logger.exception(f"Artifact listener failed for {path}")
+        return path
@@ -0,0 +1,99 @@
+import io
+import logging
+import os
+import re
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+logger = logging.getLogger(__name__)
+
+PDF_SPLIT_SUPPORTED = pypdf is not None
+
+# Page tree nodes and leaves; "/Page" must not match the "/Pages" nodes
+PAGES_NODE_PATTERN = re.compile(rb"/Type\s*/Pages(?![A-Za-z])")
+PAGE_LEAF_PATTERN = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+COUNT_PATTERN = re.compile(rb"/Count\s+(\d+)")
+
+# Bytes read from each end of files too large to scan completely
+INSPECT_WINDOW = 1024 * 1024
+
+
+def _read_window(file_path=None, file_bytes=None):
+    if file_bytes is not None:
+        return file_bytes
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        if size <= 2 * INSPECT_WINDOW:
+            return f.read()
+        # The page tree usually sits at the start (linearized files) or the end (incremental saves)
+        head = f.read(INSPECT_WINDOW)
+        f.seek(-INSPECT_WINDOW, os.SEEK_END)
+        return head + f.read()
+
+
+def count_pdf_pages(file_path=None, file_bytes=None):
+    """
+    Reads the page count of a PDF without parsing it.
+
+    The /Count of the root page tree node is the largest /Count of any /Type /Pages
+    object. Without one, /Type /Page leaves are counted. Page trees inside compressed
+    object streams are invisible to this scan; pypdf is used for those when installed.
+
+    :param file_path: Path to the PDF (optional if file_bytes is provided)
+    :param file_bytes: Byte content of the PDF (optional if file_path is provided)
+    :return: The number of pages, or None if it could not be determined
+    """
+    data = _read_window(file_path, file_bytes)
+    # The header may follow a few bytes of junk, which readers tolerate
+    if b"%PDF-" not in data[:1024]:
+        return None
+
+    counts = []
+    for match in PAGES_NODE_PATTERN.finditer(data):
+        # Look for /Count inside the same object only, so /Outlines counts are never picked up
+        start = data.rfind(b"obj", 0, match.start())
+        end = data.find(b"endobj", match.end())
+        count = COUNT_PATTERN.search(data, max(start, 0), end if end != -1 else len(data))
+        if count:
+            counts.append(int(count.group(1)))
+    if counts:
+        return max(counts)
+
+    leaves = len(PAGE_LEAF_PATTERN.findall(data))
+    if leaves and len(data) == _size(file_path, file_bytes):
+        return leaves
+
+    if pypdf is not None:
+        try:
+            reader = pypdf.PdfReader(file_path if file_bytes is None else io.BytesIO(file_bytes))
+            return len(reader.pages)
+        except Exception as e:
+            logger.info(f"Could not read the page count with pypdf: {e}")
+    return None
+
+
+def split_pdf_pages(file_path=None, file_bytes=None):
+    """
+    Splits a PDF into single-page PDFs.
+
+    :return: List of the byte content of each page, in page order
+    """
+    if pypdf is None:
+        raise RuntimeError("Splitting PDFs requires the pypdf package")
+
+    reader = pypdf.PdfReader(file_path if file_bytes is None else io.BytesIO(file_bytes))
+    pages = []
+    for page in reader.pages:
+        writer = pypdf.PdfWriter()
+        writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        pages.append(buffer.getvalue())
+    return pages
+
+
+def _size(file_path=None, file_bytes=None):
+    return len(file_bytes) if file_bytes is not None else os.path.getsize(file_path)
@@ -0,0 +1,256 @@
+import hashlib
+import os
+import pickle
+from collections import Counter
+from functools import lru_cache
+from services.block_index import BlockIndex, TEXT_BLOCK_TYPES
+from services.layout_geometry import covered_layout_tables, reading_order_key
+from services.layout_stream import LayoutStreamWriter, render_item
+from services.output_writer import OutputWriter
+from services.result_cache import ResultCache
+from services.search_index import SearchIndex
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Modules whose code decides the layout output; editing any of them makes stored layouts outdated
+LAYOUT_MODULES = ("postprocessing.py", "layout_geometry.py", "block_index.py")
+
+
+@lru_cache(maxsize=None)
+def layout_version(overlap_threshold):
+    """
+    Version of the layout output this code produces with the given settings. It is
+    recorded next to every layout file so outdated ones can be found and rebuilt.
+    """
+    digest = hashlib.sha256(repr(float(overlap_threshold)).encode())
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in LAYOUT_MODULES:
+        with open(os.path.join(directory, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def get_text_for_block(block, blocks_map):
+    """Extracts text from child LINE/WORD blocks."""
+    texts = []
+    if 'Relationships' in block:
+        for rel in block['Relationships']:
+            if rel['Type'] == 'CHILD':
+                for child_id in rel['Ids']:
+                    child = blocks_map.get(child_id)
+                    if child and child['BlockType'] in TEXT_BLOCK_TYPES:
+                        texts.append(child.get('Text', ''))
+    return ' '.join(texts).strip()
+
+
+def enrich_response_with_text(response, index=None):
+    """
+    Enriches the Textract response by adding a 'Text' field to LAYOUT_* and CELL blocks
+    derived from their child relationships.
+
+    :param index: Optional BlockIndex of the response, built here if not provided
+    """
+    index = index or BlockIndex(response['Blocks'])
+
+    for block in index.layout_blocks + index.of_type('CELL'):
+        block['Text'] = ' '.join(child.get('Text', '') for child in index.child_blocks(block, TEXT_BLOCK_TYPES)).strip()
+
+    return response
+
+
+def enrich_tables(response, index=None):
+    """
+    Enriches TABLE blocks with a structured 'TableData' field containing detailed cell info
+    and a 'Text' field containing a Markdown representation.
+
+    :param index: Optional BlockIndex of the response, built here if not provided
+    """
+    index = index or BlockIndex(response['Blocks'])
+
+    for block in index.of_type('TABLE'):
+        rows = {}
+        for cell in index.child_blocks(block, ('CELL',)):
+            row_idx = cell['RowIndex']
+            col_idx = cell['ColumnIndex']
+
+            # Extract detailed cell info
+            cell_data = {
+                "text": cell.get('Text', ''),
+                "rowIndex": row_idx,
+                "columnIndex": col_idx,
+                "rowSpan": cell.get('RowSpan', 1),
+                "columnSpan": cell.get('ColumnSpan', 1),
+                "confidence": cell.get('Confidence'),
+                "geometry": cell.get('Geometry'),
+                "entityTypes": cell.get('EntityTypes', [])
+            }
+
+            if row_idx not in rows:
+                rows[row_idx] = {}
+            rows[row_idx][col_idx] = cell_data
+
+        # Convert to list of lists
+        sorted_row_indices = sorted(rows.keys())
+        table_data = []
+        markdown_rows = []
+
+        for r_idx in sorted_row_indices:
+            row_cells = rows[r_idx]
+            sorted_col_indices = sorted(row_cells.keys())
+
+            # For TableData (detailed objects)
+            row_data = [row_cells[c_idx] for c_idx in sorted_col_indices]
+            table_data.append(row_data)
+
+            # For Markdown Text
+            # We need to handle missing columns for proper markdown alignment if needed,
+            # but for now we'll just join the text of existing cells.
+            # A robust markdown table generator would need to handle spans and alignment.
+            # This is a simplified version.
+            row_text_list = [row_cells[c_idx]['text'] for c_idx in sorted_col_indices]
+            markdown_rows.append("| " + " | ".join(row_text_list) + " |")
+
+            # Add separator after header (assuming first row is header for simplicity, 
+            # or just standard markdown table format)
+            if r_idx == 1:
+                # Create separator row based on number of columns in first row
+                sep_row = "| " + " | ".join(["---"] * len(row_text_list)) + " |"
+                markdown_rows.append(sep_row)
+
+        block['TableData'] = table_data
+        block['Text'] = "\n".join(markdown_rows)
+
+    return response
+
+
+def generate_layout_output(response, overlap_threshold, index=None):
+    """
+    Generates a simplified layout-wise output.
+    Removes LAYOUT_TABLE blocks that are already covered by structured TABLE blocks.
+
+    :param overlap_threshold: Fraction of a LAYOUT_TABLE's area a TABLE must cover to drop it
+    :param index: Optional BlockIndex of the response, built here if not provided
+    """
+    index = index or BlockIndex(response['Blocks'])
+
+    # Filter LAYOUT_TABLE blocks that overlap with TABLE blocks on the same page
+    covered_ids = covered_layout_tables(
+        index.of_type('LAYOUT_TABLE'), index.of_type('TABLE'), overlap_threshold
+    )
+
+    final_blocks = []
+    for page in sorted(index.by_page):
+        # TABLE blocks, then the layout blocks that are kept, each in response order
+        tables, layouts = [], []
+        for block in index.by_page[page]:
+            block_type = block['BlockType']
+            if block_type == 'TABLE':
+                tables.append(block)
+            elif block_type[:7] == 'LAYOUT_' and block['Id'] not in covered_ids:
+                layouts.append(block)
+
+        # Sort by Top, then Left
+        page_blocks = tables + layouts
+        page_blocks.sort(key=reading_order_key)
+        final_blocks += page_blocks
+
+    output_data = []
+    for block in final_blocks:
+        item = {
+            "type": block['BlockType'].replace('_', ' ').title(), # e.g. "Layout Header", "Table"
+            "page": block.get('Page', 1),
+            "confidence": block.get('Confidence'),
+            "geometry": block.get('Geometry')
+        }
+
+        if block['BlockType'] == 'TABLE':
+            item["type"] = "Layout Table" # Normalize name as requested
+            item["table_data"] = block.get('TableData', [])
+        else:
+            item["text"] = block.get('Text', '')
+
+        output_data.append(item)
+
+    return output_data
+
+
+def postprocess_pages(pages, overlap_threshold):
+    """
+    Enriches each page's blocks and generates its layout.
+
+    :param pages: List of block lists, one per page (or a single list for a whole response)
+    :return: List of (enriched blocks, layout items) per page
+    """
+    processed = []
+    for blocks in pages:
+        response = {'Blocks': blocks}
+        index = BlockIndex(blocks)
+        enrich_response_with_text(response, index)
+        enrich_tables(response, index)
+        processed.append((blocks, generate_layout_output(response, overlap_threshold, index)))
+    return processed
+
+
+def dumps(data):
+    """Serializes blocks for the trip to and from a pool worker."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def loads(payload):
+    if orjson is not None:
+        return orjson.loads(payload)
+    return pickle.loads(payload)
+
+
+def postprocess_serialized(payload, overlap_threshold, layout_indent):
+    """
+    Process pool entry point: postprocess_pages over serialized pages.
+
+    The layout items are also rendered for the layout file here, so the API process only
+    deserializes the results and writes the text.
+
+    :return: Serialized list of (enriched blocks, layout items, rendered layout items) per page
+    """
+    processed = postprocess_pages(loads(payload), overlap_threshold)
+    return dumps([
+        (blocks, items, [render_item(item, layout_indent) for item in items])
+        for blocks, items in processed
+    ])
+
+
+def encode_cache_value(payload):
+    """
+    Process pool entry point: ResultCache.encode() of a pickled result.
+
+    Pickle rather than dumps(), since the blocks may be a BlockStore, whose columns
+    pickle as a few buffers.
+    """
+    return ResultCache.encode(pickle.loads(payload))
+
+
+def reprocess_document(source, layout_path, index_path, overlap_threshold, layout_indent, provenance):
+    """
+    Process pool entry point of the Reprocessor: enriches a stored raw response again and
+    rewrites the document's layout output and page index.
+
+    :param source: Path of an '_original' artifact, or a result cache value (bytes)
+    :param provenance: Stored in the page index of the new layout (see LayoutStreamWriter)
+    :return: Dict of the page, block and layout item counts, block counts by type and the
+             search segments of the new layout
+    """
+    result = ResultCache.decode(source) if isinstance(source, bytes) else OutputWriter.read_file(source)
+    [(blocks, items)] = postprocess_pages([result['Blocks']], overlap_threshold)
+    with LayoutStreamWriter(layout_path, indent=layout_indent, index_path=index_path, provenance=provenance) as writer:
+        writer.write_items(items)
+    return {
+        "page_count": result.get('DocumentMetadata', {}).get('Pages'),
+        "block_count": len(blocks),
+        "layout_item_count": len(items),
+        "block_counts": dict(Counter(block['BlockType'] for block in blocks)),
+        "segments": list(SearchIndex.segments_of(items)),
+    }
@@ -0,0 +1,69 @@
+import logging
+import os
+import threading
+import time
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Default transactions per second per Textract API; match them to the account's quotas
+DEFAULT_TPS = {
+    "AnalyzeDocument": 1.0,
+    "StartDocumentAnalysis": 1.0,
+    "GetDocumentAnalysis": 5.0,
+}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        Thread-safe token bucket.
+
+        :param rate: Tokens added per second
+        :param capacity: Maximum burst size (default: max(rate, 1))
+        """
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until tokens are available, then take them."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class TextractRateLimiter:
+    def __init__(self, tps: dict = None):
+        """
+        One shared token bucket per Textract API, so concurrent jobs stay under the
+        account's TPS quotas instead of failing with throttling errors.
+
+        :param tps: Mapping of API name to transactions per second (default: DEFAULT_TPS,
+                    overridden by TEXTRACT_TPS_<API> such as TEXTRACT_TPS_ANALYZE_DOCUMENT)
+        """
+        tps = tps or {
+            api: float(os.getenv(f"TEXTRACT_TPS_{_env_suffix(api)}", str(default)))
+            for api, default in DEFAULT_TPS.items()
+        }
+        self.buckets = {api: TokenBucket(rate) for api, rate in tps.items() if rate > 0}
+
+    def acquire(self, api: str):
+        bucket = self.buckets.get(api)
+        if bucket:
+            with metrics.span("rate_limit_wait"):
+                bucket.acquire()
+
+
+def _env_suffix(api):
+    # "AnalyzeDocument" -> "ANALYZE_DOCUMENT"
+    return "".join(f"_{c}" if c.isupper() and i else c for i, c in enumerate(api)).upper()
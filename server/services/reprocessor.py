@@ -0,0 +1,212 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from services import postprocessing
+
+logger = logging.getLogger(__name__)
+
+# Errors kept in the status of a run; the rest are only logged
+MAX_REPORTED_ERRORS = 20
+# Completed documents between progress log lines
+PROGRESS_EVERY = 500
+
+
+class Reprocessor:
+    def __init__(self, textract_manager, workers=None):
+        """
+        Rebuilds the layout output of stored documents from their raw Textract responses,
+        without calling Textract again.
+
+        A document's raw response is its '_original' artifact, or else its entry in the
+        result cache (found through the document catalog). Layouts written by the current
+        post-processing code and settings, from an unchanged artifact, are skipped. The
+        others are enriched and laid out again in a process pool, and their catalog row and
+        search segments are updated.
+
+        '_original' artifacts are only written for every document with OUTPUT_WRITE_RAW;
+        otherwise a document can be rebuilt only while its result cache entry is kept.
+
+        :param textract_manager: TextractManager whose outputs, cache, catalog and search index are used
+        :param workers: Worker processes (default: REPROCESS_WORKERS, or the number of CPUs)
+        """
+        self.manager = textract_manager
+        self.workers = workers or int(os.getenv('REPROCESS_WORKERS') or 0) or os.cpu_count() or 1
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.status = None
+        self.thread = None
+
+    def start(self, force=False, names=None):
+        """
+        Starts a run on a background thread.
+
+        :return: Status of the new run
+        :raises RuntimeError: If a run is already in progress
+        """
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                raise RuntimeError("A reprocessing run is already in progress")
+            self.status = self._new_status(force)
+            self.thread = threading.Thread(
+                target=self.run, kwargs={"force": force, "names": names, "status": self.status},
+                name="reprocess", daemon=True
+            )
+            self.thread.start()
+        return self.get_status()
+
+    def get_status(self):
+        """Return a copy of the status of the current or last run, or None before the first."""
+        with self.lock:
+            if self.status is None:
+                return None
+            return {**self.status, "errors": list(self.status["errors"])}
+
+    def shutdown(self):
+        """Stops submitting documents; those already in the pool are finished."""
+        self.stopping.set()
+
+    def run(self, force=False, names=None, status=None):
+        """
+        Rebuilds the layout output of stored documents.
+
+        :param force: Rebuild layouts that are up to date too
+        :param names: Only these documents (default: every stored document)
+        :param status: Dict updated with the progress of the run (default: a new one)
+        :return: The status dict: counts of documents rebuilt, skipped (up to date),
+                 unavailable (no raw response) and failed, with the first errors
+        """
+        status = status if status is not None else self._new_status(force)
+        manager = self.manager
+        output_writer = manager.output_writer
+        start = time.perf_counter()
+        self.stopping.clear()
+
+        try:
+            sources = self._sources(names)
+            with self.lock:
+                status["documents"] = len(sources)
+            logger.info(f"Reprocessing {len(sources)} stored document(s) with {self.workers} worker(s)")
+
+            # Forking a process that runs threads is unsafe, so workers start from a clean interpreter
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            in_flight = deque()
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(start_method)) as pool:
+                for name, source in sources:
+                    if self.stopping.is_set():
+                        break
+                    source, provenance = self._resolve(name, source, force, status)
+                    if source is None:
+                        continue
+                    in_flight.append((name, pool.submit(
+                        postprocessing.reprocess_document, source, output_writer.layout_path(name),
+                        output_writer.layout_index_path(name), manager.layout_table_overlap_threshold,
+                        output_writer.layout_indent, provenance
+                    )))
+                    # A bounded window keeps cached results from piling up in memory
+                    while len(in_flight) >= self.workers * 4:
+                        self._finish(*in_flight.popleft(), status)
+                while in_flight:
+                    self._finish(*in_flight.popleft(), status)
+            state = "stopped" if self.stopping.is_set() else "completed"
+        except Exception as e:
+            logger.exception("Reprocessing failed")
+            state = "failed"
+            with self.lock:
+                status["errors"].append({"document": None, "error": str(e)})
+
+        with self.lock:
+            status.update(
+                state=state, seconds=round(time.perf_counter() - start, 3),
+                finished_at=datetime.now(timezone.utc).isoformat()
+            )
+        logger.info(
+            f"Reprocessing {state}: {status['rebuilt']} rebuilt, {status['skipped']} up to date, "
+            f"{status['unavailable']} unavailable, {status['failed']} failed in {status['seconds']} s"
+        )
+        return status
+
+    def _sources(self, names=None):
+        """
+        Lists (name, source) of the stored documents, where source is an '_original'
+        artifact path or a (document hash, feature types) pair to look up in the cache.
+        """
+        output_writer = self.manager.output_writer
+        sources = {}
+        for name in output_writer.find_originals():
+            sources[name] = output_writer.find_artifact(name, 'original')
+        if self.manager.result_cache.enabled:
+            for name, document_hash, feature_types in self.manager.document_catalog.hashed_documents():
+                if name not in sources and feature_types:
+                    sources[name] = (document_hash, feature_types)
+        if names is not None:
+            wanted = set(names)
+            return [(name, sources.get(name)) for name in sorted(wanted)]
+        return sorted(sources.items())
+
+    def _resolve(self, name, source, force, status):
+        """
+        Returns what the worker reads for a document and the provenance of its new layout,
+        or (None, None) if the document is skipped or unavailable.
+
+        A layout is up to date when it was written with the current layout version and,
+        if it was rebuilt from an '_original' artifact, that artifact has the same size and
+        mtime as then. Layouts written while processing are built from the same result as
+        the artifacts, so only their version is compared.
+        """
+        manager = self.manager
+        provenance = dict(manager.layout_provenance)
+        if isinstance(source, str):
+            stat = os.stat(source)
+            provenance["source"] = [stat.st_size, stat.st_mtime_ns]
+
+        if not force:
+            current = manager.output_writer.read_layout_provenance(name)
+            same_source = "source" not in current or current["source"] == provenance.get("source")
+            if current.get("layout_version") == manager.layout_version and same_source:
+                self._count(status, "skipped")
+                return None, None
+        if isinstance(source, tuple):
+            document_hash, feature_types = source
+            source = manager.result_cache.get_encoded(manager.result_cache.make_key(document_hash, feature_types))
+        if source is None:
+            logger.info(f"No stored raw response for {name}, skipping")
+            self._count(status, "unavailable")
+            return None, None
+        return source, provenance
+
+    def _finish(self, name, future, status):
+        try:
+            summary = future.result()
+        except Exception as e:
+            logger.exception(f"Could not reprocess {name}")
+            with self.lock:
+                status["failed"] += 1
+                if len(status["errors"]) < MAX_REPORTED_ERRORS:
+                    status["errors"].append({"document": name, "error": str(e)})
+            return
+
+        segments = summary.pop("segments")
+        self.manager.document_catalog.update(name, **summary)
+        if self.manager.search_index.enabled:
+            self.manager.search_index.index_document(name, segments=segments)
+        self._count(status, "rebuilt")
+
+    def _count(self, status, outcome):
+        with self.lock:
+            status[outcome] += 1
+            done = status["rebuilt"] + status["skipped"] + status["unavailable"] + status["failed"]
+        if done % PROGRESS_EVERY == 0:
+            logger.info(f"Reprocessed {done}/{status['documents']} document(s)")
+
+    @staticmethod
+    def _new_status(force):
+        return {
+            "state": "running", "force": force, "started_at": datetime.now(timezone.utc).isoformat(),
+            "finished_at": None, "seconds": None, "documents": None,
+            "rebuilt": 0, "skipped": 0, "unavailable": 0, "failed": 0, "errors": []
+        }
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from services.block_store import iter_json
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def compute_document_hash(file_path=None, file_bytes=None) -> str:
+    """
+    Return the SHA-256 hex digest of a document, reading files in chunks.
+
+    :param file_path: Path to the document file (optional if file_bytes is provided)
+    :param file_bytes: Byte content of the document (optional if file_path is provided)
+    """
+    digest = hashlib.sha256()
+    if file_bytes is not None:
+        digest.update(file_bytes)
+    elif file_path:
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    else:
+        raise ValueError("Either file_path or file_bytes must be provided")
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, db_path=None, max_bytes=None, model_version=None, enabled=None):
+        """
+        Persistent, size-bounded LRU cache of enriched Textract results.
+
+        Entries are keyed on the document hash, the sorted feature types and the model
+        version, and are stored zlib-compressed in SQLite so they survive restarts.
+
+        :param db_path: SQLite file holding the cache (default: RESULT_CACHE_PATH)
+        :param max_bytes: Maximum total size of stored entries (default: RESULT_CACHE_MAX_BYTES, 1 GiB)
+        :param model_version: Version tag mixed into every key; bump it to invalidate old
+                              entries (default: TEXTRACT_MODEL_VERSION)
+        :param enabled: Turn the cache on or off (default: RESULT_CACHE_ENABLED)
+        """
+        self.enabled = enabled if enabled is not None else os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+        self.db_path = db_path or os.getenv('RESULT_CACHE_PATH', 'output/cache/results.sqlite3')
+        self.max_bytes = max_bytes or int(os.getenv('RESULT_CACHE_MAX_BYTES', str(1024 ** 3)))
+        self.model_version = model_version or os.getenv('TEXTRACT_MODEL_VERSION', '1.0')
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.conn = None
+
+        if self.enabled:
+            self._open()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results (last_access)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        logger.info(f"Result cache opened at {self.db_path} ({self.total_bytes} bytes)")
+
+    def make_key(self, document_hash: str, feature_types: list) -> str:
+        """Build the cache key for a document hash and its requested feature types."""
+        features = ",".join(sorted(feature_types or []))
+        return hashlib.sha256(f"{document_hash}|{features}|{self.model_version}".encode()).hexdigest()
+
+    def get(self, key: str):
+        """Return the cached enriched result for key, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            self.hits += 1
+
+        logger.info(f"Result cache hit for {key}")
+        return self.decode(row[0])
+
+    def get_encoded(self, key: str):
+        """Return the stored value for key as written by encode(), without counting a hit, or None."""
+        if not self.enabled:
+            return None
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def decode(value: bytes) -> dict:
+        """Decode a value produced by encode()."""
+        return json.loads(zlib.decompress(value))
+
+    @staticmethod
+    def encode(result: dict) -> bytes:
+        """Encode an enriched result the way it is stored; a BlockStore is encoded chunk by chunk."""
+        compressor = zlib.compressobj()
+        payload = [
+            compressor.compress(piece)
+            for piece in iter_json(result, lambda value: json.dumps(value, separators=(",", ":")).encode())
+        ]
+        payload.append(compressor.flush())
+        return b"".join(payload)
+
+    def put(self, key: str, result: dict):
+        """Store an enriched result and evict least recently used entries over the size limit."""
+        if not self.enabled:
+            return
+        self.put_encoded(key, self.encode(result))
+
+    def put_encoded(self, key: str, value: bytes):
+        """Store a result already encoded with encode(), e.g. by a worker process."""
+        if not self.enabled:
+            return
+
+        size = len(value)
+        if size > self.max_bytes:
+            logger.info(f"Result for {key} ({size} bytes) exceeds the cache size limit, not caching")
+            return
+
+        with self.lock:
+            previous = self.conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            self.total_bytes += size - (previous[0] if previous else 0)
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes:
+            row = self.conn.execute("SELECT key, size FROM results ORDER BY last_access LIMIT 1").fetchone()
+            if row is None:
+                break
+            self.conn.execute("DELETE FROM results WHERE key = ?", (row[0],))
+            self.total_bytes -= row[1]
+            self.evictions += 1
+            logger.info(f"Evicted {row[0]} from result cache")
+
+    def stats(self) -> dict:
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] if self.conn else 0
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+                "size_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Words of a query; FTS5 operators and punctuation in user input are never interpreted
+QUERY_TERM_PATTERN = re.compile(r"\w+\*?")
+
+
+class SearchIndex:
+    def __init__(self, db_path=None, enabled=None):
+        """
+        Incremental full-text index over the layout text and table cells of processed documents.
+
+        Every layout item with text and every table cell becomes one indexed segment that
+        keeps its document, page and bounding box, so hits can point at a location on a
+        page. Segments live in an SQLite FTS5 table ranked with bm25; a plain table indexed
+        on the document name lets a reprocessed document replace its segments quickly.
+
+        :param db_path: SQLite file holding the index (default: SEARCH_INDEX_PATH)
+        :param enabled: Turn the index on or off (default: SEARCH_INDEX_ENABLED)
+        """
+        self.enabled = enabled if enabled is not None else os.getenv('SEARCH_INDEX_ENABLED', 'true').lower() == 'true'
+        self.db_path = db_path or os.getenv('SEARCH_INDEX_PATH', 'output/catalog/search.sqlite3')
+        self.lock = threading.Lock()
+        self.conn = None
+
+        if self.enabled:
+            self._open()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(text, tokenize='unicode61')")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite was built without FTS5, search is disabled: {e}")
+            self.conn.close()
+            self.conn = None
+            self.enabled = False
+            return
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            "id INTEGER PRIMARY KEY, document TEXT NOT NULL, page INTEGER, kind TEXT, "
+            "row_index INTEGER, column_index INTEGER, geometry TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_segments_document ON segments (document)")
+        self.conn.commit()
+        logger.info(f"Search index opened at {self.db_path}")
+
+    @staticmethod
+    def segments_of(layout_data):
+        """
+        Yields (text, page, kind, row index, column index, bounding box) for the layout
+        items with text and the cells of every table.
+        """
+        for item in layout_data:
+            page = item.get("page", 1)
+            if item.get("text"):
+                yield item["text"], page, item.get("type"), None, None, _bounding_box(item.get("geometry"))
+            for row in item.get("table_data") or ():
+                for cell in row:
+                    if cell.get("text"):
+                        yield (cell["text"], page, "Table Cell", cell.get("rowIndex"), cell.get("columnIndex"),
+                               _bounding_box(cell.get("geometry")))
+
+    def index_document(self, document, layout_data=None, segments=None):
+        """
+        Replaces the indexed segments of a document with those of its layout output.
+
+        :param segments: The segments_of() the layout, if already computed (e.g. in a worker process)
+        """
+        if not self.enabled:
+            return
+
+        segments = list(self.segments_of(layout_data)) if segments is None else segments
+        try:
+            with self.lock:
+                self._delete(document)
+                cursor = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM segments")
+                first_id = cursor.fetchone()[0] + 1
+                self.conn.executemany(
+                    "INSERT INTO segments (id, document, page, kind, row_index, column_index, geometry) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (segment_id, document, page, kind, row_index, column_index,
+                         json.dumps(box, separators=(",", ":")) if box else None)
+                        for segment_id, (_, page, kind, row_index, column_index, box) in enumerate(segments, first_id)
+                    )
+                )
+                self.conn.executemany(
+                    "INSERT INTO segments_fts (rowid, text) VALUES (?, ?)",
+                    ((segment_id, segment[0]) for segment_id, segment in enumerate(segments, first_id))
+                )
+                self.conn.commit()
+        except sqlite3.Error:
+            # The outputs are already written; a document missing from search must not fail it
+            logger.exception(f"Could not index {document} for search")
+            return
+        logger.info(f"Indexed {len(segments)} text segment(s) of {document}")
+
+    def _delete(self, document):
+        # Caller holds self.lock
+        ids = [(row[0],) for row in self.conn.execute("SELECT id FROM segments WHERE document = ?", (document,))]
+        if ids:
+            self.conn.executemany("DELETE FROM segments_fts WHERE rowid = ?", ids)
+            self.conn.execute("DELETE FROM segments WHERE document = ?", (document,))
+
+    def search(self, query, limit=20, offset=0, document=None):
+        """
+        Return the segments matching every word of query, best bm25 score first.
+
+        A word ending in * matches as a prefix.
+
+        :param document: Only search this document
+        :return: List of hits with document, page, kind, text snippet, bounding box and score
+        """
+        terms = QUERY_TERM_PATTERN.findall(query or "")
+        if not self.enabled or not terms:
+            return []
+        # Every term is quoted, so FTS5 syntax in the query cannot cause errors
+        match = " ".join(f'"{term[:-1]}"*' if term.endswith("*") else f'"{term}"' for term in terms)
+
+        sql = (
+            "SELECT s.document, s.page, s.kind, s.row_index, s.column_index, s.geometry, "
+            "snippet(segments_fts, 0, '<mark>', '</mark>', '…', 16), bm25(segments_fts) AS score "
+            "FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid WHERE segments_fts MATCH ?"
+        )
+        params = [match]
+        if document:
+            sql += " AND s.document = ?"
+            params.append(document)
+        sql += " ORDER BY score LIMIT ? OFFSET ?"
+        params += [limit, offset]
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+
+        hits = []
+        for document_name, page, kind, row_index, column_index, geometry, snippet, score in rows:
+            hit = {
+                "document": document_name,
+                "page": page,
+                "kind": kind,
+                "snippet": snippet,
+                "geometry": {"BoundingBox": json.loads(geometry)} if geometry else None,
+                # bm25() is lower for better matches; reported so that higher is better
+                "score": round(-score, 4),
+            }
+            if row_index is not None:
+                hit["row_index"] = row_index
+                hit["column_index"] = column_index
+            hits.append(hit)
+        return hits
+
+
+def _bounding_box(geometry):
+    return (geometry or {}).get("BoundingBox")
@@ -1,10 +1,34 @@
 import boto3
+import contextvars
+import io
 import json
 import logging
-import time
+import multiprocessing
+import pickle
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import groupby
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import os
 from dotenv import load_dotenv
+from services.result_cache import ResultCache, compute_document_hash
+from services.document_catalog import DocumentCatalog
+from services.search_index import SearchIndex
+from services.job_journal import JobJournal, JOURNAL_COMPLETED, JOURNAL_FAILED
+from services.job_poller import JobPollerStopped, JobWaitTimeout, TextractJobPoller, SqsNotificationQueue
+from services.rate_limiter import TextractRateLimiter
+from services.layout_stream import LayoutStreamWriter
+from services.output_writer import OutputWriter, RESPONSE_KEYS, RAW_ARTIFACTS
+from services.block_index import BlockIndex
+from services.block_store import BlockStore
+from services import postprocessing
+from services.image_preprocessor import ImagePreprocessor
+from services.pdf_inspector import count_pdf_pages, split_pdf_pages, PDF_SPLIT_SUPPORTED
+from services.textract_simulator import SimulatedTextractClient, SimulatedS3Client
+from services import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,26 +36,153 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# AnalyzeDocument errors for a PDF that is not the single page its quick page count said
+SYNC_PDF_REJECTIONS = ('UnsupportedDocumentException', 'InvalidParameterException')
+SYNC_PDF_FALLBACKS = metrics.REGISTRY.counter(
+    "ocr_sync_pdf_fallbacks_total", "PDFs routed to AnalyzeDocument that were rejected and sent to an async job"
+)
+
 class TextractManager:
-    def __init__(self):
-        """Initialize the Textract client."""
+    def __init__(self, result_cache=None, output_writer=None, textract_client=None, s3_client=None, bucket_name=None,
+                 document_catalog=None, search_index=None, job_journal=None, image_preprocessor=None):
+        """
+        Initialize the Textract client.
+
+        :param result_cache: Optional ResultCache for enriched results (default: a new ResultCache)
+        :param output_writer: Optional OutputWriter for the per-document files (default: a new OutputWriter)
+        :param document_catalog: Optional DocumentCatalog of processed documents (default: a new DocumentCatalog)
+        :param search_index: Optional SearchIndex over the layout text (default: a new SearchIndex)
+        :param job_journal: Optional JobJournal of async Textract jobs (default: a new JobJournal)
+        :param image_preprocessor: Optional ImagePreprocessor for uploaded images (default: a new ImagePreprocessor)
+        :param textract_client: Optional Textract client (default: boto3, or the simulator with TEXTRACT_BACKEND=simulator)
+        :param s3_client: Optional S3 client (default: boto3, or the simulator with TEXTRACT_BACKEND=simulator)
+        :param bucket_name: S3 bucket for async PDF jobs (default: S3_BUCKET_NAME)
+        """
         # Ensure environment variables are loaded or passed explicitly
         # Using environment variables for credentials
-        self.textract_client = boto3.client(
+        self.region_name = os.getenv('AWS_REGION', 'ap-south-1')
+        self.backend = os.getenv('TEXTRACT_BACKEND', 'aws')
+        if self.backend == 'simulator':
+            # Offline synthetic responses for local runs and benchmarks, no AWS credentials needed
+            s3_client = s3_client or SimulatedS3Client()
+            textract_client = textract_client or SimulatedTextractClient(s3_client)
+        elif self.backend != 'aws':
+            raise ValueError(f"Unsupported TEXTRACT_BACKEND: {self.backend}")
+
+        self.textract_client = textract_client or boto3.client(
             'textract', 
-            region_name='ap-south-1', 
+            region_name=self.region_name, 
             aws_access_key_id=os.getenv('aws_access_key_id'), 
             aws_secret_access_key=os.getenv('aws_secret_access_key'), 
-            aws_session_token=os.getenv('aws_session_token')
+            aws_session_token=os.getenv('aws_session_token'),
+            # Throttled calls that still slip past the rate limiter are retried with backoff
+            config=Config(retries={'mode': 'standard', 'max_attempts': 8})
         )
-        self.s3_client = boto3.client(
+        # Shared across every job so bursts stay within the account's Textract TPS quotas
+        self.rate_limiter = TextractRateLimiter()
+        self.s3_client = s3_client or boto3.client(
             's3',
-            region_name='ap-south-1',
+            region_name=self.region_name,
+            # Point at a local S3-compatible server (e.g. MinIO) for testing
+            endpoint_url=os.getenv('S3_ENDPOINT_URL') or None,
             aws_access_key_id=os.getenv('aws_access_key_id'),
             aws_secret_access_key=os.getenv('aws_secret_access_key'),
             aws_session_token=os.getenv('aws_session_token')
         )
-        self.bucket_name = "textract-ocr-poc-bucket"
+        self.bucket_name = bucket_name or os.getenv('S3_BUCKET_NAME', 'textract-ocr-poc-bucket')
+        # Input PDFs are stored under their content hash, so identical files share one object
+        # and different files with the same name never overwrite each other
+        self.s3_key_prefix = os.getenv('S3_KEY_PREFIX', 'uploads/')
+        # Delete each input object once no running job reads it; set to false to leave
+        # cleanup to a lifecycle expiration rule on S3_KEY_PREFIX instead
+        self.s3_delete_after_job = os.getenv('S3_DELETE_AFTER_JOB', 'true').lower() == 'true'
+        # key -> {"refs", "lock", "uploaded"} for the input objects of running jobs
+        self.s3_uploads = {}
+        self.s3_uploads_lock = threading.Lock()
+        # job_id -> key of the input object the job reads
+        self.job_s3_keys = {}
+
+        # Files above one part are sent as parallel multipart uploads, read from disk part by part
+        part_size = int(os.getenv('S3_MULTIPART_PART_SIZE', str(16 * 1024 * 1024)))
+        self.s3_transfer_config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=int(os.getenv('S3_UPLOAD_CONCURRENCY', '8')),
+            use_threads=True
+        )
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+        self.output_writer = output_writer if output_writer is not None else OutputWriter()
+        self.document_catalog = document_catalog if document_catalog is not None else DocumentCatalog()
+        self.document_catalog.import_existing(self.output_writer.layout_output_dir)
+        # Raw artifacts are written in the background (or on first read), so their paths
+        # reach the catalog once they are on disk; the lock orders that with record()
+        self.catalog_lock = threading.Lock()
+        self.output_writer.on_written = self._record_artifact
+        # Deferred artifacts of results no longer in memory are built from the cached result
+        self.output_writer.load_result = self._load_cached_result
+        self.search_index = search_index if search_index is not None else SearchIndex()
+        # Async jobs survive restarts, and a document whose job is still running joins it
+        self.job_journal = job_journal if job_journal is not None else JobJournal()
+        # Large images are downscaled and re-encoded before AnalyzeDocument (IMAGE_PREPROCESS_ENABLED)
+        self.image_preprocessor = image_preprocessor if image_preprocessor is not None else ImagePreprocessor()
+        # (document hash, feature types) -> Future of the JobId of a job being started
+        self.starting_jobs = {}
+        self.starting_jobs_lock = threading.Lock()
+
+        # LAYOUT_TABLE blocks covered above this fraction by a TABLE block are dropped from the layout output
+        self.layout_table_overlap_threshold = float(os.getenv('LAYOUT_TABLE_OVERLAP_THRESHOLD', '0.75'))
+        # Stored with each layout file; the reprocessor rebuilds layouts written with another version
+        self.layout_version = postprocessing.layout_version(self.layout_table_overlap_threshold)
+        self.layout_provenance = {"layout_version": self.layout_version}
+        self.output_writer.layout_version = self.layout_version
+
+        # Single-page PDFs up to this size go through synchronous AnalyzeDocument, skipping S3 and the async job
+        self.sync_pdf_max_bytes = int(os.getenv('TEXTRACT_SYNC_PDF_MAX_BYTES', str(10 * 1024 * 1024)))
+        # PDFs with up to this many pages are split and analyzed page by page in parallel (0 disables; needs pypdf)
+        self.pdf_split_max_pages = int(os.getenv('PDF_SPLIT_MAX_PAGES', '0'))
+        self.pdf_split_workers = int(os.getenv('PDF_SPLIT_WORKERS', '4'))
+
+        # Enrichment and layout generation of large responses run in worker processes, so
+        # they neither hold the GIL of the API process nor stay on a single core (0 disables)
+        self.postprocess_workers = int(os.getenv('POSTPROCESS_WORKERS', '0'))
+        self.postprocess_min_blocks = int(os.getenv('POSTPROCESS_MIN_BLOCKS', '10000'))
+        self.postprocess_pool = None
+        # Enriched blocks are kept in a BlockStore instead of boto dicts until they are written
+        self.compact_blocks = os.getenv('COMPACT_BLOCKS', 'true').lower() == 'true'
+        if self.postprocess_workers > 0:
+            # Forking a process that runs threads is unsafe, so workers start from a clean interpreter
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self.postprocess_pool = ProcessPoolExecutor(
+                max_workers=self.postprocess_workers, mp_context=multiprocessing.get_context(start_method)
+            )
+
+        # One poller multiplexes every outstanding async job
+        self.job_poller = TextractJobPoller(self.textract_client, rate_limiter=self.rate_limiter)
+        metrics.REGISTRY.gauge(
+            "ocr_textract_jobs_tracked", "Async Textract jobs the poller is waiting on", lambda: len(self.job_poller.jobs)
+        )
+        metrics.REGISTRY.gauge(
+            "ocr_textract_status_polls", "GetDocumentAnalysis status polls made since startup", lambda: self.job_poller.poll_count
+        )
+        metrics.REGISTRY.gauge(
+            "ocr_result_cache", "Result cache statistics", lambda: {
+                (stat,): value for stat, value in self.result_cache.stats().items() if not isinstance(value, bool)
+            }, label_names=("stat",)
+        )
+
+        # Optional SNS completion notifications, delivered to the poller through SQS
+        self.sns_topic_arn = os.getenv('TEXTRACT_SNS_TOPIC_ARN')
+        self.sns_role_arn = os.getenv('TEXTRACT_SNS_ROLE_ARN')
+        sqs_queue_url = os.getenv('TEXTRACT_SQS_QUEUE_URL')
+        if sqs_queue_url and self.backend == 'aws':
+            sqs_client = boto3.client(
+                'sqs',
+                region_name=self.region_name,
+                aws_access_key_id=os.getenv('aws_access_key_id'),
+                aws_secret_access_key=os.getenv('aws_secret_access_key'),
+                aws_session_token=os.getenv('aws_session_token')
+            )
+            self.job_poller.listen(SqsNotificationQueue(sqs_client, sqs_queue_url))
 
     def analyze_file(
         self, feature_types, *, document_file_name=None, document_bytes=None
@@ -39,7 +190,7 @@ class TextractManager:
         """
         Detects text and additional elements, such as forms or tables, in a local image
         file or from in-memory byte data.
-        The image must be in PNG or JPG format.
+        The document must be a PNG, JPEG or TIFF image, or a single-page PDF.
 
         :param feature_types: The types of additional document features to detect.
         :param document_file_name: The name of a document image file.
@@ -51,9 +202,12 @@ class TextractManager:
             with open(document_file_name, "rb") as document_file:
                 document_bytes = document_file.read()
         try:
-            response = self.textract_client.analyze_document(
-                Document={"Bytes": document_bytes}, FeatureTypes=feature_types
-            )
+            self.rate_limiter.acquire('AnalyzeDocument')
+            with metrics.span("analyze_document", bytes=len(document_bytes)) as span:
+                response = self.textract_client.analyze_document(
+                    Document={"Bytes": document_bytes}, FeatureTypes=feature_types
+                )
+                span.update(blocks=len(response["Blocks"]), pages=response.get('DocumentMetadata', {}).get('Pages', 1))
             logger.info("Detected %s blocks.", len(response["Blocks"]))
         except ClientError:
             logger.exception("Couldn't detect text.")
@@ -62,8 +216,18 @@ class TextractManager:
             return response
 
     def upload_to_s3(self, object_name, file_path=None, file_bytes=None):
+        size = len(file_bytes) if file_bytes else (os.path.getsize(file_path) if file_path else 0)
+        with metrics.span("s3_upload", bytes=size):
+            self._upload_to_s3(object_name, file_path=file_path, file_bytes=file_bytes)
+
+    def _upload_to_s3(self, object_name, file_path=None, file_bytes=None):
         try:
-            if file_bytes:
+            if file_bytes and len(file_bytes) >= self.s3_transfer_config.multipart_threshold:
+                self.s3_client.upload_fileobj(
+                    io.BytesIO(file_bytes), self.bucket_name, object_name, Config=self.s3_transfer_config
+                )
+                logger.info(f"Uploaded bytes to s3://{self.bucket_name}/{object_name} (multipart)")
+            elif file_bytes:
                 self.s3_client.put_object(
                     Body=file_bytes, 
                     Bucket=self.bucket_name, 
@@ -71,7 +235,7 @@ class TextractManager:
                 )
                 logger.info(f"Uploaded bytes to s3://{self.bucket_name}/{object_name}")
             elif file_path:
-                self.s3_client.upload_file(file_path, self.bucket_name, object_name)
+                self.s3_client.upload_file(file_path, self.bucket_name, object_name, Config=self.s3_transfer_config)
                 logger.info(f"Uploaded {file_path} to s3://{self.bucket_name}/{object_name}")
             else:
                 raise ValueError("Either file_path or file_bytes must be provided")
@@ -79,41 +243,24 @@ class TextractManager:
             logger.error(f"Error uploading to S3: {e}")
             raise
 
-    def wait_for_job(self, job_id):
-        while True:
-            response = self.textract_client.get_document_analysis(JobId=job_id)
-            status = response['JobStatus']
-            logger.info(f"Job status: {status}")
-            
-            if status in ['SUCCEEDED', 'FAILED']:
-                if status == 'FAILED':
-                    raise Exception(f"Job failed: {response}")
-                break
-            
-            time.sleep(5)
-        
-        # Fetch all blocks (pagination)
+    def wait_for_job(self, job_id, page_count=None):
+        """
+        Waits for an async job and returns the complete response with every block.
+        """
+        response = self._wait_for_completion(job_id, page_count=page_count)
+
+        # The final status poll already carries the first page of results
         blocks = []
-        next_token = None
         document_metadata = response.get('DocumentMetadata', {'Pages': 0})
         model_version = response.get('AnalyzeDocumentModelVersion', '1.0')
-        
-        while True:
-            params = {'JobId': job_id}
-            if next_token:
-                params['NextToken'] = next_token
-                
-            response = self.textract_client.get_document_analysis(**params)
+
+        for response in self.iter_job_responses(job_id, response):
             blocks.extend(response['Blocks'])
-            
+
             if 'DocumentMetadata' in response:
                 document_metadata = response['DocumentMetadata']
             if 'AnalyzeDocumentModelVersion' in response:
                 model_version = response['AnalyzeDocumentModelVersion']
-
-            next_token = response.get('NextToken')
-            if not next_token:
-                break
                 
         final_response = {
             'DocumentMetadata': document_metadata,
@@ -122,239 +269,605 @@ class TextractManager:
         }
         return final_response
 
-    def analyze_pdf(self, feature_types, file_path=None, file_bytes=None, file_name=None):
+    def _wait_for_completion(self, job_id, page_count=None):
+        # The shared poller backs off per job and wakes early on completion notifications
+        stopped = False
+        try:
+            with metrics.span("wait_for_job") as span:
+                response = self.job_poller.wait(job_id, page_count=page_count)
+                span["pages"] = response.get('DocumentMetadata', {}).get('Pages', 0)
+        except (JobPollerStopped, JobWaitTimeout):
+            # The job may still be running: its input is kept for a late success or a resume
+            stopped = True
+            raise
+        finally:
+            # Results are fetched from Textract, so the input object is no longer needed,
+            # unless the job is left for the journal to resume after a restart
+            with self.s3_uploads_lock:
+                object_name = self.job_s3_keys.pop(job_id, None)
+            if object_name and not stopped:
+                self.release_s3_object(object_name)
+        status = response['JobStatus']
+        logger.info(f"Job status: {status}")
+        if status == 'FAILED':
+            raise Exception(f"Job failed: {response}")
+        return response
+
+    def iter_job_responses(self, job_id, first_response):
+        """
+        Yields each paginated GetDocumentAnalysis response of a finished job, starting with
+        first_response and following NextToken lazily.
+        """
+        response = first_response
+        while True:
+            yield response
+
+            next_token = response.get('NextToken')
+            if not next_token:
+                break
+            self.rate_limiter.acquire('GetDocumentAnalysis')
+            with metrics.span("fetch_results") as span:
+                response = self.textract_client.get_document_analysis(JobId=job_id, NextToken=next_token)
+                span["blocks"] = len(response['Blocks'])
+
+    def iter_document_pages(self, responses):
+        """
+        Groups the blocks of paginated responses by document page and yields
+        (page_number, blocks) as soon as each page is complete.
+
+        Textract returns blocks in page order, so a page is complete once a block from a
+        later page arrives.
+
+        :raises ValueError: If a block arrives after its page was yielded, since the page
+                            would otherwise be written without it
+        """
+        pending = {}
+        finished_pages = set()
+
+        for response in responses:
+            for block in response['Blocks']:
+                page = block.get('Page', 1)
+                if page in finished_pages:
+                    raise ValueError(
+                        f"Block {block.get('Id')} of page {page} arrived after the page was completed; "
+                        f"Textract results are expected in page order"
+                    )
+                pending.setdefault(page, []).append(block)
+
+            # Everything below the highest page seen so far is complete
+            if pending:
+                last_page = max(pending)
+                for page in sorted(p for p in pending if p < last_page):
+                    finished_pages.add(page)
+                    yield page, pending.pop(page)
+
+        for page in sorted(pending):
+            yield page, pending.pop(page)
+
+    def s3_key_for(self, document_hash, file_name=None):
+        """Returns the S3 key of a document: its SHA-256 hex digest under S3_KEY_PREFIX, with its extension."""
+        extension = os.path.splitext(file_name)[1].lower() if file_name else ''
+        return f"{self.s3_key_prefix}{document_hash}{extension or '.pdf'}"
+
+    def _s3_object_exists(self, object_name, size):
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=object_name)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+                # e.g. 403 without s3:ListBucket; uploading again is always safe
+                logger.warning(f"Could not check s3://{self.bucket_name}/{object_name}: {e}")
+            return False
+        # A size mismatch means an interrupted or foreign object under this key
+        return response.get('ContentLength', size) == size
+
+    def acquire_s3_object(self, object_name, file_path=None, file_bytes=None):
+        """
+        Makes sure the document is stored under object_name, uploading it only if neither
+        a running job nor an earlier upload already put it there. Every call must be
+        paired with release_s3_object once the job no longer reads the object.
+        """
+        with self.s3_uploads_lock:
+            entry = self.s3_uploads.setdefault(object_name, {"refs": 0, "lock": threading.Lock(), "uploaded": False})
+            entry["refs"] += 1
+        try:
+            # Jobs for the same content wait for one upload instead of racing each other
+            with entry["lock"]:
+                if entry["uploaded"]:
+                    return
+                size = len(file_bytes) if file_bytes is not None else os.path.getsize(file_path)
+                with metrics.span("s3_head"):
+                    exists = self._s3_object_exists(object_name, size)
+                if exists:
+                    logger.info(f"s3://{self.bucket_name}/{object_name} already exists, skipping the upload")
+                else:
+                    self.upload_to_s3(object_name, file_path=file_path, file_bytes=file_bytes)
+                entry["uploaded"] = True
+        except Exception:
+            self.release_s3_object(object_name)
+            raise
+
+    def release_s3_object(self, object_name):
+        """Drops one reference to an input object and deletes it after the last one (S3_DELETE_AFTER_JOB)."""
+        with self.s3_uploads_lock:
+            entry = self.s3_uploads.get(object_name)
+            if entry is None:
+                return
+            entry["refs"] -= 1
+            if entry["refs"] > 0:
+                return
+            if not self.s3_delete_after_job:
+                del self.s3_uploads[object_name]
+                return
+
+        # Jobs that pick up the key meanwhile wait on the entry lock and upload it again
+        with entry["lock"]:
+            with self.s3_uploads_lock:
+                if entry["refs"] > 0:
+                    return
+            try:
+                with metrics.span("s3_delete"):
+                    self.s3_client.delete_object(Bucket=self.bucket_name, Key=object_name)
+                logger.info(f"Deleted s3://{self.bucket_name}/{object_name}")
+            except ClientError as e:
+                logger.warning(f"Could not delete s3://{self.bucket_name}/{object_name}: {e}")
+            entry["uploaded"] = False
+            with self.s3_uploads_lock:
+                if entry["refs"] == 0 and self.s3_uploads.get(object_name) is entry:
+                    del self.s3_uploads[object_name]
+
+    def start_pdf_analysis(self, feature_types, file_path=None, file_bytes=None, file_name=None, document_hash=None):
+        """
+        Uploads the PDF to S3 under its content hash, unless it is already there, and
+        starts an async analysis job. The object is released when the job has finished
+        (see _wait_for_completion).
+
+        :param file_name: Original file name, used for the key's extension
+        :param document_hash: SHA-256 hex digest of the document, if already computed
+        :return: The Textract JobId
+        """
         if not file_name:
             if file_path:
                 file_name = os.path.basename(file_path)
             else:
                 raise ValueError("file_name is required if file_path is not provided")
-                
-        self.upload_to_s3(file_name, file_path=file_path, file_bytes=file_bytes)
+
+        if document_hash is None:
+            with metrics.span("hash_document"):
+                document_hash = compute_document_hash(file_path, file_bytes)
+        object_name = self.s3_key_for(document_hash, file_name)
+        self.acquire_s3_object(object_name, file_path=file_path, file_bytes=file_bytes)
         
+        params = {
+            'DocumentLocation': {
+                'S3Object': {
+                    'Bucket': self.bucket_name,
+                    'Name': object_name
+                }
+            },
+            'FeatureTypes': feature_types
+        }
+        if self.sns_topic_arn and self.sns_role_arn:
+            params['NotificationChannel'] = {'SNSTopicArn': self.sns_topic_arn, 'RoleArn': self.sns_role_arn}
+
         try:
-            response = self.textract_client.start_document_analysis(
-                DocumentLocation={
-                    'S3Object': {
-                        'Bucket': self.bucket_name,
-                        'Name': file_name
-                    }
-                },
-                FeatureTypes=feature_types
-            )
+            self.rate_limiter.acquire('StartDocumentAnalysis')
+            with metrics.span("start_analysis"):
+                response = self.textract_client.start_document_analysis(**params)
             job_id = response['JobId']
             logger.info(f"Started job {job_id}")
-            
-            return self.wait_for_job(job_id)
         except ClientError as e:
             logger.error(f"Error starting analysis: {e}")
+            self.release_s3_object(object_name)
             raise
+        with self.s3_uploads_lock:
+            self.job_s3_keys[job_id] = object_name
+        return job_id
 
-    def get_text_for_block(self, block, blocks_map):
-        """Extracts text from child LINE/WORD blocks."""
-        text = ""
-        if 'Relationships' in block:
-            for rel in block['Relationships']:
-                if rel['Type'] == 'CHILD':
-                    for child_id in rel['Ids']:
-                        child = blocks_map.get(child_id)
-                        if child and child['BlockType'] in ['WORD', 'LINE']:
-                            text += child.get('Text', '') + ' '
-        return text.strip()
-
-    def enrich_response_with_text(self, response):
+    def start_or_attach_pdf_analysis(self, feature_types, file_path=None, file_bytes=None, file_name=None,
+                                     document_hash=None, source_name=None, job_reference=None, page_count=None):
         """
-        Enriches the Textract response by adding a 'Text' field to LAYOUT_* and CELL blocks
-        derived from their child relationships.
+        Starts an async analysis job and records it in the job journal, unless a job for
+        the same document and feature types is already running (in this or another
+        process), in which case that job is reused.
+
+        :param source_name: Original file name, used to resume the job after a restart
+        :param job_reference: Identifier of the caller's job, returned with resumed jobs
+        :return: Tuple of (JobId, whether this call started the job)
         """
-        blocks_map = {block['Id']: block for block in response['Blocks']}
-        
-        for block in response['Blocks']:
-            if block['BlockType'].startswith('LAYOUT_') or block['BlockType'] == 'CELL':
-                text = self.get_text_for_block(block, blocks_map)
-                block['Text'] = text
-        
-        return response
+        if document_hash is None:
+            with metrics.span("hash_document"):
+                document_hash = compute_document_hash(file_path, file_bytes)
+        key = (document_hash, ",".join(sorted(feature_types)))
+
+        with self.starting_jobs_lock:
+            starting = self.starting_jobs.get(key)
+            if starting is None:
+                running = self.job_journal.find_running(document_hash, feature_types)
+                if running:
+                    logger.info(f"Document is already being analyzed, joining job {running['textract_job_id']}")
+                    return running['textract_job_id'], False
+                starting = self.starting_jobs[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            job_id = starting.result()
+            logger.info(f"Document is already being analyzed, joining job {job_id}")
+            return job_id, False
+
+        try:
+            job_id = self.start_pdf_analysis(
+                feature_types, file_path=file_path, file_bytes=file_bytes, file_name=file_name, document_hash=document_hash
+            )
+            with self.s3_uploads_lock:
+                object_name = self.job_s3_keys.get(job_id)
+            self.job_journal.record_started(
+                job_id, document_hash, feature_types, s3_key=object_name, source_name=source_name,
+                job_reference=job_reference, page_count=page_count
+            )
+            starting.set_result(job_id)
+            return job_id, True
+        except BaseException as e:
+            starting.set_exception(e)
+            raise
+        finally:
+            with self.starting_jobs_lock:
+                self.starting_jobs.pop(key, None)
+
+    def _adopt_s3_object(self, job_id, object_name):
+        """Takes over the input object of a job started by an earlier process, so it is released when the job ends."""
+        if not object_name:
+            return
+        with self.s3_uploads_lock:
+            entry = self.s3_uploads.setdefault(object_name, {"refs": 0, "lock": threading.Lock(), "uploaded": True})
+            entry["refs"] += 1
+            self.job_s3_keys[job_id] = object_name
+
+    def analyze_pdf(self, feature_types, file_path=None, file_bytes=None, file_name=None, document_hash=None):
+        job_id = self.start_pdf_analysis(
+            feature_types, file_path=file_path, file_bytes=file_bytes, file_name=file_name, document_hash=document_hash
+        )
+        return self.wait_for_job(job_id)
 
-    def enrich_tables(self, response):
+    def choose_pdf_route(self, file_path=None, file_bytes=None):
         """
-        Enriches TABLE blocks with a structured 'TableData' field containing detailed cell info
-        and a 'Text' field containing a Markdown representation.
+        Picks how a PDF is analyzed from its size and a cheap page count:
+        "sync" (one AnalyzeDocument call), "split" (one AnalyzeDocument call per page,
+        in parallel) or "async" (S3 upload and an async job).
+
+        :return: Tuple of (route, page_count); page_count is None if it is unknown
         """
-        blocks_map = {block['Id']: block for block in response['Blocks']}
-        
-        for block in response['Blocks']:
-            if block['BlockType'] == 'TABLE':
-                rows = {}
-                if 'Relationships' in block:
-                    for rel in block['Relationships']:
-                        if rel['Type'] == 'CHILD':
-                            for child_id in rel['Ids']:
-                                cell = blocks_map.get(child_id)
-                                if cell and cell['BlockType'] == 'CELL':
-                                    row_idx = cell['RowIndex']
-                                    col_idx = cell['ColumnIndex']
-                                    
-                                    # Extract detailed cell info
-                                    cell_data = {
-                                        "text": cell.get('Text', ''),
-                                        "rowIndex": row_idx,
-                                        "columnIndex": col_idx,
-                                        "rowSpan": cell.get('RowSpan', 1),
-                                        "columnSpan": cell.get('ColumnSpan', 1),
-                                        "confidence": cell.get('Confidence'),
-                                        "geometry": cell.get('Geometry'),
-                                        "entityTypes": cell.get('EntityTypes', [])
-                                    }
-                                    
-                                    if row_idx not in rows:
-                                        rows[row_idx] = {}
-                                    rows[row_idx][col_idx] = cell_data
-                
-                # Convert to list of lists
-                sorted_row_indices = sorted(rows.keys())
-                table_data = []
-                markdown_rows = []
-                
-                for r_idx in sorted_row_indices:
-                    row_cells = rows[r_idx]
-                    sorted_col_indices = sorted(row_cells.keys())
-                    
-                    # For TableData (detailed objects)
-                    row_data = [row_cells[c_idx] for c_idx in sorted_col_indices]
-                    table_data.append(row_data)
-                    
-                    # For Markdown Text
-                    # We need to handle missing columns for proper markdown alignment if needed,
-                    # but for now we'll just join the text of existing cells.
-                    # A robust markdown table generator would need to handle spans and alignment.
-                    # This is a simplified version.
-                    row_text_list = [row_cells[c_idx]['text'] for c_idx in sorted_col_indices]
-                    markdown_rows.append("| " + " | ".join(row_text_list) + " |")
-                    
-                    # Add separator after header (assuming first row is header for simplicity, 
-                    # or just standard markdown table format)
-                    if r_idx == 1:
-                        # Create separator row based on number of columns in first row
-                        sep_row = "| " + " | ".join(["---"] * len(row_text_list)) + " |"
-                        markdown_rows.append(sep_row)
-
-                block['TableData'] = table_data
-                block['Text'] = "\n".join(markdown_rows)
-                
-        return response
+        size = len(file_bytes) if file_bytes is not None else os.path.getsize(file_path)
+        with metrics.span("inspect_pdf") as span:
+            page_count = count_pdf_pages(file_path, file_bytes)
+            span["pages"] = page_count or 0
+        if page_count == 1 and size <= self.sync_pdf_max_bytes:
+            return "sync", page_count
+        if page_count and page_count <= self.pdf_split_max_pages and PDF_SPLIT_SUPPORTED:
+            return "split", page_count
+        return "async", page_count
+
+    def analyze_single_page_pdf(self, feature_types, file_path=None, file_bytes=None):
+        """
+        Analyzes a PDF counted as a single page with one AnalyzeDocument call.
+
+        The page count comes from a quick scan that can be wrong (incremental updates,
+        object streams); AnalyzeDocument then rejects the document.
+
+        :return: The response, or None if AnalyzeDocument rejected the PDF and it should
+                 go through an async job instead
+        """
+        logger.info("Processing single-page PDF")
+        try:
+            return self.analyze_file(
+                feature_types=feature_types,
+                document_file_name=file_path if file_bytes is None else None,
+                document_bytes=file_bytes
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in SYNC_PDF_REJECTIONS:
+                raise
+            logger.warning(f"AnalyzeDocument rejected the PDF ({e}), using an async job instead")
+            SYNC_PDF_FALLBACKS.inc()
+            return None
+
+    def analyze_pdf_pages(self, feature_types, pages):
+        """
+        Analyzes single-page PDFs with parallel synchronous calls and merges the responses
+        as if the pages had been analyzed together.
+
+        :param pages: Byte content of each page, in page order
+        :return: Combined response with every block, numbered by page
+        """
+        with ThreadPoolExecutor(max_workers=min(self.pdf_split_workers, len(pages))) as executor:
+            # Each call runs in a copy of this context, so its spans land in the caller's trace
+            futures = [
+                executor.submit(contextvars.copy_context().run, self.analyze_file, feature_types, document_bytes=page)
+                for page in pages
+            ]
+            responses = [future.result() for future in futures]
+
+        blocks = []
+        for page_number, response in enumerate(responses, start=1):
+            for block in response['Blocks']:
+                block['Page'] = page_number
+            blocks.extend(response['Blocks'])
+
+        return {
+            'DocumentMetadata': {'Pages': len(pages)},
+            'Blocks': blocks,
+            'AnalyzeDocumentModelVersion': responses[0].get('AnalyzeDocumentModelVersion', '1.0')
+        }
+
+    def analyze_pdf_incrementally(self, feature_types, file_path=None, file_bytes=None, file_name=None,
+                                  layout_writer=None, page_callback=None, progress_callback=None, page_count=None,
+                                  document_hash=None, job_id=None):
+        """
+        Runs an async PDF job and enriches, lays out and writes each document page as soon
+        as its blocks have been fetched, instead of after the last NextToken page.
+
+        :param layout_writer: Optional LayoutStreamWriter that receives the layout page by page
+        :param page_callback: Optional callable receiving (page_number, layout_items) per page
+        :param page_count: Expected number of pages, used to schedule the first status poll
+        :param document_hash: SHA-256 hex digest of the document, if already computed
+        :param job_id: JobId of an already started job to read instead of starting one
+        :return: Tuple of (enriched response, layout data)
+        """
+        if job_id is None:
+            job_id = self.start_pdf_analysis(
+                feature_types, file_path=file_path, file_bytes=file_bytes, file_name=file_name, document_hash=document_hash
+            )
+        first_response = self._wait_for_completion(job_id, page_count=page_count)
+        self._report_progress(progress_callback, "fetching results")
+
+        result = {
+            'DocumentMetadata': first_response.get('DocumentMetadata', {'Pages': 0}),
+            # Each page's dicts are dropped once its blocks are in the store
+            'Blocks': BlockStore() if self.compact_blocks else [],
+            'AnalyzeDocumentModelVersion': first_response.get('AnalyzeDocumentModelVersion', '1.0')
+        }
+
+        def responses():
+            for response in self.iter_job_responses(job_id, first_response):
+                if 'DocumentMetadata' in response:
+                    result['DocumentMetadata'] = response['DocumentMetadata']
+                if 'AnalyzeDocumentModelVersion' in response:
+                    result['AnalyzeDocumentModelVersion'] = response['AnalyzeDocumentModelVersion']
+                yield response
+
+        layout_data = []
+        with layout_writer or LayoutStreamWriter(None) as layout_writer:
+            # Child relationships never cross pages, so each page can be enriched on its own
+            for page_number, page_blocks, page_items, rendered in self._postprocess_page_stream(self.iter_document_pages(responses())):
+                with metrics.span("write_layout"):
+                    layout_writer.write_items(page_items, rendered)
+                layout_data.extend(page_items)
+                with metrics.span("compact_blocks", blocks=len(page_blocks)):
+                    result['Blocks'].extend(page_blocks)
+                logger.info(f"Page {page_number} ready ({len(page_items)} layout items)")
+                if page_callback:
+                    page_callback(page_number, page_items)
+
+        return result, layout_data
+
+    def postprocess_pages(self, pages):
+        """
+        Enriches each page's blocks and generates its layout, in the process pool when one
+        is configured and the pages hold at least POSTPROCESS_MIN_BLOCKS blocks.
+
+        :param pages: List of block lists, one per page (or a single list for a whole response)
+        :return: List of (enriched blocks, layout items, BlockIndex or None, rendered layout
+                 items or None) per page
+        """
+        return [processed[1:] for processed in self._collect_postprocessing(None, self._submit_postprocessing(pages))]
+
+    def _offload(self, block_count):
+        return self.postprocess_pool is not None and block_count >= self.postprocess_min_blocks
+
+    def _submit_postprocessing(self, pages):
+        """Starts postprocessing of pages; returns a Future and whether its result is serialized."""
+        block_count = sum(len(blocks) for blocks in pages)
+        if not self._offload(block_count):
+            processed = []
+            for blocks in pages:
+                response = {'Blocks': blocks}
+                index = BlockIndex(blocks)
+                self.enrich_response_with_text(response, index)
+                self.enrich_tables(response, index)
+                processed.append((blocks, self.generate_layout_output(response, None, index), index, None))
+            future = Future()
+            future.set_result(processed)
+            return future, False
+
+        # Blocks cross the process boundary as one bytes payload each way instead of pickled dicts
+        with metrics.span("postprocess_serialize", blocks=block_count):
+            payload = postprocessing.dumps(pages)
+        future = self.postprocess_pool.submit(
+            postprocessing.postprocess_serialized, payload, self.layout_table_overlap_threshold,
+            self.output_writer.layout_indent
+        )
+        return future, True
+
+    def _collect_postprocessing(self, page_numbers, submitted):
+        """Yields (page_number, blocks, layout items, index, rendered items) of submitted pages."""
+        future, serialized = submitted
+        with metrics.span("postprocess_wait"):
+            processed = future.result()
+        if serialized:
+            with metrics.span("postprocess_deserialize") as span:
+                processed = [(blocks, items, None, rendered) for blocks, items, rendered in postprocessing.loads(processed)]
+                span["blocks"] = sum(len(page[0]) for page in processed)
+        for i, page in enumerate(processed):
+            yield (page_numbers[i] if page_numbers else None), *page
 
-    def _get_bounding_box(self, block):
-        return block['Geometry']['BoundingBox']
+    def _postprocess_page_stream(self, pages):
+        """
+        Enriches and lays out the (page_number, blocks) pairs of a document and yields
+        (page_number, blocks, layout items, rendered items or None) in page order.
+
+        With a process pool, pages are grouped into chunks of at least POSTPROCESS_MIN_BLOCKS
+        blocks, and up to two chunks per worker are processed while later pages are fetched.
+        """
+        in_flight = deque()
+        max_in_flight = self.postprocess_workers * 2 if self.postprocess_pool else 0
+        chunk_numbers, chunk_pages, chunk_blocks = [], [], 0
+
+        def ready():
+            return in_flight and (len(in_flight) > max_in_flight or in_flight[0][1][0].done())
 
-    def _calculate_intersection_area(self, box1, box2):
-        x1_min = box1['Left']
-        x1_max = box1['Left'] + box1['Width']
-        y1_min = box1['Top']
-        y1_max = box1['Top'] + box1['Height']
+        for page_number, blocks in pages:
+            chunk_numbers.append(page_number)
+            chunk_pages.append(blocks)
+            chunk_blocks += len(blocks)
+            if self.postprocess_pool is not None and chunk_blocks < self.postprocess_min_blocks:
+                continue
+            in_flight.append((chunk_numbers, self._submit_postprocessing(chunk_pages)))
+            chunk_numbers, chunk_pages, chunk_blocks = [], [], 0
+            while ready():
+                for page_number, page_blocks, page_items, _, rendered in self._collect_postprocessing(*in_flight.popleft()):
+                    yield page_number, page_blocks, page_items, rendered
 
-        x2_min = box2['Left']
-        x2_max = box2['Left'] + box2['Width']
-        y2_min = box2['Top']
-        y2_max = box2['Top'] + box2['Height']
+        if chunk_pages:
+            in_flight.append((chunk_numbers, self._submit_postprocessing(chunk_pages)))
+        while in_flight:
+            for page_number, page_blocks, page_items, _, rendered in self._collect_postprocessing(*in_flight.popleft()):
+                yield page_number, page_blocks, page_items, rendered
 
-        inter_x_min = max(x1_min, x2_min)
-        inter_x_max = min(x1_max, x2_max)
-        inter_y_min = max(y1_min, y2_min)
-        inter_y_max = min(y1_max, y2_max)
+    def _store_in_cache(self, cache_key, result):
+        """Caches an enriched result, encoding large ones in the process pool."""
+        with metrics.span("cache_store", blocks=len(result['Blocks'])):
+            if not self._offload(len(result['Blocks'])):
+                self.result_cache.put(cache_key, result)
+                return
+            payload = pickle.dumps({k: result[k] for k in RESPONSE_KEYS if k in result}, protocol=pickle.HIGHEST_PROTOCOL)
+            value = self.postprocess_pool.submit(postprocessing.encode_cache_value, payload).result()
+            self.result_cache.put_encoded(cache_key, value)
+
+    def get_text_for_block(self, block, blocks_map):
+        """Extracts text from child LINE/WORD blocks."""
+        return postprocessing.get_text_for_block(block, blocks_map)
+
+    def enrich_response_with_text(self, response, index=None):
+        """
+        Enriches the Textract response by adding a 'Text' field to LAYOUT_* and CELL blocks
+        derived from their child relationships.
+
+        :param index: Optional BlockIndex of the response, built here if not provided
+        """
+        with metrics.span("enrich_text", blocks=len(response['Blocks'])):
+            return postprocessing.enrich_response_with_text(response, index)
 
-        if inter_x_max < inter_x_min or inter_y_max < inter_y_min:
-            return 0.0
+    def enrich_tables(self, response, index=None):
+        """
+        Enriches TABLE blocks with a structured 'TableData' field containing detailed cell info
+        and a 'Text' field containing a Markdown representation.
 
-        return (inter_x_max - inter_x_min) * (inter_y_max - inter_y_min)
+        :param index: Optional BlockIndex of the response, built here if not provided
+        """
+        with metrics.span("enrich_tables", blocks=len(response['Blocks'])):
+            return postprocessing.enrich_tables(response, index)
 
-    def generate_layout_output(self, response, output_path):
+    def generate_layout_output(self, response, output_path, index=None):
         """
         Generates a simplified layout-wise JSON output.
         Removes LAYOUT_TABLE blocks that are already covered by structured TABLE blocks.
+
+        :param index: Optional BlockIndex of the response, built here if not provided
         """
-        # Separate blocks
-        table_blocks = [b for b in response['Blocks'] if b['BlockType'] == 'TABLE']
-        other_layout_blocks = [b for b in response['Blocks'] if b['BlockType'].startswith('LAYOUT_')]
-        
-        filtered_layout_blocks = []
-        
-        # Filter LAYOUT_TABLE blocks that overlap with TABLE blocks
-        for layout_block in other_layout_blocks:
-            if layout_block['BlockType'] == 'LAYOUT_TABLE':
-                is_duplicate = False
-                layout_box = self._get_bounding_box(layout_block)
-                layout_area = layout_box['Width'] * layout_box['Height']
-                
-                for table_block in table_blocks:
-                    # Check if on same page
-                    if layout_block.get('Page', 1) != table_block.get('Page', 1):
-                        continue
-                        
-                    table_box = self._get_bounding_box(table_block)
-                    intersection = self._calculate_intersection_area(layout_box, table_box)
-                    
-                    # If intersection covers > 75% of the LAYOUT_TABLE, consider it a duplicate
-                    if layout_area > 0 and (intersection / layout_area) > 0.75:
-                        is_duplicate = True
-                        break
-                
-                if not is_duplicate:
-                    filtered_layout_blocks.append(layout_block)
-            else:
-                filtered_layout_blocks.append(layout_block)
-        
-        # Combine TABLE blocks and filtered layout blocks
-        final_blocks = table_blocks + filtered_layout_blocks
-        
-        # Sort by Page, then Top, then Left
-        final_blocks.sort(key=lambda x: (
-            x.get('Page', 1), 
-            x['Geometry']['BoundingBox']['Top'], 
-            x['Geometry']['BoundingBox']['Left']
-        ))
-        
-        output_data = []
-        for block in final_blocks:
-            item = {
-                "type": block['BlockType'].replace('_', ' ').title(), # e.g. "Layout Header", "Table"
-                "page": block.get('Page', 1),
-                "confidence": block.get('Confidence'),
-                "geometry": block.get('Geometry')
-            }
-            
-            if block['BlockType'] == 'TABLE':
-                item["type"] = "Layout Table" # Normalize name as requested
-                item["table_data"] = block.get('TableData', [])
-            else:
-                item["text"] = block.get('Text', '')
-            
-            output_data.append(item)
-            
+        with metrics.span("generate_layout", blocks=len(response['Blocks'])):
+            output_data = postprocessing.generate_layout_output(response, self.layout_table_overlap_threshold, index)
+
         if output_path:
             with open(output_path, 'w') as f:
                 json.dump(output_data, f, indent=4)
             logger.info(f"Layout output saved to {output_path}")
-            
+
         return output_data
 
-    def process_document(self, file_path=None, file_bytes=None, feature_types=None, save_files=True, output_base_path=None):
+    def _record_in_catalog(self, base_filename, source_name, document_hash, feature_types, result, index, layout_data, route):
+        if index is None:
+            block_counts = result['Blocks'].type_counts()
+        else:
+            block_counts = {block_type: len(blocks) for block_type, blocks in index.by_type.items()}
+        current = metrics.current_trace()
+        artifacts = {
+            "layout": self.output_writer.layout_path(base_filename),
+            "layout_index": self.output_writer.layout_index_path(base_filename),
+        }
+        with self.catalog_lock:
+            # Raw artifacts already on disk; those written later are added by _record_artifact
+            for kind in RAW_ARTIFACTS:
+                path = self.output_writer.find_artifact(base_filename, kind)
+                if path is not None:
+                    artifacts[kind] = path
+            self.document_catalog.record(
+                base_filename,
+                source_name=source_name,
+                document_hash=document_hash,
+                page_count=result.get('DocumentMetadata', {}).get('Pages'),
+                block_count=len(result['Blocks']),
+                layout_item_count=len(layout_data),
+                route=route,
+                from_cache=route == "cache",
+                feature_types=sorted(feature_types),
+                block_counts=block_counts,
+                # Stages up to the catalog update, for jobs and requests that record a trace
+                timings=current.breakdown() if current else None,
+                artifacts=artifacts
+            )
+
+    def _record_artifact(self, base_filename, kind, path):
+        with self.catalog_lock:
+            self.document_catalog.add_artifacts(base_filename, {kind: path})
+
+    def _load_cached_result(self, base_filename):
+        """Return the cached enriched result of a catalogued document, or None."""
+        if not self.result_cache.enabled:
+            return None
+        document = self.document_catalog.get(base_filename)
+        if document is None or not document["document_hash"] or not document["feature_types"]:
+            return None
+        return self.result_cache.get(self.result_cache.make_key(document["document_hash"], document["feature_types"]))
+
+    def shutdown(self):
+        """Stops polling, flushes queued artifact writes and stops the postprocessing workers."""
+        self.job_poller.stop()
+        self.output_writer.shutdown(wait=True)
+        self.image_preprocessor.shutdown(wait=True)
+        if self.postprocess_pool is not None:
+            self.postprocess_pool.shutdown(wait=True)
+
+    def _report_progress(self, progress_callback, stage):
+        if progress_callback:
+            progress_callback(stage)
+
+    def process_document(self, file_path=None, file_bytes=None, feature_types=None, save_files=True, output_base_path=None, progress_callback=None, page_callback=None,
+                         job_reference=None, resume_job=None):
         """
         High-level method to process a document (image or PDF) and return enriched results.
-        Optionally saves 3 JSON files: original, filtered, and layout-wise output.
+        Optionally saves the layout-wise output and the original and filtered artifacts.
         
         :param file_path: Path to the document file (optional if file_bytes is provided)
         :param file_bytes: Byte content of the document (optional if file_path is provided)
         :param feature_types: List of features to extract (default: ["LAYOUT", "TABLES", "FORMS"])
-        :param save_files: Whether to save the 3 JSON files (default: True)
+        :param save_files: Whether to save the output files (default: True)
         :param output_base_path: Base path for output files (filename without extension)
+        :param progress_callback: Optional callable receiving the name of each pipeline stage
+        :param page_callback: Optional callable receiving (page_number, layout_items) as each page is ready
+        :param job_reference: Identifier of the caller's job, stored in the job journal with async jobs
+        :param resume_job: Job journal entry of an async job to finish instead of analyzing a file
         :return: Dictionary with enriched Textract response
         """
+        if resume_job:
+            feature_types = resume_job['feature_types']
         if feature_types is None:
             feature_types = ["LAYOUT", "TABLES", "FORMS"]
         
-        if not file_path and not file_bytes:
+        if not file_path and not file_bytes and not resume_job:
             raise ValueError("Either file_path or file_bytes must be provided")
         
+        # The async job whose journal entry this call completes or fails
+        journal_job_id = resume_job['textract_job_id'] if resume_job else None
         try:
             # Determine if it's a PDF or image
             is_pdf = False
@@ -366,77 +879,151 @@ class TextractManager:
                 
             if file_name_for_check:
                 is_pdf = file_name_for_check.lower().endswith('.pdf')
+            # Only async PDF jobs are journaled
+            is_pdf = is_pdf or bool(resume_job)
             
+            save_outputs = bool(save_files and output_base_path)
+            if save_outputs:
+                base_filename = os.path.splitext(os.path.basename(output_base_path))[0]
+
+            # Repeat uploads of the same document skip Textract and enrichment entirely
+            cache_key = None
+            document_hash = resume_job['document_hash'] if resume_job else None
+            result = None
+            index = None
+            layout_data = None
+            if self.result_cache.enabled:
+                with metrics.span("cache_lookup"):
+                    # The same hash names the S3 object of async jobs
+                    document_hash = document_hash or compute_document_hash(file_path, file_bytes)
+                    cache_key = self.result_cache.make_key(document_hash, feature_types)
+                    result = self.result_cache.get(cache_key)
+            from_cache = result is not None
+
+            # Small PDFs are analyzed synchronously; only the rest pay for S3 and an async job
+            pdf_route = page_count = split_pages = rendered_layout = None
+            if not from_cache and resume_job:
+                pdf_route, page_count = "async", resume_job['page_count']
+            elif not from_cache and is_pdf:
+                pdf_route, page_count = self.choose_pdf_route(file_path, file_bytes)
+                logger.info(f"PDF has {page_count or 'an unknown number of'} page(s), using the {pdf_route} route")
+            if pdf_route == "split":
+                try:
+                    with metrics.span("split_pdf", pages=page_count):
+                        split_pages = split_pdf_pages(file_path, file_bytes)
+                except Exception as e:
+                    logger.warning(f"Could not split PDF, using an async job instead: {e}")
+                if not split_pages or max(len(page) for page in split_pages) > self.sync_pdf_max_bytes:
+                    pdf_route, split_pages = "async", None
+
+            if pdf_route == "sync":
+                self._report_progress(progress_callback, "analyzing")
+                result = self.analyze_single_page_pdf(feature_types, file_path, file_bytes)
+                if result is None:
+                    pdf_route = "async"
+
             # Process the document
-            if is_pdf:
+            if pdf_route == "async":
                 logger.info(f"Processing PDF: {file_name_for_check}")
-                # Determine proper filename for S3
-                pdf_name = os.path.basename(file_path) if file_path else (os.path.basename(output_base_path) if output_base_path else "document.pdf")
+                # The original name only supplies the S3 key's extension
+                # (file_path may be a temporary spool file, so the original name wins)
+                pdf_name = os.path.basename(output_base_path) if output_base_path else (os.path.basename(file_path) if file_path else "document.pdf")
                 
-                result = self.analyze_pdf(
+                self._report_progress(progress_callback, "analyzing")
+                if resume_job:
+                    textract_job_id = journal_job_id
+                    self._adopt_s3_object(textract_job_id, resume_job['s3_key'])
+                else:
+                    textract_job_id, started = self.start_or_attach_pdf_analysis(
+                        feature_types, file_path=file_path, file_bytes=file_bytes, file_name=pdf_name,
+                        document_hash=document_hash, source_name=output_base_path, job_reference=job_reference,
+                        page_count=page_count
+                    )
+                    if started:
+                        journal_job_id = textract_job_id
+                # Pages are enriched and their layout written while later pages are still being fetched
+                result, layout_data = self.analyze_pdf_incrementally(
                     feature_types=feature_types,
                     file_path=file_path,
                     file_bytes=file_bytes,
-                    file_name=pdf_name
+                    file_name=pdf_name,
+                    layout_writer=self.output_writer.open_layout_stream(base_filename, self.layout_provenance) if save_outputs else None,
+                    page_callback=page_callback,
+                    progress_callback=progress_callback,
+                    page_count=page_count,
+                    document_hash=document_hash,
+                    job_id=textract_job_id
                 )
-            else:
-                logger.info(f"Processing image document")
-                # If we have bytes, ensure we don't pass a non-existent path that analyze_file might try to open
-                path_to_pass = file_path if not file_bytes else None
+            elif not from_cache:
+                if split_pages:
+                    self._report_progress(progress_callback, "analyzing")
+                    logger.info(f"Processing PDF page by page: {file_name_for_check}")
+                    result = self.analyze_pdf_pages(feature_types, split_pages)
+                elif pdf_route is None:
+                    document_bytes = file_bytes
+                    if self.image_preprocessor.enabled:
+                        # Only the bytes sent to Textract change; hashes and outputs keep using the upload
+                        self._report_progress(progress_callback, "preprocessing")
+                        document_bytes = self.image_preprocessor.preprocess(file_path, file_bytes)
+                    self._report_progress(progress_callback, "analyzing")
+                    logger.info("Processing image document")
+                    # If we have bytes, ensure we don't pass a non-existent path that analyze_file might try to open
+                    path_to_pass = file_path if not document_bytes else None
+                    result = self.analyze_file(
+                        feature_types=feature_types,
+                        document_file_name=path_to_pass,
+                        document_bytes=document_bytes
+                    )
                 
-                result = self.analyze_file(
-                    feature_types=feature_types,
-                    document_file_name=path_to_pass,
-                    document_bytes=file_bytes
-                )
-            
-            # Enrich the response with text for layout blocks and cells
-            self.enrich_response_with_text(result)
-            
-            # Enrich tables with structured data
-            self.enrich_tables(result)
-            
-            layout_data = []
+                # Enrich the response with text for layout blocks and cells, tables with
+                # structured data, and generate the layout (in the process pool for large responses)
+                self._report_progress(progress_callback, "enriching")
+                [(result['Blocks'], layout_data, index, rendered_layout)] = self.postprocess_pages([result['Blocks']])
+
+            if pdf_route != "async":
+                # 3. Generate (and save) LAYOUT-WISE output for results that were not streamed
+                if layout_data is None:
+                    index = index or BlockIndex(result['Blocks'])
+                    layout_data = self.generate_layout_output(result, None, index)
+                if save_outputs:
+                    with metrics.span("write_layout"):
+                        self.output_writer.write_layout(base_filename, layout_data, rendered_layout, self.layout_provenance)
+                if page_callback:
+                    for page_number, page_items in groupby(layout_data, key=lambda item: item['page']):
+                        page_callback(page_number, list(page_items))
+
+            if self.compact_blocks:
+                # From here on the blocks are only counted, cached and written, which a
+                # BlockStore does without holding every block as a dict
+                if not isinstance(result['Blocks'], BlockStore):
+                    with metrics.span("compact_blocks", blocks=len(result['Blocks'])):
+                        result['Blocks'] = BlockStore(result['Blocks'])
+                index = None
+            else:
+                # One index serves the WORD/LINE filtering and the block counts below
+                index = index or BlockIndex(result['Blocks'])
+
+            if cache_key and not from_cache:
+                self._store_in_cache(cache_key, result)
             
             # Save files if requested
-            if save_files and output_base_path:
-                # Create output directories
-                os.makedirs("output/json_output", exist_ok=True)
-                os.makedirs("output/layout_output", exist_ok=True)
-                
-                base_filename = os.path.splitext(os.path.basename(output_base_path))[0]
+            if save_outputs:
+                self._report_progress(progress_callback, "saving")
                 
-                # 1. Save ORIGINAL unfiltered data (with WORD & LINE blocks)
-                original_output = {
-                    k: v for k, v in result.items() 
-                    if k in ['DocumentMetadata', 'Blocks', 'HumanLoopActivationOutput', 'AnalyzeDocumentModelVersion']
-                }
-                original_filename = f"output/json_output/{base_filename}_original.json"
-                with open(original_filename, 'w') as f:
-                    json.dump(original_output, f, indent=4)
-                logger.info(f"1. Original data saved to: {original_filename}")
-                
-                # 3. Generate and save LAYOUT-WISE output (Do this before filtering blocks)
-                layout_filename = f"output/layout_output/{base_filename}_layout.json"
-                layout_data = self.generate_layout_output(result, layout_filename)
-                logger.info(f"3. Layout output saved to: {layout_filename}")
-
-                # 2. Save FILTERED data (without WORD & LINE blocks)
-                # Filter out WORD and LINE blocks
-                filtered_blocks = [b for b in result['Blocks'] if b['BlockType'] not in ['WORD', 'LINE']]
-                filtered_output = {
-                    k: (filtered_blocks if k == 'Blocks' else v) 
-                    for k, v in result.items() 
-                    if k in ['DocumentMetadata', 'Blocks', 'HumanLoopActivationOutput', 'AnalyzeDocumentModelVersion']
-                }
-                filtered_filename = f"output/json_output/{base_filename}_response.json"
-                with open(filtered_filename, 'w') as f:
-                    json.dump(filtered_output, f, indent=4)
-                logger.info(f"2. Filtered data saved to: {filtered_filename}")
-                
-            else:
-                # Generate layout data without saving
-                layout_data = self.generate_layout_output(result, None)
+                # 1./2. ORIGINAL and FILTERED (without WORD & LINE) data are written off the
+                # request path, or deferred until something reads them
+                self.output_writer.save_artifacts(base_filename, result, index)
+                logger.info(f"3. Layout output saved to: {self.output_writer.layout_path(base_filename)}")
+
+                if self.document_catalog.enabled:
+                    with metrics.span("catalog_update"):
+                        self._record_in_catalog(
+                            base_filename, output_base_path, document_hash or compute_document_hash(file_path, file_bytes),
+                            feature_types, result, index, layout_data, "cache" if from_cache else pdf_route or "image"
+                        )
+                if self.search_index.enabled:
+                    with metrics.span("search_index", blocks=len(layout_data)):
+                        self.search_index.index_document(base_filename, layout_data)
             
             # Return the enriched result (with all blocks including WORD & LINE)
             # We also attach the layout_data so the controller can return it
@@ -445,10 +1032,16 @@ class TextractManager:
                 if k in ['DocumentMetadata', 'Blocks', 'HumanLoopActivationOutput', 'AnalyzeDocumentModelVersion']
             }
             output['LayoutData'] = layout_data
+            if journal_job_id:
+                self.job_journal.mark(journal_job_id, JOURNAL_COMPLETED)
             
             logger.info("Document processing completed successfully")
             return output
             
         except Exception as e:
             logger.error(f"Error processing document: {e}")
+            # A job interrupted by shutdown, or still running after the wait timeout, stays
+            # journaled as running and is resumed on the next start
+            if journal_job_id and not isinstance(e, (JobPollerStopped, JobWaitTimeout)):
+                self.job_journal.mark(journal_job_id, JOURNAL_FAILED, error=str(e))
             raise
@@ -0,0 +1,301 @@
+import io
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+import zlib
+from botocore.exceptions import ClientError
+from services.pdf_inspector import count_pdf_pages
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_TYPES = ('LAYOUT_TITLE', 'LAYOUT_SECTION_HEADER', 'LAYOUT_TEXT', 'LAYOUT_TEXT', 'LAYOUT_LIST')
+
+
+def synthetic_blocks(pages=1, layouts_per_page=10, lines_per_layout=4, words_per_line=8,
+                     tables_per_page=1, table_size=4, seed=0):
+    """
+    Builds the page-ordered Blocks of a Textract analysis: PAGE, LAYOUT_*, LINE and WORD
+    blocks for the text, and TABLE, CELL and LAYOUT_TABLE blocks for each table.
+    """
+    rng = random.Random(seed)
+    blocks = []
+    page_blocks = []
+
+    def new_id():
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    def add_block(block_type, page, left, top, width, height, text=None, children=None, **fields):
+        block = {
+            'BlockType': block_type,
+            'Id': new_id(),
+            'Page': page,
+            'Confidence': round(rng.uniform(85.0, 99.9), 4),
+            'Geometry': {
+                'BoundingBox': {'Width': width, 'Height': height, 'Left': left, 'Top': top},
+                'Polygon': [
+                    {'X': left, 'Y': top}, {'X': left + width, 'Y': top},
+                    {'X': left + width, 'Y': top + height}, {'X': left, 'Y': top + height}
+                ],
+                'RotationAngle': 0.0
+            },
+            **fields
+        }
+        if text is not None:
+            block['Text'] = text
+        if children:
+            block['Relationships'] = [{'Type': 'CHILD', 'Ids': children}]
+        page_blocks.append(block)
+        return block['Id']
+
+    def add_line(page, left, top, width, height, word_count):
+        word_width = width / word_count
+        words = [f"word{rng.randrange(10000)}" for _ in range(word_count)]
+        word_ids = [
+            add_block('WORD', page, left + i * word_width, top, word_width * 0.9, height, text=word, TextType='PRINTED')
+            for i, word in enumerate(words)
+        ]
+        return add_block('LINE', page, left, top, width, height, text=" ".join(words), children=word_ids), word_ids
+
+    regions = layouts_per_page + tables_per_page
+    region_height = 0.9 / max(regions, 1)
+    for page in range(1, pages + 1):
+        page_blocks.clear()
+        page_children = []
+        for region in range(regions):
+            top = 0.05 + region * region_height
+            if region < layouts_per_page:
+                line_height = region_height / (lines_per_layout + 1)
+                line_ids = [
+                    add_line(page, 0.1, top + i * line_height, 0.8, line_height * 0.8, words_per_line)[0]
+                    for i in range(lines_per_layout)
+                ]
+                layout_type = LAYOUT_TYPES[region % len(LAYOUT_TYPES)]
+                page_children.append(add_block(layout_type, page, 0.1, top, 0.8, region_height * 0.9, children=line_ids))
+                page_children.extend(line_ids)
+                continue
+
+            cell_width = 0.8 / table_size
+            cell_height = region_height * 0.9 / table_size
+            cell_ids = []
+            for row in range(1, table_size + 1):
+                for column in range(1, table_size + 1):
+                    left = 0.1 + (column - 1) * cell_width
+                    cell_top = top + (row - 1) * cell_height
+                    line_id, word_ids = add_line(page, left, cell_top, cell_width * 0.9, cell_height * 0.8, 2)
+                    page_children.append(line_id)
+                    cell_ids.append(add_block(
+                        'CELL', page, left, cell_top, cell_width, cell_height, children=word_ids,
+                        RowIndex=row, ColumnIndex=column, RowSpan=1, ColumnSpan=1
+                    ))
+            add_block('TABLE', page, 0.1, top, 0.8, region_height * 0.9, children=cell_ids, EntityTypes=['STRUCTURED_TABLE'])
+            page_children.append(add_block('LAYOUT_TABLE', page, 0.1, top, 0.8, region_height * 0.9))
+
+        page_block = {
+            'BlockType': 'PAGE',
+            'Id': new_id(),
+            'Page': page,
+            'Geometry': {
+                'BoundingBox': {'Width': 1.0, 'Height': 1.0, 'Left': 0.0, 'Top': 0.0},
+                'Polygon': [{'X': 0.0, 'Y': 0.0}, {'X': 1.0, 'Y': 0.0}, {'X': 1.0, 'Y': 1.0}, {'X': 0.0, 'Y': 1.0}],
+                'RotationAngle': 0.0
+            },
+            'Relationships': [{'Type': 'CHILD', 'Ids': page_children}]
+        }
+        blocks.append(page_block)
+        blocks.extend(page_blocks)
+    return blocks
+
+
+def synthetic_pdf(pages=1, filler_bytes=0, tag=""):
+    """
+    Builds a minimal valid PDF with the given number of blank pages.
+
+    :param filler_bytes: Size of an unreferenced stream object, to model larger files
+    :param tag: Text stored in a comment, to make otherwise identical documents hash differently
+    """
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{3 + i} 0 R" for i in range(pages)), pages),
+    ]
+    objects += ["<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>"] * pages
+
+    out = io.BytesIO()
+    out.write(f"%PDF-1.4\n% {tag}\n".encode())
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode())
+    if filler_bytes:
+        offsets.append(out.tell())
+        out.write(f"{len(objects) + 1} 0 obj\n<< /Length {filler_bytes} >>\nstream\n".encode())
+        out.write(b"\0" * filler_bytes)
+        out.write(b"\nendstream\nendobj\n")
+
+    xref = out.tell()
+    out.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+    out.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode())
+    out.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, str(default)))
+
+
+class SimulatedS3Client:
+    def __init__(self, latency=None):
+        """
+        In-memory stand-in for the boto3 S3 client calls used by TextractManager.
+
+        Only the size and page count of each object are kept, so large benchmark uploads
+        do not stay in memory.
+
+        :param latency: Seconds added to every call (default: TEXTRACT_SIM_S3_LATENCY or 0.02)
+        """
+        self.latency = latency if latency is not None else _env_float('TEXTRACT_SIM_S3_LATENCY', 0.02)
+        self.objects = {}
+        self.lock = threading.Lock()
+
+    def _store(self, bucket, key, size, page_count):
+        time.sleep(self.latency)
+        with self.lock:
+            self.objects[(bucket, key)] = {"size": size, "pages": page_count}
+
+    def put_object(self, Body, Bucket, Key, **kwargs):
+        self._store(Bucket, Key, len(Body), count_pdf_pages(file_bytes=Body))
+        return {}
+
+    def upload_file(self, Filename, Bucket, Key, **kwargs):
+        self._store(Bucket, Key, os.path.getsize(Filename), count_pdf_pages(file_path=Filename))
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, **kwargs):
+        body = Fileobj.read()
+        self._store(Bucket, Key, len(body), count_pdf_pages(file_bytes=body))
+
+    def head_object(self, Bucket, Key, **kwargs):
+        time.sleep(self.latency)
+        with self.lock:
+            stored = self.objects.get((Bucket, Key))
+        if stored is None:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {"ContentLength": stored["size"]}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        time.sleep(self.latency)
+        with self.lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def page_count(self, bucket, key):
+        with self.lock:
+            stored = self.objects.get((bucket, key))
+        if stored is None:
+            raise ClientError({"Error": {"Code": "InvalidS3ObjectException", "Message": "Unable to get object"}},
+                              "StartDocumentAnalysis")
+        return stored["pages"]
+
+
+class SimulatedTextractClient:
+    def __init__(self, s3_client=None, latency=None, job_seconds=None, job_seconds_per_page=None,
+                 default_pages=None, max_results=1000, block_options=None, retention_seconds=None):
+        """
+        Offline stand-in for the boto3 Textract client calls used by TextractManager.
+
+        Responses carry synthetic Blocks shaped like real LAYOUT/TABLES analyses. Async
+        jobs report IN_PROGRESS until their simulated run time has passed and their
+        results are paginated with NextToken like GetDocumentAnalysis.
+
+        :param s3_client: SimulatedS3Client the documents of async jobs are read from
+        :param latency: Seconds added to every call (default: TEXTRACT_SIM_LATENCY or 0.05)
+        :param job_seconds: Fixed run time of an async job (default: TEXTRACT_SIM_JOB_SECONDS or 1)
+        :param job_seconds_per_page: Extra run time per page (default: TEXTRACT_SIM_JOB_SECONDS_PER_PAGE or 0.1)
+        :param default_pages: Pages of documents whose page count is unknown (default: TEXTRACT_SIM_PAGES or 1)
+        :param max_results: Blocks per GetDocumentAnalysis response
+        :param block_options: Keyword arguments for synthetic_blocks (layouts_per_page, table_size, ...)
+        :param retention_seconds: How long finished results stay readable, like Textract's 7 days
+                                  but short enough for benchmarks (default: TEXTRACT_SIM_RETENTION or 60)
+        """
+        self.s3_client = s3_client
+        self.latency = latency if latency is not None else _env_float('TEXTRACT_SIM_LATENCY', 0.05)
+        self.job_seconds = job_seconds if job_seconds is not None else _env_float('TEXTRACT_SIM_JOB_SECONDS', 1)
+        self.job_seconds_per_page = (job_seconds_per_page if job_seconds_per_page is not None
+                                     else _env_float('TEXTRACT_SIM_JOB_SECONDS_PER_PAGE', 0.1))
+        self.default_pages = default_pages or int(os.getenv('TEXTRACT_SIM_PAGES', '1'))
+        self.max_results = max_results
+        self.block_options = block_options or {}
+        self.retention_seconds = (retention_seconds if retention_seconds is not None
+                                  else _env_float('TEXTRACT_SIM_RETENTION', 60))
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.calls = {"AnalyzeDocument": 0, "StartDocumentAnalysis": 0, "GetDocumentAnalysis": 0}
+
+    def _call(self, api):
+        with self.lock:
+            self.calls[api] += 1
+        time.sleep(self.latency)
+
+    def analyze_document(self, Document, FeatureTypes, **kwargs):
+        self._call("AnalyzeDocument")
+        if Document['Bytes'][:5] == b"%PDF-" and (count_pdf_pages(file_bytes=Document['Bytes']) or 1) > 1:
+            # Like Textract, synchronous analysis only takes single-page PDFs
+            raise ClientError({"Error": {"Code": "UnsupportedDocumentException", "Message": "Unsupported document"}},
+                              "AnalyzeDocument")
+        return {
+            'DocumentMetadata': {'Pages': 1},
+            'Blocks': synthetic_blocks(1, seed=zlib.crc32(Document['Bytes'][:4096]), **self.block_options),
+            'AnalyzeDocumentModelVersion': '1.0'
+        }
+
+    def start_document_analysis(self, DocumentLocation, FeatureTypes, **kwargs):
+        self._call("StartDocumentAnalysis")
+        s3_object = DocumentLocation['S3Object']
+        pages = None
+        if self.s3_client is not None:
+            pages = self.s3_client.page_count(s3_object['Bucket'], s3_object['Name'])
+        pages = pages or self.default_pages
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "pages": pages,
+            "ready_at": time.monotonic() + self.job_seconds + self.job_seconds_per_page * pages,
+            "blocks": None,
+            "generated": threading.Event()
+        }
+        with self.lock:
+            now = time.monotonic()
+            for expired_id in [j for j, other in self.jobs.items() if other["ready_at"] + self.retention_seconds < now]:
+                del self.jobs[expired_id]
+            self.jobs[job_id] = job
+
+        # Generated while the job "runs", so large documents don't stall the caller's poll loop
+        def generate():
+            job["blocks"] = synthetic_blocks(pages, seed=zlib.crc32(job_id.encode()), **self.block_options)
+            job["generated"].set()
+        threading.Thread(target=generate, name="textract-simulator", daemon=True).start()
+        return {'JobId': job_id}
+
+    def get_document_analysis(self, JobId, MaxResults=None, NextToken=None, **kwargs):
+        self._call("GetDocumentAnalysis")
+        with self.lock:
+            job = self.jobs.get(JobId)
+        if job is None:
+            raise ClientError({"Error": {"Code": "InvalidJobIdException", "Message": "Invalid job id"}},
+                              "GetDocumentAnalysis")
+        if time.monotonic() < job["ready_at"]:
+            return {'JobStatus': 'IN_PROGRESS', 'DocumentMetadata': {'Pages': job["pages"]}}
+
+        job["generated"].wait()
+        start = int(NextToken or 0)
+        end = start + (MaxResults or self.max_results)
+        response = {
+            'JobStatus': 'SUCCEEDED',
+            'DocumentMetadata': {'Pages': job["pages"]},
+            'Blocks': job["blocks"][start:end],
+            'AnalyzeDocumentModelVersion': '1.0'
+        }
+        if end < len(job["blocks"]):
+            response['NextToken'] = str(end)
+        return response
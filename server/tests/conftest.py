@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+# The services are imported as top-level packages from the server directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.textract_service import TextractManager
+from services.textract_simulator import SimulatedS3Client, SimulatedTextractClient
+
+
+@pytest.fixture
+def manager_env(tmp_path, monkeypatch):
+    """Environment of an offline TextractManager: no latency, throttling or persistent stores."""
+    for name, value in {
+        'RESULT_CACHE_ENABLED': 'false', 'DOCUMENT_CATALOG_ENABLED': 'false', 'SEARCH_INDEX_ENABLED': 'false',
+        'JOB_JOURNAL_ENABLED': 'false', 'OUTPUT_DIR': str(tmp_path / 'output'),
+        'TEXTRACT_SIM_LATENCY': '0', 'TEXTRACT_SIM_S3_LATENCY': '0', 'TEXTRACT_SIM_JOB_SECONDS': '0',
+        'TEXTRACT_POLL_MIN_INTERVAL': '0.01', 'TEXTRACT_TPS_START_DOCUMENT_ANALYSIS': '0',
+        'TEXTRACT_TPS_GET_DOCUMENT_ANALYSIS': '0',
+    }.items():
+        monkeypatch.setenv(name, value)
+    return monkeypatch
+
+
+@pytest.fixture
+def make_manager(manager_env):
+    """Factory of offline TextractManagers, shut down at the end of the test."""
+    managers = []
+
+    def make(s3_client=None, textract_client=None, **kwargs):
+        s3_client = s3_client or SimulatedS3Client()
+        textract_client = textract_client or SimulatedTextractClient(s3_client)
+        managers.append(TextractManager(textract_client=textract_client, s3_client=s3_client, **kwargs))
+        return managers[-1]
+
+    yield make
+    for manager in managers:
+        manager.shutdown()
+
+
+@pytest.fixture
+def manager(make_manager):
+    return make_manager()
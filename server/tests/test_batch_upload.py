@@ -0,0 +1,68 @@
+import asyncio
+import io
+import os
+import zipfile
+
+import pytest
+from fastapi import UploadFile
+
+from controllers.document_controller import DocumentController
+
+
+class RecordingJobManager:
+    def __init__(self):
+        self.documents = None
+
+    def submit_batch(self, documents, concurrency=None):
+        self.documents = documents
+        return {"batch_id": "batch"}
+
+
+@pytest.fixture
+def controller(tmp_path):
+    # Only the upload handling is exercised; no DocumentService is needed
+    controller = DocumentController.__new__(DocumentController)
+    controller.max_upload_bytes = 1024 * 1024
+    controller.upload_chunk_size = 64 * 1024
+    controller.upload_tmp_dir = str(tmp_path)
+    controller.batch_max_files = 100
+    controller.job_manager = RecordingJobManager()
+    return controller
+
+
+def zip_upload(filename, members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return UploadFile(file=buffer, filename=filename)
+
+
+def test_zip_members_in_different_folders_keep_apart(controller):
+    upload = zip_upload("reports.zip", {"a/report.pdf": b"a", "b/report.pdf": b"b", "./c/../report.pdf": b"c"})
+
+    result = asyncio.run(controller.upload_batch([upload]))
+
+    documents = controller.job_manager.documents
+    assert [document["filename"] for document in documents] == ["a_report.pdf", "b_report.pdf", "c_report.pdf"]
+    contents = [open(document["file_path"], 'rb').read() for document in documents]
+    assert contents == [b"a", b"b", b"c"]
+    assert result["rejected"] == []
+
+
+def test_documents_with_the_same_output_name_are_rejected(controller, tmp_path):
+    uploads = [
+        zip_upload("first.zip", {"report.pdf": b"zip"}),
+        UploadFile(file=io.BytesIO(b"upload"), filename="report.png"),
+        UploadFile(file=io.BytesIO(b"other"), filename="other.pdf"),
+    ]
+
+    result = asyncio.run(controller.upload_batch(uploads))
+
+    assert [document["filename"] for document in controller.job_manager.documents] == ["report.pdf", "other.pdf"]
+    assert result["rejected"] == [{"filename": "report.png", "detail": "Duplicate document name in the batch"}]
+    # Only the spooled files of the queued documents are left
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(document["file_path"]) for document in controller.job_manager.documents
+    )
@@ -0,0 +1,53 @@
+import json
+import tracemalloc
+
+from services.block_store import BlockStore
+from services.postprocessing import postprocess_pages
+from services.textract_simulator import synthetic_blocks
+
+
+def enriched_blocks(pages):
+    """Enriched blocks of a synthetic response, with the geometry keys real responses have."""
+    blocks = []
+    for page in range(1, pages + 1):
+        [(page_blocks, _)] = postprocess_pages([synthetic_blocks(1, seed=page)], 0.75)
+        blocks.extend(page_blocks)
+    return blocks
+
+
+def test_round_trip_keeps_blocks_identical():
+    blocks = enriched_blocks(3)
+    assert all('RotationAngle' in block['Geometry'] for block in blocks)
+    # Values that do not fit the columns are kept as they are
+    blocks[0]['Geometry']['RotationAngle'] = 2
+    blocks[1]['Geometry'] = {'Polygon': [], 'BoundingBox': {'Width': 1.0, 'Height': 1.0, 'Left': 0.0, 'Top': 0.0}}
+    blocks[2]['Id'] = 'not-a-uuid'
+    blocks[3]['Confidence'] = 99
+
+    store = BlockStore(blocks)
+
+    assert len(store) == len(blocks)
+    assert list(store) == blocks
+    # Key order matters for the JSON written from the store
+    assert json.dumps(list(store)) == json.dumps(blocks)
+    assert store[-1] == blocks[-1]
+    assert store[2:5] == blocks[2:5]
+
+
+def test_store_is_a_fraction_of_the_dicts():
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        blocks = enriched_blocks(20)
+        dicts_size = tracemalloc.get_traced_memory()[0] - before
+
+        before = tracemalloc.get_traced_memory()[0]
+        store = BlockStore(enriched_blocks(20))
+        store_size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    assert len(store) == len(blocks)
+    # Real geometry, with its RotationAngle, is held in columns
+    assert not any(extras and 'Geometry' in extras for extras in store._extras)
+    assert store_size * 3 < dicts_size
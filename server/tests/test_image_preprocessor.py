@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+from services.image_preprocessor import ImagePreprocessor
+
+
+@pytest.fixture
+def preprocessor():
+    preprocessor = ImagePreprocessor(enabled=True, min_bytes=1, workers=1)
+    yield preprocessor
+    preprocessor.shutdown()
+
+
+def _tiff(mode, background, ink):
+    image = Image.new(mode, (800, 1000), background)
+    ImageDraw.Draw(image).rectangle((100, 100, 700, 200), fill=ink)
+    buffer = io.BytesIO()
+    image.save(buffer, "TIFF")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("mode, background, ink", [("I;16", 50000, 3000), ("I", 50000, 3000), ("F", 0.9, 0.1)])
+def test_high_bit_depth_scan_keeps_its_contents(preprocessor, mode, background, ink):
+    upload = _tiff(mode, background, ink)
+
+    processed = preprocessor.preprocess(file_bytes=upload)
+
+    assert len(processed) < len(upload)
+    image = Image.open(io.BytesIO(processed))
+    assert image.mode == "L"
+    # Ink stays dark and paper light, instead of everything clipping to white
+    assert image.getpixel((400, 150)) < 64
+    assert image.getpixel((400, 600)) > 192
+
+
+def test_blank_16_bit_page_becomes_white(preprocessor):
+    processed = preprocessor.preprocess(file_bytes=_tiff("I;16", 40000, 40000))
+
+    assert Image.open(io.BytesIO(processed)).getextrema() == (255, 255)
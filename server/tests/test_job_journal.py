@@ -0,0 +1,128 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from services.document_service import DocumentService
+from services.job_journal import JobJournal
+from services.job_service import FINISHED_STATES, JOB_SUCCEEDED, JobManager
+from services.textract_simulator import synthetic_pdf
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'jobs.sqlite3')
+
+
+def set_owner(journal, job_id, pid, instance):
+    with journal.lock:
+        journal.conn.execute(
+            "UPDATE textract_jobs SET owner_pid = ?, owner_instance = ? WHERE textract_job_id = ?", (pid, instance, job_id)
+        )
+        journal.conn.commit()
+
+
+def record(journal, job_id):
+    journal.record_started(job_id, "hash-" + job_id, ["TABLES", "LAYOUT"], s3_key=f"{job_id}.pdf", source_name=f"{job_id}.pdf",
+                           job_reference="ref-" + job_id, page_count=2)
+
+
+def test_restarted_process_takes_over_jobs_of_its_previous_run(db_path):
+    journal = JobJournal(db_path=db_path, enabled=True)
+    record(journal, "previous")
+    record(journal, "own")
+    # A restart often gets the old PID back, e.g. PID 1 in a container
+    set_owner(journal, "previous", os.getpid(), "previous-run")
+
+    claimed = journal.claim_orphaned()
+
+    assert [job["textract_job_id"] for job in claimed] == ["previous"]
+    assert claimed[0]["feature_types"] == ["TABLES", "LAYOUT"]
+    assert claimed[0]["job_reference"] == "ref-previous"
+    # Once claimed, the job belongs to this instance and is not claimed again
+    assert journal.claim_orphaned() == []
+
+
+def test_jobs_of_a_live_sibling_are_left_until_it_exits(db_path):
+    sibling = subprocess.Popen(
+        [sys.executable, "-c", (
+            "import sys; from services.job_journal import JobJournal; "
+            f"JobJournal(db_path={db_path!r}, enabled=True).record_started('sibling', 'hash', ['LAYOUT']); "
+            "print('recorded', flush=True); sys.stdin.read()"
+        )],
+        cwd=SERVER_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        assert sibling.stdout.readline().strip() == "recorded"
+        journal = JobJournal(db_path=db_path, enabled=True)
+        assert journal.claim_orphaned() == []
+    finally:
+        sibling.communicate("")
+
+    assert [job["textract_job_id"] for job in journal.claim_orphaned()] == ["sibling"]
+
+
+def test_each_orphaned_job_is_claimed_by_one_worker(db_path):
+    journal = JobJournal(db_path=db_path, enabled=True)
+    for n in range(20):
+        record(journal, f"orphan-{n}")
+        # Owned by a process that no longer runs
+        set_owner(journal, f"orphan-{n}", None, None)
+
+    # Workers starting together all look for orphaned jobs at once
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-c", (
+                "from services.job_journal import JobJournal; "
+                f"jobs = JobJournal(db_path={db_path!r}, enabled=True).claim_orphaned(); "
+                "print(' '.join(job['textract_job_id'] for job in jobs))"
+            )],
+            cwd=SERVER_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        for _ in range(4)
+    ]
+    claims = [worker.communicate()[0].split() for worker in workers]
+
+    assert [worker.returncode for worker in workers] == [0] * 4
+    claimed = [job_id for worker_claims in claims for job_id in worker_claims]
+    assert sorted(claimed) == sorted(f"orphan-{n}" for n in range(20))
+    with journal.lock:
+        owners = journal.conn.execute("SELECT DISTINCT owner_instance FROM textract_jobs").fetchall()
+    assert len(owners) == sum(1 for worker_claims in claims if worker_claims)
+    assert (None,) not in owners
+
+
+def test_interrupted_job_is_resumed_from_its_textract_job(manager_env, tmp_path):
+    manager_env.setenv('TEXTRACT_BACKEND', 'simulator')
+    manager_env.setenv('JOB_JOURNAL_ENABLED', 'true')
+    manager_env.setenv('JOB_JOURNAL_PATH', str(tmp_path / 'jobs.sqlite3'))
+    service = DocumentService()
+    manager = service.textract_manager
+    job_manager = JobManager(service, max_workers=2)
+    try:
+        textract_job_id, started = manager.start_or_attach_pdf_analysis(
+            ["LAYOUT", "TABLES"], file_bytes=synthetic_pdf(3), file_name="resumed.pdf", source_name="resumed.pdf",
+            job_reference="client-job", page_count=3
+        )
+        assert started
+        # The process that started the job has since been restarted
+        set_owner(manager.job_journal, textract_job_id, os.getpid(), "previous-run")
+
+        [view] = job_manager.resume_interrupted()
+        assert view["job_id"] == "client-job"
+
+        deadline = time.monotonic() + 30
+        while job_manager.get_job("client-job")["status"] not in FINISHED_STATES and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert job_manager.get_job("client-job")["status"] == JOB_SUCCEEDED
+        assert manager.textract_client.calls['StartDocumentAnalysis'] == 1
+        with manager.job_journal.lock:
+            state = manager.job_journal.conn.execute("SELECT state FROM textract_jobs").fetchone()[0]
+        assert state == "completed"
+    finally:
+        job_manager.shutdown(wait=True)
+        manager.shutdown()
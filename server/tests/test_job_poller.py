@@ -0,0 +1,92 @@
+import json
+import threading
+
+import pytest
+
+from services.job_poller import JobPollerStopped, JobWaitTimeout, SqsNotificationQueue, TextractJobPoller
+from services.textract_simulator import synthetic_pdf
+
+
+@pytest.fixture
+def slow_job_manager(make_manager, manager_env, tmp_path):
+    """Manager whose async jobs outlast the wait for them, with a journal."""
+    manager_env.setenv('TEXTRACT_SIM_JOB_SECONDS', '30')
+    manager_env.setenv('TEXTRACT_JOB_WAIT_TIMEOUT', '0.2')
+    manager_env.setenv('JOB_JOURNAL_ENABLED', 'true')
+    manager_env.setenv('JOB_JOURNAL_PATH', str(tmp_path / 'jobs.sqlite3'))
+    return make_manager()
+
+
+def journal_states(manager):
+    with manager.job_journal.lock:
+        return manager.job_journal.conn.execute("SELECT state FROM textract_jobs").fetchall()
+
+
+def test_wait_timeout_leaves_the_job_resumable(slow_job_manager):
+    manager = slow_job_manager
+
+    with pytest.raises(JobWaitTimeout):
+        manager.process_document(file_bytes=synthetic_pdf(3), output_base_path='slow.pdf', save_files=False)
+
+    # The job may still finish: it stays journaled and its input stays in S3
+    assert journal_states(manager) == [("running",)]
+    assert len(manager.s3_client.objects) == 1
+
+
+def test_stop_unblocks_waiting_jobs(slow_job_manager):
+    manager = slow_job_manager
+    manager.job_poller.wait_timeout = 30
+    errors = []
+
+    def process():
+        try:
+            manager.process_document(file_bytes=synthetic_pdf(3), output_base_path='stopped.pdf', save_files=False)
+        except Exception as e:
+            errors.append(e)
+
+    worker = threading.Thread(target=process)
+    worker.start()
+    while not manager.job_poller.jobs:
+        worker.join(0.01)
+    manager.job_poller.stop()
+    worker.join(5)
+
+    assert not worker.is_alive()
+    assert [type(error) for error in errors] == [JobPollerStopped]
+    assert journal_states(manager) == [("running",)]
+    assert len(manager.s3_client.objects) == 1
+
+
+class FakeSqsClient:
+    """Records what happens to each delivered message, keyed by its receipt handle."""
+
+    def __init__(self, deliveries):
+        self.deliveries = deliveries
+        self.deleted = []
+        self.released = {}
+
+    def receive_message(self, **kwargs):
+        assert kwargs["AttributeNames"] == ["ApproximateReceiveCount"]
+        return {"Messages": [
+            {"ReceiptHandle": handle, "Body": json.dumps({"Type": "Notification", "Message": json.dumps({"JobId": job_id})}),
+             "Attributes": {"ApproximateReceiveCount": str(receives)}}
+            for handle, job_id, receives in self.deliveries
+        ]}
+
+    def delete_message(self, QueueUrl, ReceiptHandle):
+        self.deleted.append(ReceiptHandle)
+
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout):
+        self.released[ReceiptHandle] = VisibilityTimeout
+
+
+def test_sqs_notifications_of_other_workers_are_left_on_the_queue():
+    poller = TextractJobPoller(textract_client=None)
+    poller.jobs["own-job"] = {"callbacks": [], "next_poll": 0}
+    sqs_client = FakeSqsClient([("own", "own-job", 1), ("sibling", "sibling-job", 1), ("stale", "gone-job", 30)])
+
+    SqsNotificationQueue(sqs_client, "queue-url", release_delay=2, max_receives=30).receive(poller.notify)
+
+    assert sqs_client.deleted == ["own", "stale"]
+    assert sqs_client.released == {"sibling": 2}
+    assert [job_id for _, job_id in poller.schedule] == ["own-job"]
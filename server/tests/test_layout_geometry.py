@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from services import postprocessing
+from services.layout_geometry import TableBoxIndex
+from services.textract_simulator import synthetic_blocks
+
+
+def legacy_generate_layout_output(response, overlap_threshold):
+    """The layout output as it was built before TableBoxIndex: every LAYOUT_TABLE against every TABLE."""
+    table_blocks = [b for b in response['Blocks'] if b['BlockType'] == 'TABLE']
+    other_layout_blocks = [b for b in response['Blocks'] if b['BlockType'].startswith('LAYOUT_')]
+
+    filtered_layout_blocks = []
+    for layout_block in other_layout_blocks:
+        if layout_block['BlockType'] == 'LAYOUT_TABLE':
+            is_duplicate = False
+            layout_box = layout_block['Geometry']['BoundingBox']
+            layout_area = layout_box['Width'] * layout_box['Height']
+            for table_block in table_blocks:
+                if layout_block.get('Page', 1) != table_block.get('Page', 1):
+                    continue
+                table_box = table_block['Geometry']['BoundingBox']
+                x_min = max(layout_box['Left'], table_box['Left'])
+                x_max = min(layout_box['Left'] + layout_box['Width'], table_box['Left'] + table_box['Width'])
+                y_min = max(layout_box['Top'], table_box['Top'])
+                y_max = min(layout_box['Top'] + layout_box['Height'], table_box['Top'] + table_box['Height'])
+                intersection = 0 if x_max < x_min or y_max < y_min else (x_max - x_min) * (y_max - y_min)
+                if layout_area > 0 and (intersection / layout_area) > overlap_threshold:
+                    is_duplicate = True
+                    break
+            if not is_duplicate:
+                filtered_layout_blocks.append(layout_block)
+        else:
+            filtered_layout_blocks.append(layout_block)
+
+    final_blocks = table_blocks + filtered_layout_blocks
+    final_blocks.sort(key=lambda x: (
+        x.get('Page', 1), x['Geometry']['BoundingBox']['Top'], x['Geometry']['BoundingBox']['Left']
+    ))
+
+    output_data = []
+    for block in final_blocks:
+        item = {
+            "type": block['BlockType'].replace('_', ' ').title(),
+            "page": block.get('Page', 1),
+            "confidence": block.get('Confidence'),
+            "geometry": block.get('Geometry')
+        }
+        if block['BlockType'] == 'TABLE':
+            item["type"] = "Layout Table"
+            item["table_data"] = block.get('TableData', [])
+        else:
+            item["text"] = block.get('Text', '')
+        output_data.append(item)
+    return output_data
+
+
+def jittered_response(seed, tables_per_page):
+    """Synthetic response whose TABLE and LAYOUT_TABLE boxes are moved and resized at random."""
+    rng = random.Random(seed)
+    blocks = synthetic_blocks(3, layouts_per_page=4, tables_per_page=tables_per_page, table_size=2, seed=seed)
+    for block in blocks:
+        if block['BlockType'] in ('TABLE', 'LAYOUT_TABLE'):
+            box = block['Geometry']['BoundingBox']
+            box['Left'] = rng.uniform(0.0, 0.9)
+            box['Top'] = rng.uniform(0.0, 0.9)
+            # Some boxes have no area, some are far larger than the others
+            box['Width'] = rng.choice([0.0, rng.uniform(0.01, 0.2), rng.uniform(0.2, 1.0)])
+            box['Height'] = rng.choice([rng.uniform(0.01, 0.2), rng.uniform(0.2, 1.0)])
+    response = {'Blocks': blocks}
+    postprocessing.enrich_response_with_text(response)
+    postprocessing.enrich_tables(response)
+    return response
+
+
+@pytest.mark.parametrize("tables_per_page", [1, 5, 40])
+@pytest.mark.parametrize("threshold", [0.0, 0.5, 0.75])
+def test_layout_output_matches_nested_loop(tables_per_page, threshold):
+    for seed in range(10):
+        response = jittered_response(seed, tables_per_page)
+        expected = legacy_generate_layout_output(response, threshold)
+        assert postprocessing.generate_layout_output(response, threshold) == expected
+
+
+def test_unjittered_layout_tables_are_dropped():
+    response = {'Blocks': synthetic_blocks(2, tables_per_page=3)}
+    output = postprocessing.generate_layout_output(response, 0.75)
+
+    assert output == legacy_generate_layout_output(response, 0.75)
+    assert [item["type"] for item in output].count("Layout Table") == 6
+
+
+def test_query_returns_only_intersecting_tables():
+    tables = [
+        {'BlockType': 'TABLE', 'Page': 1, 'Geometry': {'BoundingBox': {
+            'Width': 0.009, 'Height': 0.009, 'Left': column / 100, 'Top': row / 100
+        }}}
+        for row in range(100) for column in range(100)
+    ]
+    index = TableBoxIndex(tables)
+    query = {'Page': 1, 'Geometry': {'BoundingBox': {'Width': 0.015, 'Height': 0.015, 'Left': 0.5, 'Top': 0.5}}}
+
+    assert len(list(index.intersecting(query))) == 4
+    assert list(index.intersecting({**query, 'Page': 2})) == []
@@ -0,0 +1,58 @@
+import json
+import os
+
+from services.layout_stream import LayoutStreamWriter, read_page_index, read_provenance
+from services.output_writer import OutputWriter
+
+
+def items(text):
+    return [{"type": "Layout Text", "page": page, "text": f"{text} {page}"} for page in (1, 2, 3)]
+
+
+def write(layout_path, index_path, text, layout_version="v1"):
+    with LayoutStreamWriter(layout_path, index_path=index_path, provenance={"layout_version": layout_version}) as writer:
+        writer.write_items(items(text))
+
+
+def rewrite_same_size(layout_path, text):
+    """Rewrites the layout compactly, padded to its old size, so the indexed byte ranges no longer match."""
+    size = os.path.getsize(layout_path)
+    data = json.dumps(items(text), separators=(",", ":"))
+    with open(layout_path, 'w') as f:
+        f.write(data.ljust(size))
+    assert os.path.getsize(layout_path) == size
+
+
+def test_index_of_a_layout_file_rewritten_to_the_same_size_is_ignored(tmp_path):
+    layout_path, index_path = str(tmp_path / "doc_layout.json"), str(tmp_path / "doc_layout.index.json")
+    write(layout_path, index_path, "first")
+    assert sorted(read_page_index(index_path, layout_path)) == [1, 2, 3]
+
+    # Rewritten in place without its index, e.g. by an older version of the code
+    rewrite_same_size(layout_path, "other")
+
+    assert read_page_index(index_path, layout_path) is None
+    assert read_provenance(index_path, layout_path) == {}
+
+
+def test_index_of_another_layout_version_is_ignored(tmp_path):
+    layout_path, index_path = str(tmp_path / "doc_layout.json"), str(tmp_path / "doc_layout.index.json")
+    write(layout_path, index_path, "first", layout_version="v0")
+
+    assert read_page_index(index_path, layout_path) is not None
+    assert read_page_index(index_path, layout_path, layout_version="v1") is None
+    assert read_provenance(index_path, layout_path) == {"layout_version": "v0"}
+
+
+def test_page_reads_use_the_index_of_the_current_layout_only(tmp_path):
+    writer = OutputWriter(output_dir=str(tmp_path))
+    writer.layout_version = "v1"
+    try:
+        writer.write_layout("doc", items("first"), provenance={"layout_version": "v1"})
+        assert json.loads(writer.read_layout_pages("doc", 2, 3)) == items("first")[1:]
+
+        rewrite_same_size(writer.layout_path("doc"), "other")
+
+        assert json.loads(writer.read_layout_pages("doc", 2, 3)) == items("other")[1:]
+    finally:
+        writer.shutdown()
@@ -0,0 +1,37 @@
+import pytest
+
+from services.textract_simulator import synthetic_blocks, synthetic_pdf
+
+
+def paginate(blocks, page_size):
+    return [{'Blocks': blocks[i:i + page_size]} for i in range(0, len(blocks), page_size)]
+
+
+def test_pages_are_yielded_whole_across_response_boundaries(manager):
+    blocks = synthetic_blocks(4)
+
+    pages = list(manager.iter_document_pages(paginate(blocks, 37)))
+
+    assert [page for page, _ in pages] == [1, 2, 3, 4]
+    assert [block for _, page_blocks in pages for block in page_blocks] == blocks
+
+
+def test_block_after_its_page_fails_the_document(manager):
+    blocks = synthetic_blocks(3)
+    late = next(i for i, block in enumerate(blocks) if block['Page'] == 1 and block['BlockType'] == 'WORD')
+    blocks.append(blocks.pop(late))
+
+    with pytest.raises(ValueError, match="arrived after the page was completed"):
+        list(manager.iter_document_pages(paginate(blocks, 50)))
+
+
+def test_multi_page_pdf_is_assembled_page_by_page(manager):
+    pages = []
+
+    result = manager.process_document(
+        file_bytes=synthetic_pdf(3), output_base_path='pages.pdf', save_files=False,
+        page_callback=lambda page_number, items: pages.append(page_number)
+    )
+
+    assert pages == [1, 2, 3]
+    assert {block['Page'] for block in result['Blocks']} == {1, 2, 3}
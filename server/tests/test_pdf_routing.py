@@ -0,0 +1,35 @@
+from services import metrics, textract_service
+from services.textract_simulator import synthetic_pdf
+
+
+def test_single_page_pdf_uses_analyze_document(manager):
+    assert manager.choose_pdf_route(file_bytes=synthetic_pdf(1)) == ("sync", 1)
+
+    result = manager.process_document(file_bytes=synthetic_pdf(1), output_base_path='single.pdf', save_files=False)
+
+    assert result['DocumentMetadata']['Pages'] == 1
+    assert manager.textract_client.calls['StartDocumentAnalysis'] == 0
+
+
+def test_wrong_page_count_falls_back_to_async_job(manager, monkeypatch):
+    # The quick page count misses pages, e.g. ones added by an incremental update
+    monkeypatch.setattr(textract_service, 'count_pdf_pages', lambda file_path=None, file_bytes=None: 1)
+    assert manager.choose_pdf_route(file_bytes=synthetic_pdf(3))[0] == "sync"
+
+    result = manager.process_document(file_bytes=synthetic_pdf(3), output_base_path='multi.pdf', save_files=False)
+
+    assert result['DocumentMetadata']['Pages'] == 3
+    assert manager.textract_client.calls['AnalyzeDocument'] == 1
+    assert manager.textract_client.calls['StartDocumentAnalysis'] == 1
+
+
+def test_split_pages_are_traced_in_the_callers_trace(make_manager, manager_env):
+    manager_env.setenv('PDF_SPLIT_WORKERS', '3')
+    manager = make_manager()
+    pages = [synthetic_pdf(1, tag=f"page-{n}") for n in range(3)]
+
+    with metrics.trace() as trace:
+        result = manager.analyze_pdf_pages(["LAYOUT"], pages)
+
+    assert result['DocumentMetadata']['Pages'] == 3
+    assert trace.breakdown()["analyze_document"]["count"] == 3
@@ -0,0 +1,67 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+from services import result_cache
+from services.result_cache import ResultCache
+from services.textract_simulator import synthetic_blocks, synthetic_pdf
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Strictly increasing access times, so the LRU order does not depend on timer resolution."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(result_cache, 'time', SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def entry(seed):
+    return {'DocumentMetadata': {'Pages': 1}, 'Blocks': synthetic_blocks(1, layouts_per_page=2, seed=seed)}
+
+
+def test_least_recently_used_entries_are_evicted_by_size(tmp_path, clock):
+    values = {key: ResultCache.encode(entry(seed)) for seed, key in enumerate("abcd")}
+    size = max(len(value) for value in values.values())
+    cache = ResultCache(db_path=str(tmp_path / 'cache.sqlite3'), max_bytes=size * 3, enabled=True)
+    for key in "abc":
+        cache.put_encoded(key, values[key])
+
+    # Reading 'a' makes 'b' the least recently used entry
+    assert cache.get('a') == entry(0)
+    cache.put_encoded('d', values['d'])
+
+    assert cache.get('b') is None
+    assert [cache.get(key) is not None for key in "acd"] == [True, True, True]
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 3
+    assert stats["size_bytes"] == sum(len(values[key]) for key in "acd") <= cache.max_bytes
+
+
+def test_size_survives_a_restart_and_oversized_results_are_skipped(tmp_path, clock):
+    db_path = str(tmp_path / 'cache.sqlite3')
+    value = ResultCache.encode(entry(0))
+    cache = ResultCache(db_path=db_path, max_bytes=len(value) * 2, enabled=True)
+    cache.put_encoded('a', value)
+    cache.put_encoded('huge', value * 3)
+
+    reopened = ResultCache(db_path=db_path, max_bytes=len(value) * 2, enabled=True)
+
+    assert reopened.total_bytes == len(value)
+    assert reopened.get('huge') is None
+    assert reopened.get('a') == entry(0)
+
+
+def test_cache_hit_skips_textract(make_manager, manager_env, tmp_path):
+    manager_env.setenv('RESULT_CACHE_ENABLED', 'true')
+    manager_env.setenv('RESULT_CACHE_PATH', str(tmp_path / 'cache.sqlite3'))
+    manager = make_manager()
+    pdf = synthetic_pdf(1, tag="cached")
+
+    first = manager.process_document(file_bytes=pdf, output_base_path='first.pdf', save_files=False)
+    calls = dict(manager.textract_client.calls)
+    second = manager.process_document(file_bytes=pdf, output_base_path='second.pdf', save_files=False)
+
+    assert dict(manager.textract_client.calls) == calls
+    assert manager.result_cache.hits == 1
+    assert list(second['Blocks']) == list(first['Blocks'])